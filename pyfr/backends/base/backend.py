@@ -38,6 +38,12 @@ class BaseBackend(object, metaclass=ABCMeta):
         # Convert to a NumPy data type
         self.fpdtype = np.dtype(prec).type
 
+        # Directory in which to cache compiled kernel templates
+        if cfg.get('backend', 'template-cache-dir', ''):
+            self.tplcachedir = cfg.getpath('backend', 'template-cache-dir')
+        else:
+            self.tplcachedir = None
+
         # Allocated matrices
         self.mats = WeakValueDictionary()
         self._mat_counter = count()
@@ -159,5 +165,8 @@ class BaseBackend(object, metaclass=ABCMeta):
     def queue(self):
         return self.queue_cls(self)
 
+    def collect_stats(self, stats):
+        pass
+
     def runall(self, sequence):
         self.queue_cls.runall(sequence)
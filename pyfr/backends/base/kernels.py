@@ -4,6 +4,7 @@ from abc import ABCMeta, abstractmethod
 import itertools as it
 import types
 
+from pyfr.timer import startup_timer
 from pyfr.util import memoize, proxylist
 
 
@@ -156,10 +157,13 @@ class BasePointwiseKernelProvider(BaseKernelProvider, metaclass=ABCMeta):
         # Generate the kernel providing method
         def kernel_meth(self, tplargs, dims, **kwargs):
             # Render the source of kernel
-            src, ndim, argn, argt = self._render_kernel(name, mod, tplargs)
+            with startup_timer('kernel-render'):
+                src, ndim, argn, argt = self._render_kernel(name, mod,
+                                                            tplargs)
 
             # Compile the kernel
-            fun = self._build_kernel(name, src, list(it.chain(*argt)))
+            with startup_timer('kernel-build'):
+                fun = self._build_kernel(name, src, list(it.chain(*argt)))
 
             # Process the argument list
             argb = self._build_arglst(dims, argn, argt, kwargs)
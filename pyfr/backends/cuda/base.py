@@ -61,7 +61,8 @@ class CUDABackend(BaseBackend):
         # Template lookup
         self.lookup = DottedTemplateLookup(
             'pyfr.backends.cuda.kernels',
-            fpdtype=self.fpdtype, alignb=self.alignb
+            fpdtype=self.fpdtype, alignb=self.alignb,
+            moddir=self.tplcachedir
         )
 
         # Instantiate the base kernel providers
@@ -48,7 +48,8 @@ class MICBackend(BaseBackend):
         # Template lookup
         self.lookup = DottedTemplateLookup(
             'pyfr.backends.mic.kernels',
-            fpdtype=self.fpdtype, alignb=self.alignb
+            fpdtype=self.fpdtype, alignb=self.alignb,
+            moddir=self.tplcachedir
         )
 
         # Kernel provider classes
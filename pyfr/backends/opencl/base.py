@@ -67,7 +67,8 @@ class OpenCLBackend(BaseBackend):
         # Template lookup
         self.lookup = DottedTemplateLookup(
             'pyfr.backends.opencl.kernels',
-            fpdtype=self.fpdtype, alignb=self.alignb
+            fpdtype=self.fpdtype, alignb=self.alignb,
+            moddir=self.tplcachedir
         )
 
         # Instantiate the base kernel providers
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import os
+
 import numpy as np
 
 from pyfr.backends.base import BaseBackend
+from pyfr.mpiutil import get_local_size
 from pyfr.template import DottedTemplateLookup
+from pyfr.timer import startup_timer
 
 
 class OpenMPBackend(BaseBackend):
@@ -15,8 +19,8 @@ class OpenMPBackend(BaseBackend):
         # Take the alignment requirement to be 32-bytes
         self.alignb = 32
 
-        from pyfr.backends.openmp import (blasext, cblas, packing, provider,
-                                          types)
+        from pyfr.backends.openmp import (blasext, cblas, compiler, packing,
+                                          provider, types)
 
         # Register our data types
         self.base_matrix_cls = types.OpenMPMatrixBase
@@ -32,7 +36,8 @@ class OpenMPBackend(BaseBackend):
         # Template lookup
         self.lookup = DottedTemplateLookup(
             'pyfr.backends.openmp.kernels',
-            fpdtype=self.fpdtype, alignb=self.alignb
+            fpdtype=self.fpdtype, alignb=self.alignb,
+            moddir=self.tplcachedir
         )
 
         # Kernel provider classes
@@ -45,6 +50,30 @@ class OpenMPBackend(BaseBackend):
         # Pointwise kernels
         self.pointwise = self._providers[0]
 
+        # Pool for compiling kernels concurrently; by default the cores
+        # on each node are shared between the ranks running there
+        njobs = cfg.getint('backend-openmp', 'compile-jobs',
+                           max(1, (os.cpu_count() or 1) // get_local_size()))
+        self.srcpool = compiler.SourceModulePool(njobs)
+
+    def commit(self):
+        super().commit()
+
+        # Wait for any outstanding kernel builds to complete
+        if self.srcpool.pending:
+            with startup_timer('kernel-build'):
+                self.srcpool.finish()
+
+    def collect_stats(self, stats):
+        from pyfr.backends.openmp.compiler import SourceModule
+
+        super().collect_stats(stats)
+
+        # Kernel cache statistics
+        cstats = SourceModule.cache_stats
+        stats.set('backend-openmp', 'kernel-cache-hits', cstats['hit'])
+        stats.set('backend-openmp', 'kernel-cache-misses', cstats['miss'])
+
     def _malloc_impl(self, nbytes):
         data = np.zeros(nbytes + self.alignb, dtype=np.uint8)
         offset = -data.ctypes.data % self.alignb
@@ -27,9 +27,9 @@ class OpenMPBlasExtKernels(OpenMPKernelProvider):
         class AxnpbyKernel(ComputeKernel):
             def run(self, queue, *consts):
                 args = list(arr) + list(consts)
-                kern(nrow, ncolb, ldim, lsdim, *args)
+                self.kern(nrow, ncolb, ldim, lsdim, *args)
 
-        return AxnpbyKernel()
+        return self._bind_kernel(AxnpbyKernel(), kern=kern)
 
     def copy(self, dst, src):
         if dst.traits != src.traits:
@@ -62,6 +62,6 @@ class OpenMPBlasExtKernels(OpenMPKernelProvider):
                 return self._retval
 
             def run(self, queue, atol, rtol):
-                self._retval = rkern(cnt, x, y, z, atol, rtol)
+                self._retval = self.rkern(cnt, x, y, z, atol, rtol)
 
-        return ErrestKernel()
+        return self._bind_kernel(ErrestKernel(), rkern=rkern)
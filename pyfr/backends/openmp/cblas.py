@@ -97,8 +97,11 @@ class OpenMPCBLASKernels(OpenMPKernelProvider):
 
             class MulKernel(ComputeKernel):
                 def run(self, queue):
-                    par_gemm(cblas_gemm_ptr, m, n, k, alpha, a, a.leaddim,
-                             b, b.leaddim, beta, out, out.leaddim)
+                    self.par_gemm(cblas_gemm_ptr, m, n, k, alpha, a,
+                                  a.leaddim, b, b.leaddim, beta, out,
+                                  out.leaddim)
+
+            return self._bind_kernel(MulKernel(), par_gemm=par_gemm)
         else:
             class MulKernel(ComputeKernel):
                 def run(self, queue):
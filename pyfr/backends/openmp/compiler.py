@@ -1,40 +1,161 @@
 # -*- coding: utf-8 -*-
 
 from abc import ABCMeta, abstractmethod
+from collections import Counter, deque
 from ctypes import CDLL
+import fnmatch
+import functools as ft
+import hashlib
 import itertools as it
 import os
+import platform
+import re
 import shlex
+import shutil
 import tempfile
+import uuid
 
-from pytools.prefork import call_capture_output
+from pytools.prefork import call_async, call_capture_output, wait
 
+from pyfr.cache import default_cachedir, lock_file
 from pyfr.ctypesutil import platform_libname
 from pyfr.nputil import npdtype_to_ctypestype
 from pyfr.util import rm
 
 
+def _cpu_flags():
+    try:
+        with open('/proc/cpuinfo') as f:
+            for l in f:
+                # Instruction set extensions supported by the processor
+                if l.startswith(('flags', 'Features')):
+                    return l.split(':', 1)[1].strip()
+    except OSError:
+        pass
+
+    return None
+
+
+@ft.lru_cache(maxsize=None)
+def _cc_ident(cc):
+    ident = [shutil.which(cc) or cc]
+
+    # Compiler version
+    try:
+        ident.append(call_capture_output([cc, '--version'])[1].decode())
+    except OSError:
+        pass
+
+    # Resolve what -march=native means for this compiler and processor
+    try:
+        out = call_capture_output([cc, '-march=native', '-Q',
+                                   '--help=target'])[1].decode()
+        march = re.findall(r'^\s*-march=\s+(\S+)', out, re.M)
+    except OSError:
+        march = None
+
+    # Where the compiler can not tell us then identify the processor
+    # by its features; if these are unavailable then give up
+    if march:
+        ident.extend(march)
+    else:
+        flags = _cpu_flags()
+        if not flags:
+            return None
+
+        ident.extend([platform.machine(), flags])
+
+    return tuple(ident)
+
+
 class SourceModule(object, metaclass=ABCMeta):
     _dir_seq = it.count()
 
+    # Kernel cache statistics for this process
+    cache_stats = Counter()
+
     def __init__(self, src, cfg):
         self.src = src
         self.cfg = cfg
 
-        # Create a scratch directory
-        tmpidx = next(self._dir_seq)
-        tmpdir = tempfile.mkdtemp(prefix='pyfr-{0}-'.format(tmpidx))
+        # Kernel cache directory and maximum size in MiB
+        self._cachedir = cfg.getpath('backend-openmp', 'cache-dir',
+                                     default_cachedir())
+        self._cachesize = cfg.getfloat('backend-openmp', 'cache-size', 256)
+        self._cachesize *= 1024**2
+
+        # See if the cache is enabled; this requires that we are able to
+        # identify the code generated by the compiler
+        self._usecache = (self._cachesize and
+                          'PYFR_DEBUG_OMP_NO_CACHE' not in os.environ and
+                          self._cache_key() is not None)
+        if self._usecache:
+            self._cpath = os.path.join(self._cachedir,
+                                       platform_libname(self.digest))
+
+        # Library, cache lock, and in-progress build state
+        self._mod = self._lockf = self._aid = self._tmpdir = None
+
+    @property
+    def loaded(self):
+        return self._mod is not None
+
+    def start(self):
+        if self._usecache:
+            # See if the library is already in the cache
+            self._mod = self._cache_get()
+            if self._mod:
+                return False
+
+            # Try to become the process which builds the library
+            try:
+                self._lockf = self._cache_lock(block=False)
+            # Otherwise another process is building it so wait on them
+            except BlockingIOError:
+                return False
+
+            # The library may have been added whilst acquiring the lock
+            self._mod = self._cache_get()
+            if self._mod:
+                self._cache_unlock()
+                return False
+
+        # Start compiling the library in the background
+        self._start_build()
+
+        return True
+
+    def finish(self):
+        if self._mod:
+            return
 
         try:
-            # Compile and link the source
-            lname = self._build(tmpdir)
+            # If another process was building the library then wait for
+            # them to finish before checking the cache again
+            if not self._aid:
+                if self._usecache:
+                    self._lockf = self._cache_lock(block=True)
+                    self._mod = self._cache_get()
 
-            # Load
-            self._mod = CDLL(os.path.join(tmpdir, lname))
+                if self._mod:
+                    return
+
+                self._start_build()
+
+            # Wait for the compiler and load the resulting library
+            self._finish_build()
         finally:
+            self._cache_unlock()
+
             # Unless we're debugging delete the scratch directory
-            if 'PYFR_DEBUG_OMP_KEEP_LIBS' not in os.environ:
-                rm(tmpdir)
+            if self._tmpdir and 'PYFR_DEBUG_OMP_KEEP_LIBS' not in os.environ:
+                rm(self._tmpdir)
+
+            self._aid = self._tmpdir = None
+
+        # Keep the cache within its size limit
+        if self._usecache:
+            self._cache_evict()
 
     def function(self, name, restype, argtypes):
         # Get the function
@@ -44,8 +165,137 @@ class SourceModule(object, metaclass=ABCMeta):
 
         return fn
 
+    @property
+    def digest(self):
+        h = hashlib.sha256()
+
+        for s in it.chain(self._cache_key(), [self.src]):
+            h.update(s.encode() + b'\0')
+
+        return h.hexdigest()
+
+    def _start_build(self):
+        # Create a scratch directory
+        tmpidx = next(self._dir_seq)
+        self._tmpdir = tempfile.mkdtemp(prefix='pyfr-{0}-'.format(tmpidx))
+
+        # Write out the source and invoke the compiler
+        self._cmd, self._lname = self._build_cmd(self._tmpdir)
+        self._aid = call_async(self._cmd, cwd=self._tmpdir)
+
+    def _finish_build(self):
+        # If the build failed then rerun it to capture the error output
+        if wait(self._aid):
+            call_capture_output(self._cmd, cwd=self._tmpdir)
+
+        self.cache_stats['miss'] += 1
+
+        # Load the library, adding it to the cache if possible
+        lpath = os.path.join(self._tmpdir, self._lname)
+        if self._usecache:
+            self._mod = self._cache_set(lpath)
+        else:
+            self._mod = CDLL(lpath)
+
+    def _cache_lock(self, block):
+        try:
+            os.makedirs(self._cachedir, exist_ok=True)
+            return lock_file(self._cpath + '.lock', block)
+        # Another process holds the lock
+        except BlockingIOError:
+            raise
+        # If the cache is unusable then fall back to a private build
+        except OSError:
+            self._usecache = False
+            return None
+
+    def _cache_unlock(self):
+        if self._lockf:
+            self._lockf.close()
+            self._lockf = None
+
+    def _cache_get(self):
+        try:
+            mod = CDLL(self._cpath)
+        except OSError:
+            return None
+
+        # Mark the library as recently used
+        try:
+            os.utime(self._cpath)
+        except OSError:
+            pass
+
+        self.cache_stats['hit'] += 1
+
+        return mod
+
+    def _cache_set(self, lpath):
+        tpath = os.path.join(self._cachedir, str(uuid.uuid4()))
+
+        # Move the library into the cache and then atomically rename it
+        try:
+            shutil.move(lpath, tpath)
+            os.replace(tpath, self._cpath)
+        except OSError:
+            return CDLL(lpath)
+        else:
+            return CDLL(self._cpath)
+
+    def _cache_evict(self):
+        cdir = self._cachedir
+        files = os.listdir(cdir)
+
+        libs = []
+        for f in fnmatch.filter(files, platform_libname('*')):
+            try:
+                st = os.stat(os.path.join(cdir, f))
+                libs.append((st.st_mtime, st.st_size, os.path.join(cdir, f)))
+            except OSError:
+                pass
+
+        # Remove the least recently used libraries until we fit
+        csize = sum(s for m, s, p in libs)
+        for mtime, size, path in sorted(libs):
+            if csize <= self._cachesize:
+                break
+
+            if path != self._cpath and self._cache_remove(path):
+                csize -= size
+
+        # Along with the lock files of any libraries which are not present
+        lpaths = {p + '.lock' for m, s, p in libs}
+        for f in fnmatch.filter(files, platform_libname('*') + '.lock'):
+            path = os.path.join(cdir, f)
+            if path not in lpaths and path != self._cpath + '.lock':
+                self._cache_remove(path[:-5])
+
+    def _cache_remove(self, path):
+        # Only remove libraries which no other process is building
+        try:
+            lockf = lock_file(path + '.lock', block=False)
+        except OSError:
+            return False
+
+        # Removing the lock file whilst holding it is safe as processes
+        # waiting on the file will notice it is gone and try again
+        try:
+            for p in [path, path + '.lock']:
+                if os.path.exists(p):
+                    rm(p)
+
+            return True
+        except OSError:
+            return False
+        finally:
+            lockf.close()
+
+    @abstractmethod
+    def _build_cmd(self, tmpdir):
+        pass
+
     @abstractmethod
-    def _build(self, tmpdir):
+    def _cache_key(self):
         pass
 
 
@@ -60,7 +310,17 @@ class GccSourceModule(SourceModule):
         # Delegate
         super().__init__(src, cfg)
 
-    def _build(self, tmpdir):
+    def _cc_cmd(self, cn, ln):
+        return [self._cc,
+                '-shared',        # Create a shared library
+                '-std=c99',       # Enable C99 support
+                '-Ofast',         # Optimise, incl. -ffast-math
+                '-march=native',  # Use CPU-specific instructions
+                '-fopenmp',       # Enable OpenMP support
+                '-fPIC',          # Position-independent code for shared lib
+                '-o', ln, cn] + self._cflags
+
+    def _build_cmd(self, tmpdir):
         # File names
         cn, ln = 'tmp.c', platform_libname('tmp')
 
@@ -68,15 +328,97 @@ class GccSourceModule(SourceModule):
         with open(os.path.join(tmpdir, cn), 'w') as f:
             f.write(self.src)
 
-        # Compile and link
-        cmd = [self._cc,
-               '-shared',        # Create a shared library
-               '-std=c99',       # Enable C99 support
-               '-Ofast',         # Optimise, incl. -ffast-math
-               '-march=native',  # Use CPU-specific instructions
-               '-fopenmp',       # Enable OpenMP support
-               '-fPIC',          # Position-independent code for shared lib
-               '-o', ln, cn]
-        call_capture_output(cmd + self._cflags, cwd=tmpdir)
-
-        return ln
+        return self._cc_cmd(cn, ln), ln
+
+    def _cache_key(self):
+        ident = _cc_ident(self._cc)
+
+        return list(ident) + self._cc_cmd('', '') if ident else None
+
+
+class DeferredFunction(object):
+    def __init__(self, pool, mod, name, restype, argtypes):
+        self._pool = pool
+        self._mod = mod
+        self._fargs = (name, restype, argtypes)
+
+        # Kernel attributes to rebind once the function is available
+        self._targets = []
+
+    def __call__(self, *args):
+        # Complete any outstanding builds; this rebinds our targets
+        self._pool.finish()
+
+        return self.resolve()(*args)
+
+    def bind(self, obj, attr):
+        self._targets.append((obj, attr))
+
+    def resolve(self):
+        fn = self._mod.function(*self._fargs)
+
+        # Replace ourself with the real function
+        for obj, attr in self._targets:
+            setattr(obj, attr, fn)
+
+        self._targets.clear()
+
+        return fn
+
+
+class SourceModulePool(object):
+    def __init__(self, njobs):
+        self.njobs = njobs
+
+        # Modules being built by us and those being built by others
+        self._building = deque()
+        self._waiting = []
+
+        # Functions whose modules have yet to be built
+        self._deferred = []
+
+    def function(self, mod, name, restype, argtypes):
+        # Limit the number of concurrent builds
+        while len(self._building) >= self.njobs:
+            self._building.popleft().finish()
+
+        # Start the build
+        if mod.start():
+            self._building.append(mod)
+        elif not mod.loaded:
+            self._waiting.append(mod)
+
+        if mod.loaded:
+            return mod.function(name, restype, argtypes)
+        else:
+            fn = DeferredFunction(self, mod, name, restype, argtypes)
+            self._deferred.append(fn)
+
+            return fn
+
+    @property
+    def pending(self):
+        return bool(self._building or self._waiting or self._deferred)
+
+    def bind(self, kernel, **fns):
+        for attr, fn in fns.items():
+            setattr(kernel, attr, fn)
+
+            # Arrange for deferred functions to be replaced when ready
+            if isinstance(fn, DeferredFunction):
+                fn.bind(kernel, attr)
+
+        return kernel
+
+    def finish(self):
+        # Complete our own builds before waiting on anyone else so as to
+        # release any cache locks which we hold
+        while self._building:
+            self._building.popleft().finish()
+
+        while self._waiting:
+            self._waiting.pop().finish()
+
+        # Bind the now available functions to their kernels
+        while self._deferred:
+            self._deferred.pop().resolve()
@@ -18,10 +18,10 @@ class OpenMPPackingKernels(OpenMPKernelProvider, BasePackingKernels):
 
         class PackXchgViewKernel(ComputeKernel):
             def run(self, queue):
-                kern(v.n, v.nvrow, v.nvcol, v.basedata, v.mapping,
-                     v.cstrides or 0, v.rstrides or 0, m)
+                self.kern(v.n, v.nvrow, v.nvcol, v.basedata, v.mapping,
+                          v.cstrides or 0, v.rstrides or 0, m)
 
-        return PackXchgViewKernel()
+        return self._bind_kernel(PackXchgViewKernel(), kern=kern)
 
     def unpack(self, mv):
         # No-op
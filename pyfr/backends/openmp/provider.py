@@ -11,7 +11,13 @@ class OpenMPKernelProvider(BaseKernelProvider):
     @memoize
     def _build_kernel(self, name, src, argtypes, restype=None):
         mod = GccSourceModule(src, self.backend.cfg)
-        return mod.function(name, restype, argtypes)
+
+        # Build the module concurrently with any others; the function
+        # will be bound once the backend is committed
+        return self.backend.srcpool.function(mod, name, restype, argtypes)
+
+    def _bind_kernel(self, kernel, **fns):
+        return self.backend.srcpool.bind(kernel, **fns)
 
 
 class OpenMPPointwiseKernelProvider(OpenMPKernelProvider,
@@ -21,6 +27,6 @@ class OpenMPPointwiseKernelProvider(OpenMPKernelProvider,
     def _instantiate_kernel(self, dims, fun, arglst):
         class PointwiseKernel(ComputeKernel):
             def run(self, queue, **kwargs):
-                fun(*[kwargs.get(ka, ka) for ka in arglst])
+                self.fun(*[kwargs.get(ka, ka) for ka in arglst])
 
-        return PointwiseKernel()
+        return self._bind_kernel(PointwiseKernel(), fun=fun)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import pickle
+import uuid
+
+import numpy as np
+
+from pyfr._version import __version__
+from pyfr.util import rm
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def default_cachedir():
+    cdir = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    return os.path.join(cdir, 'pyfr')
+
+
+def lock_file(path, block=True):
+    while True:
+        lockf = open(path, 'a')
+
+        # The lock is released when the file is closed; where locking is
+        # unsupported we fall back to unsynchronised access
+        if not fcntl:
+            return lockf
+
+        lflags = fcntl.LOCK_EX | (0 if block else fcntl.LOCK_NB)
+
+        try:
+            fcntl.flock(lockf, lflags)
+        except BlockingIOError:
+            lockf.close()
+            raise
+        except OSError:
+            return lockf
+
+        # Lock files may be removed by their holder, in which case we
+        # need to try again with the new file
+        try:
+            if os.path.samestat(os.fstat(lockf.fileno()), os.stat(path)):
+                return lockf
+        except FileNotFoundError:
+            pass
+
+        lockf.close()
+
+
+def _load_op(path):
+    try:
+        with np.load(path) as f:
+            return f['op']
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def cached_op(key, fn, cdir=None):
+    if 'PYFR_DEBUG_NO_OP_CACHE' in os.environ:
+        return fn()
+
+    # Hash the key along with our version
+    h = hashlib.sha256(__version__.encode())
+    for k in key:
+        h.update(pickle.dumps(k, protocol=2))
+
+    cdir = cdir or os.path.join(default_cachedir(), 'ops')
+    path = os.path.join(cdir, h.hexdigest() + '.npz')
+
+    # See if the operator is already in the cache
+    op = _load_op(path)
+    if op is not None:
+        return op
+
+    # Otherwise take the lock for the entry so that only one process
+    # computes and writes it; if this fails then just compute it
+    try:
+        os.makedirs(cdir, exist_ok=True)
+        lockf = lock_file(path + '.lock')
+    except OSError:
+        return fn()
+
+    try:
+        # The operator may have been added whilst acquiring the lock
+        op = _load_op(path)
+        if op is not None:
+            return op
+
+        op = fn()
+
+        # Write the operator out and then atomically rename it
+        tpath = os.path.join(cdir, str(uuid.uuid4()) + '.npz')
+        try:
+            np.savez(tpath, op=op)
+            os.replace(tpath, path)
+        except OSError:
+            try:
+                rm(tpath)
+            except OSError:
+                pass
+
+        return op
+    finally:
+        lockf.close()
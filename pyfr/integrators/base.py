@@ -10,6 +10,7 @@ import numpy as np
 from pyfr.inifile import Inifile
 from pyfr.mpiutil import get_comm_rank_root, get_mpi
 from pyfr.plugins import get_plugin
+from pyfr.timer import startup_timer
 from pyfr.util import memoize, proxylist
 
 
@@ -54,7 +55,9 @@ class BaseIntegrator(object, metaclass=ABCMeta):
         nreg = self._stepper_nregs
 
         # Construct the relevant mesh partition
-        self.system = systemcls(backend, rallocs, mesh, initsoln, nreg, cfg)
+        with startup_timer('system'):
+            self.system = systemcls(backend, rallocs, mesh, initsoln, nreg,
+                                    cfg)
 
         # Storage register banks
         self._regs, self._regidx = self._get_reg_banks(nreg)
@@ -81,7 +84,8 @@ class BaseIntegrator(object, metaclass=ABCMeta):
         self._wstart = time.time()
 
         # Event handlers for advance_to
-        self.completed_step_handlers = proxylist(self._get_plugins())
+        with startup_timer('plugins'):
+            self.completed_step_handlers = proxylist(self._get_plugins())
 
         # Delete the memory-intensive elements map from the system
         del self.system.ele_map
@@ -201,3 +205,11 @@ class BaseIntegrator(object, metaclass=ABCMeta):
 
         stats.set('solver-time-integrator', 'tcurr', self.tcurr)
         stats.set('solver-time-integrator', 'wall-time', wtime)
+
+        # Allow the backend to report its own statistics
+        self.backend.collect_stats(stats)
+
+        # Start-up times reduced over all ranks; these are incomplete
+        # until start-up has finished, as when writing the initial solution
+        if startup_timer.closed:
+            startup_timer.collect_stats(stats, 'startup-time')
@@ -82,3 +82,17 @@ def get_mpi(attr):
     from mpi4py import MPI
 
     return getattr(MPI, attr.upper())
+
+
+def get_local_size():
+    envs = ['OMPI_COMM_WORLD_LOCAL_SIZE', 'MV2_COMM_WORLD_LOCAL_SIZE']
+
+    for ev in envs:
+        if ev in os.environ:
+            return int(os.environ[ev])
+    else:
+        from mpi4py import MPI
+
+        hostn = MPI.Get_processor_name()
+
+        return MPI.COMM_WORLD.allgather(hostn).count(hostn)
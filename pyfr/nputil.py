@@ -78,6 +78,49 @@ def fuzzysort(arr, idx, dim=0, tol=1e-6):
     return srtdidx
 
 
+def fuzzysort_batch(arr, tol=1e-6):
+    ndims, nbatch, n = arr.shape
+    rows = np.arange(nbatch)[:,None]
+
+    # Current ordering of each batch and the groups within it
+    srtdidx = np.tile(np.arange(n), (nbatch, 1))
+    grp = np.zeros((nbatch, n), dtype=np.int64)
+
+    for arrd in arr:
+        # Stable sort within each group by this dimension
+        idx = np.lexsort((arrd[rows, srtdidx], grp))
+        srtdidx = srtdidx[rows, idx]
+
+        # Split the groups into runs that agree to within the tolerance
+        arrd = arrd[rows, srtdidx]
+        ngrp, ix = np.zeros_like(grp), arrd[:,0]
+        for j in range(1, n):
+            split = (grp[:,j] != grp[:,j - 1]) | (arrd[:,j] - ix >= tol)
+            ix = np.where(split, arrd[:,j], ix)
+            ngrp[:,j] = ngrp[:,j - 1] + split
+
+        grp = ngrp
+
+    return srtdidx
+
+
+def bitround(arr, nbits):
+    # Number of mantissa bits to discard
+    ndrop = np.finfo(arr.dtype).nmant - nbits
+    if ndrop <= 0:
+        return arr
+
+    # Operate on the bit patterns of the floats
+    itype = np.dtype('u{0}'.format(arr.dtype.itemsize)).type
+    bits = np.ascontiguousarray(arr).view(itype)
+
+    # Round to nearest, letting any carry propagate into the exponent
+    half = itype(1) << itype(ndrop - 1)
+    mask = ~((itype(1) << itype(ndrop)) - itype(1))
+
+    return ((bits + half) & mask).view(arr.dtype)
+
+
 _ctype_map = {
     np.int32: 'int', np.uint32: 'unsigned int',
     np.int64: 'long long', np.uint64: 'unsigned long long',
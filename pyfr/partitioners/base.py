@@ -88,12 +88,8 @@ class BasePartitioner(object):
         return newmesh
 
     def _combine_soln_parts(self, soln):
-        newsoln = defaultdict(list)
-
-        for f, (en, shape) in soln.array_info('soln').items():
-            newsoln['soln_{0}_p0'.format(en)].append(soln[f])
-
-        newsoln = {k: np.dstack(v) for k, v in newsoln.items()}
+        newsoln = {'soln_{0}_p0'.format(en): v
+                   for en, v in soln.combine_partitions('soln').items()}
         newsoln['config'] = soln['config']
         newsoln['stats'] = soln['stats']
 
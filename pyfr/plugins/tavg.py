@@ -31,7 +31,7 @@ class TavgPlugin(BasePlugin):
         basedir = self.cfg.getpath(cfgsect, 'basedir', '.')
         basename = self.cfg.get(cfgsect, 'basename')
         self._writer = NativeWriter(intg, len(self.exprs), basedir, basename,
-                                    prefix='tavg')
+                                    prefix='tavg', cfgsect=cfgsect)
 
         # Time averaging parameters
         self.dtout = self.cfg.getfloat(cfgsect, 'dt-out')
@@ -16,7 +16,7 @@ class WriterPlugin(BasePlugin):
         basedir = self.cfg.getpath(cfgsect, 'basedir', '.')
         basename = self.cfg.get(cfgsect, 'basename')
         self._writer = NativeWriter(intg, self.nvars, basedir, basename,
-                                    prefix='soln')
+                                    prefix='soln', cfgsect=cfgsect)
 
         # Output time step and next output time
         self.dt_out = self.cfg.getfloat(cfgsect, 'dt-out')
@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 
-from collections import Iterable
 from math import sqrt
 
 import numpy as np
@@ -10,7 +9,7 @@ from pyfr.util import lazyprop, subclass_where
 
 
 def jacobi(n, a, b, z):
-    j = [1]
+    j = [np.ones_like(z)]
 
     if n >= 1:
         j.append(((a + b + 2)*z + a - b) / 2)
@@ -32,7 +31,7 @@ def jacobi(n, a, b, z):
 
 
 def jacobi_diff(n, a, b, z):
-    dj = [0]
+    dj = [np.zeros_like(z)]
 
     if n >= 1:
         dj.extend(jp*(i + a + b + 2)/2
@@ -54,19 +53,15 @@ class BasePolyBasis(object):
 
     @chop
     def ortho_basis_at(self, pts):
-        if len(pts) and not isinstance(pts[0], Iterable):
-            pts = [(p,) for p in pts]
+        pts = self._pts_comps(pts)
 
-        return np.array([self.ortho_basis_at_py(*p) for p in pts]).T
+        return np.array(self._ortho_basis_at(*pts), order='F')
 
     @chop
     def jac_ortho_basis_at(self, pts):
-        if len(pts) and not isinstance(pts[0], Iterable):
-            pts = [(p,) for p in pts]
+        pts = self._pts_comps(pts)
 
-        J = [self.jac_ortho_basis_at_py(*p) for p in pts]
-
-        return np.array(J).swapaxes(0, 2)
+        return np.array(self._jac_ortho_basis_at(*pts)).swapaxes(0, 1)
 
     @chop
     def nodal_basis_at(self, epts):
@@ -80,17 +75,29 @@ class BasePolyBasis(object):
     def vdm(self):
         return self.ortho_basis_at(self.pts)
 
+    def modes_upto(self, degree):
+        return [i for i, d in enumerate(self.degrees) if d <= degree]
+
+    def _pts_comps(self, pts):
+        pts = np.asarray(pts, dtype=np.float64)
+
+        if pts.ndim == 1:
+            pts = pts[:, None]
+
+        # Split into per-dimension arrays
+        return list(pts.T)
+
 
 class LinePolyBasis(BasePolyBasis):
     name = 'line'
 
-    def ortho_basis_at_py(self, p):
+    def _ortho_basis_at(self, p):
         jp = jacobi(self.order - 1, 0, 0, p)
         return [sqrt(i + 0.5)*p for i, p in enumerate(jp)]
 
-    def jac_ortho_basis_at_py(self, p):
+    def _jac_ortho_basis_at(self, p):
         djp = jacobi_diff(self.order - 1, 0, 0, p)
-        return [sqrt(i + 0.5)*p for i, p in enumerate(djp)]
+        return [[sqrt(i + 0.5)*p] for i, p in enumerate(djp)]
 
     @lazyprop
     def degrees(self):
@@ -100,13 +107,14 @@ class LinePolyBasis(BasePolyBasis):
 class TriPolyBasis(BasePolyBasis):
     name = 'tri'
 
-    def ortho_basis_at_py(self, p, q):
-        a = 2*(1 + p)/(1 - q) - 1 if q != 1 else -1
+    def _ortho_basis_at(self, p, q):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = np.where(q != 1, 2*(1 + p)/(1 - q) - 1, -1)
         b = q
 
         ob = []
         for i, pi in enumerate(jacobi(self.order - 1, 0, 0, a)):
-            pa = pi*(1 - b)**i
+            pa = pi*np.power(1 - b, i)
 
             for j, pj in enumerate(jacobi(self.order - i - 1, 2*i + 1, 0, b)):
                 cij = sqrt((2*i + 1)*(2*i + 2*j + 2)) / 2**(i + 1)
@@ -115,8 +123,9 @@ class TriPolyBasis(BasePolyBasis):
 
         return ob
 
-    def jac_ortho_basis_at_py(self, p, q):
-        a = 2*(1 + p)/(1 - q) - 1 if q != 1 else -1
+    def _jac_ortho_basis_at(self, p, q):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = np.where(q != 1, 2*(1 + p)/(1 - q) - 1, -1)
         b = q
 
         f = jacobi(self.order - 1, 0, 0, a)
@@ -130,10 +139,10 @@ class TriPolyBasis(BasePolyBasis):
             for j, (gj, dgj) in enumerate(zip(g, dg)):
                 cij = sqrt((2*i + 1)*(2*i + 2*j + 2)) / 2**(i + 1)
 
-                tmp = (1 - b)**(i - 1) if i > 0 else 1
+                tmp = np.power(1 - b, i - 1) if i > 0 else 1
 
                 pij = 2*tmp*dfi*gj
-                qij = tmp*(-i*fi + (1 + a)*dfi)*gj + (1 - b)**i*fi*dgj
+                qij = tmp*(-i*fi + (1 + a)*dfi)*gj + np.power(1 - b, i)*fi*dgj
 
                 ob.append([cij*pij, cij*qij])
 
@@ -149,14 +158,14 @@ class TriPolyBasis(BasePolyBasis):
 class QuadPolyBasis(BasePolyBasis):
     name = 'quad'
 
-    def ortho_basis_at_py(self, p, q):
+    def _ortho_basis_at(self, p, q):
         sk = [sqrt(k + 0.5) for k in range(self.order)]
         pa = [c*jp for c, jp in zip(sk, jacobi(self.order - 1, 0, 0, p))]
         pb = [c*jp for c, jp in zip(sk, jacobi(self.order - 1, 0, 0, q))]
 
         return [pi*pj for pi in pa for pj in pb]
 
-    def jac_ortho_basis_at_py(self, p , q):
+    def _jac_ortho_basis_at(self, p , q):
         sk = [sqrt(k + 0.5) for k in range(self.order)]
         pa = [c*jp for c, jp in zip(sk, jacobi(self.order - 1, 0, 0, p))]
         pb = [c*jp for c, jp in zip(sk, jacobi(self.order - 1, 0, 0, q))]
@@ -176,17 +185,18 @@ class QuadPolyBasis(BasePolyBasis):
 class TetPolyBasis(BasePolyBasis):
     name = 'tet'
 
-    def ortho_basis_at_py(self, p, q, r):
-        a = -2*(1 + p)/(q + r) - 1 if r != -q else -1
-        b = 2*(1 + q)/(1 - r) - 1 if r != 1 else -1
+    def _ortho_basis_at(self, p, q, r):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = np.where(r != -q, -2*(1 + p)/(q + r) - 1, -1)
+            b = np.where(r != 1, 2*(1 + q)/(1 - r) - 1, -1)
         c = r
 
         ob = []
         for i, pi in enumerate(jacobi(self.order - 1, 0, 0, a)):
-            ci = 2**(-2*i - 1)*sqrt(2*i + 1)*(1 - b)**i
+            ci = 2**(-2*i - 1)*sqrt(2*i + 1)*np.power(1 - b, i)
 
             for j, pj in enumerate(jacobi(self.order - i - 1, 2*i + 1, 0, b)):
-                cj = sqrt(i + j + 1)*2**-j*(1 - c)**(i + j)
+                cj = sqrt(i + j + 1)*2**-j*np.power(1 - c, i + j)
                 cij = ci*cj
                 pij = pi*pj
 
@@ -198,9 +208,10 @@ class TetPolyBasis(BasePolyBasis):
 
         return ob
 
-    def jac_ortho_basis_at_py(self, p, q, r):
-        a = -2*(1 + p)/(q + r) - 1 if r != -q else -1
-        b = 2*(1 + q)/(1 - r) - 1 if r != 1 else -1
+    def _jac_ortho_basis_at(self, p, q, r):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = np.where(r != -q, -2*(1 + p)/(q + r) - 1, -1)
+            b = np.where(r != 1, 2*(1 + q)/(1 - r) - 1, -1)
         c = r
 
         f = jacobi(self.order - 1, 0, 0, a)
@@ -222,18 +233,19 @@ class TetPolyBasis(BasePolyBasis):
                     ck = sqrt(2*(k + j + i) + 3)
                     cijk = cij*ck
 
-                    tmp1 = (1 - c)**(i + j - 1) if i + j > 0 else 1
-                    tmp2 = tmp1*(1 - b)**(i - 1) if i > 0 else 1
+                    tmp1 = np.power(1 - c, i + j - 1) if i + j > 0 else 1
+                    tmp2 = tmp1*np.power(1 - b, i - 1) if i > 0 else 1
 
                     pijk = 4*tmp2*dfi*gj*hk
                     qijk = 2*(tmp2*(-i*fi + (1 + a)*dfi)*gj
-                              + tmp1*(1 - b)**i*fi*dgj)*hk
+                              + tmp1*np.power(1 - b, i)*fi*dgj)*hk
 
                     rijk = (
                         2*(1 + a)*tmp2*dfi*gj*hk
-                        + (1 + b)*tmp1*(1 - b)**i*fi*dgj*hk
-                        + (1 - c)**(i + j)*(1 - b)**i*fi*gj*dhk
-                        - (i*(1 + b)*tmp2 + (i + j)*tmp1*(1 - b)**i)*fi*gj*hk
+                        + (1 + b)*tmp1*np.power(1 - b, i)*fi*dgj*hk
+                        + np.power(1 - c, i + j)*np.power(1 - b, i)*fi*gj*dhk
+                        - (i*(1 + b)*tmp2
+                           + (i + j)*tmp1*np.power(1 - b, i))*fi*gj*hk
                     )
 
                     ob.append([cijk*pijk, cijk*qijk, cijk*rijk])
@@ -251,14 +263,15 @@ class TetPolyBasis(BasePolyBasis):
 class PriPolyBasis(BasePolyBasis):
     name = 'pri'
 
-    def ortho_basis_at_py(self, p, q, r):
-        a = 2*(1 + p)/(1 - q) - 1 if q != 1 else -1
+    def _ortho_basis_at(self, p, q, r):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = np.where(q != 1, 2*(1 + p)/(1 - q) - 1, -1)
         b = q
         c = r
 
         pab = []
         for i, pi in enumerate(jacobi(self.order - 1, 0, 0, a)):
-            ci = (1 - b)**i / 2**(i + 1)
+            ci = np.power(1 - b, i) / 2**(i + 1)
 
             for j, pj in enumerate(jacobi(self.order - i - 1, 2*i + 1, 0, b)):
                 cij = sqrt((2*i + 1)*(2*i + 2*j + 2))*ci
@@ -270,8 +283,9 @@ class PriPolyBasis(BasePolyBasis):
 
         return [pij*pk for pij in pab for pk in pc]
 
-    def jac_ortho_basis_at_py(self, p, q, r):
-        a = 2*(1 + p)/(1 - q) - 1 if q != 1 else -1
+    def _jac_ortho_basis_at(self, p, q, r):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = np.where(q != 1, 2*(1 + p)/(1 - q) - 1, -1)
         b = q
         c = r
 
@@ -286,11 +300,11 @@ class PriPolyBasis(BasePolyBasis):
             for j, (gj, dgj) in enumerate(zip(g, dg)):
                 cij = sqrt((2*i + 1)*(2*i + 2*j + 2)) / 2**(i + 1)
 
-                tmp = (1 - b)**(i - 1) if i > 0 else 1
+                tmp = np.power(1 - b, i - 1) if i > 0 else 1
 
                 pij = 2*tmp*dfi*gj
-                qij = tmp*(-i*fi + (1 + a)*dfi)*gj + (1 - b)**i*fi*dgj
-                rij = (1 - b)**i*fi*gj
+                qij = tmp*(-i*fi + (1 + a)*dfi)*gj + np.power(1 - b, i)*fi*dgj
+                rij = np.power(1 - b, i)*fi*gj
 
                 pab.append([cij*pij, cij*qij, cij*rij])
 
@@ -312,9 +326,10 @@ class PriPolyBasis(BasePolyBasis):
 class PyrPolyBasis(BasePolyBasis):
     name = 'pyr'
 
-    def ortho_basis_at_py(self, p, q, r):
-        a = 2*p/(1 - r) if r != 1 else 0
-        b = 2*q/(1 - r) if r != 1 else 0
+    def _ortho_basis_at(self, p, q, r):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = np.where(r != 1, 2*p/(1 - r), 0)
+            b = np.where(r != 1, 2*q/(1 - r), 0)
         c = r
 
         sk = [2**(-k - 0.25)*sqrt(k + 0.5)
@@ -325,7 +340,7 @@ class PyrPolyBasis(BasePolyBasis):
         ob = []
         for i, pi in enumerate(pa):
             for j, pj in enumerate(pb):
-                cij = (1 - c)**(i + j)
+                cij = np.power(1 - c, i + j)
                 pij = pi*pj
 
                 pc = jacobi(self.order - max(i, j) - 1, 2*(i + j + 1), 0, c)
@@ -336,9 +351,10 @@ class PyrPolyBasis(BasePolyBasis):
 
         return ob
 
-    def jac_ortho_basis_at_py(self, p, q, r):
-        a = 2*p/(1 - r) if r != 1 else 0
-        b = 2*q/(1 - r) if r != 1 else 0
+    def _jac_ortho_basis_at(self, p, q, r):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = np.where(r != 1, 2*p/(1 - r), 0)
+            b = np.where(r != 1, 2*q/(1 - r), 0)
         c = r
 
         sk = [2**(-k - 0.25)*sqrt(k + 0.5)
@@ -360,12 +376,12 @@ class PyrPolyBasis(BasePolyBasis):
                 for k, (hk, dhk) in enumerate(zip(h, dh)):
                     ck = sqrt(2*(k + j + i) + 3)
 
-                    tmp = (1 - c)**(i + j-1) if i + j > 0 else 1
+                    tmp = np.power(1 - c, i + j-1) if i + j > 0 else 1
 
                     pijk = 2*tmp*dfi*gj*hk
                     qijk = 2*tmp*fi*dgj*hk
                     rijk = (tmp*(a*dfi*gj + b*fi*dgj - (i + j)*fi*gj)*hk
-                            + (1 - c)**(i + j)*fi*gj*dhk)
+                            + np.power(1 - c, i + j)*fi*gj*dhk)
 
                     ob.append([ck*pijk, ck*qijk, ck*rijk])
 
@@ -382,7 +398,7 @@ class PyrPolyBasis(BasePolyBasis):
 class HexPolyBasis(BasePolyBasis):
     name = 'hex'
 
-    def ortho_basis_at_py(self, p, q, r):
+    def _ortho_basis_at(self, p, q, r):
         sk = [sqrt(k + 0.5) for k in range(self.order)]
         pa = [c*jp for c, jp in zip(sk, jacobi(self.order - 1, 0, 0, p))]
         pb = [c*jp for c, jp in zip(sk, jacobi(self.order - 1, 0, 0, q))]
@@ -390,7 +406,7 @@ class HexPolyBasis(BasePolyBasis):
 
         return [pi*pj*pk for pi in pa for pj in pb for pk in pc]
 
-    def jac_ortho_basis_at_py(self, p, q, r):
+    def _jac_ortho_basis_at(self, p, q, r):
         sk = [sqrt(k + 0.5) for k in range(self.order)]
         pa = [c*jp for c, jp in zip(sk, jacobi(self.order - 1, 0, 0, p))]
         pb = [c*jp for c, jp in zip(sk, jacobi(self.order - 1, 0, 0, q))]
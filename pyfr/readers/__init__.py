@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
-from pyfr.readers.base import BaseReader, NodalMeshAssembler
+from pyfr.readers.base import (ArrayStore, BaseReader, NodalMeshAssembler,
+                               SpillStore)
 from pyfr.readers.cgns import CGNSReader
 from pyfr.readers.gmsh import GmshReader
 
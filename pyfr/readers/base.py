@@ -3,6 +3,9 @@
 from abc import ABCMeta, abstractmethod
 from collections import defaultdict
 from itertools import chain
+import os
+import shutil
+import tempfile
 import uuid
 
 import numpy as np
@@ -19,6 +22,20 @@ class BaseReader(object, metaclass=ABCMeta):
     def _to_raw_pyfrm(self):
         pass
 
+    def _assemble_nodal(self, nodeids, nodepts, elenodes, pents, maps):
+        args = (nodeids, nodepts, elenodes, pents, maps)
+
+        # Assemble a nodal mesh, spilling to disk if our store does
+        if isinstance(self._store, SpillStore):
+            mesh = SpillMeshAssembler(*args, store=self._store)
+        else:
+            mesh = NodalMeshAssembler(*args)
+
+        rawm = {}
+        rawm.update(mesh.get_connectivity())
+        rawm.update(mesh.get_shape_points())
+        return rawm
+
     def to_pyfrm(self):
         mesh = self._to_raw_pyfrm()
 
@@ -28,6 +45,84 @@ class BaseReader(object, metaclass=ABCMeta):
         return mesh
 
 
+class ArrayStore(object):
+    def __init__(self):
+        self._arrs = {}
+
+    def __contains__(self, key):
+        return key in self._arrs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def keys(self):
+        return list(self._arrs)
+
+    def empty(self, shape, dtype):
+        return np.empty(shape, dtype=dtype)
+
+    def append(self, key, arr):
+        self._arrs.setdefault(key, []).append(arr)
+
+    def get(self, key):
+        arrs = self._arrs[key]
+        if len(arrs) > 1:
+            arrs[:] = [np.concatenate(arrs)]
+
+        return arrs[0]
+
+    def close(self):
+        self._arrs.clear()
+
+
+class SpillStore(ArrayStore):
+    def __init__(self, dirname=None):
+        self._dir = tempfile.mkdtemp(prefix='pyfr-', dir=dirname)
+        self._arrs = {}
+        self._nfiles = 0
+
+    def _new_path(self):
+        self._nfiles += 1
+        return os.path.join(self._dir, str(self._nfiles))
+
+    def empty(self, shape, dtype):
+        # Memory maps can not be empty
+        if not np.prod(shape):
+            return np.empty(shape, dtype=dtype)
+
+        return np.memmap(self._new_path(), dtype=dtype, mode='w+',
+                         shape=shape)
+
+    def append(self, key, arr):
+        arr = np.ascontiguousarray(arr)
+
+        if key not in self._arrs:
+            self._arrs[key] = [self._new_path(), arr.dtype, 0, arr.shape[1:]]
+
+        path, dtype, n, shape = self._arrs[key]
+        if arr.dtype != dtype or arr.shape[1:] != shape:
+            raise ValueError('Inconsistent array type or shape')
+
+        with open(path, 'ab') as f:
+            arr.tofile(f)
+
+        self._arrs[key][2] += len(arr)
+
+    def get(self, key):
+        path, dtype, n, shape = self._arrs[key]
+        if not n:
+            return np.empty((n,) + shape, dtype=dtype)
+
+        return np.memmap(path, dtype=dtype, mode='r', shape=(n,) + shape)
+
+    def close(self):
+        self._arrs.clear()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
 class NodalMeshAssembler(object):
     # Dimensionality of each element type
     _petype_ndim = {'tri': 2, 'quad': 2,
@@ -47,23 +142,36 @@ class NodalMeshAssembler(object):
     _petype_focount = {'line': 2, 'tri': 3, 'quad': 4,
                        'tet': 4, 'pyr': 5, 'pri': 6, 'hex': 8}
 
-    def __init__(self, nodepts, elenodes, pents, maps):
+    def __init__(self, nodeids, nodepts, elenodes, pents, maps):
         self._nodepts = nodepts
         self._elenodes = elenodes
+
+        # Map from node numbers to rows of the node array
+        self._nodemap = self._make_nodemap(nodeids)
+
         self._felespent, self._bfacespents, self._pfacespents = pents
         self._etype_map, self._petype_fnmap, self._nodemaps = maps
 
-    def _check_pyr_parallelogram(self, foeles):
-        nodepts = self._nodepts
+    def _make_nodemap(self, nodeids):
+        nodemap = np.full(np.max(nodeids) + 1, -1, dtype=np.int64)
+        nodemap[nodeids] = np.arange(len(nodeids))
 
+        return nodemap
+
+    def _get_nodepts(self, nodes):
+        idx = self._nodemap[nodes]
+        if np.any(idx < 0):
+            raise ValueError('Undefined node in mesh')
+
+        return self._nodepts[idx]
+
+    def _check_pyr_parallelogram(self, foeles):
         # Find PyFR node map for the quad face
         fnmap = self._petype_fnmap['pyr']['quad'][0]
         pfnmap = self._nodemaps.from_pyfr['quad', 4][fnmap]
 
         # Face nodes
-        fpts = np.array([[nodepts[i] for i in fidx]
-                         for fidx in foeles[:, pfnmap]])
-        fpts = fpts.swapaxes(0, 1)
+        fpts = self._get_nodepts(foeles[:, pfnmap]).swapaxes(0, 1)
 
         # Check parallelogram or not
         if np.any(np.abs(fpts[0] - fpts[1] - fpts[2] + fpts[3]) > 1e-10):
@@ -95,6 +203,9 @@ class NodalMeshAssembler(object):
 
         return selemap.pop(self._felespent), selemap
 
+    # Face connectivity type; (petype, eidx, fidx, flags)
+    _face_dtype = np.dtype('S4,i4,i1,i1')
+
     def _foface_info(self, petype, pftype, foeles):
         # Face numbers of faces of this type on this element
         fnums = self._petype_fnums[petype][pftype]
@@ -102,8 +213,11 @@ class NodalMeshAssembler(object):
         # First-order nodes associated with this face
         fnmap = self._petype_fnmap[petype][pftype]
 
-        # Connectivity; (petype, eidx, fidx, flags)
-        con = [(petype, i, j, 0) for i in range(len(foeles)) for j in fnums]
+        # Connectivity
+        con = np.zeros(len(foeles)*len(fnums), dtype=self._face_dtype)
+        con['f0'] = petype
+        con['f1'] = np.repeat(np.arange(len(foeles)), len(fnums))
+        con['f2'] = np.tile(fnums, len(foeles))
 
         # Nodes
         nodes = np.sort(foeles[:, fnmap]).reshape(len(con), -1)
@@ -119,45 +233,97 @@ class NodalMeshAssembler(object):
 
         return fofaces
 
+    def _pair_nodes(self, nodes):
+        # Stably sort the faces by their nodes
+        idx = np.lexsort(nodes.T[::-1])
+        snodes = nodes[idx]
+
+        # Group the faces with identical nodes
+        new = np.ones(len(idx), dtype=bool)
+        new[1:] = np.any(snodes[1:] != snodes[:-1], axis=1)
+        grp = np.cumsum(new) - 1
+
+        # Rank of each face within its group
+        rank = np.arange(len(idx)) - np.flatnonzero(new)[grp]
+
+        # Even-ranked faces pair with the next face in their group
+        even = rank % 2 == 0
+        last = np.ones(len(idx), dtype=bool)
+        last[:-1] = grp[1:] != grp[:-1]
+
+        # Paired faces; ordered by the appearance of the second face
+        i = np.flatnonzero(even & ~last)
+        lf, rf = idx[i], idx[i + 1]
+        srt = np.argsort(rf)
+
+        # Unpaired faces
+        ri = idx[even & last]
+
+        return lf[srt], rf[srt], ri
+
     def _pair_fluid_faces(self, ffofaces):
-        pairs = defaultdict(list)
+        pairs = {}
         resid = {}
 
         for pftype, faces in ffofaces.items():
-            for f, n in chain.from_iterable(zip(f, n) for f, n in faces):
-                sn = tuple(n)
+            con = np.concatenate([f for f, n in faces])
+            nodes = np.concatenate([n for f, n in faces])
+
+            lf, rf, ri = self._pair_nodes(nodes)
 
-                # See if the nodes are in resid
-                if sn in resid:
-                    pairs[pftype].append([resid.pop(sn), f])
-                # Otherwise add them to the unpaired dict
-                else:
-                    resid[sn] = f
+            pairs[pftype] = np.column_stack([con[lf], con[rf]])
+
+            used = np.zeros(len(ri), dtype=bool)
+            resid[pftype] = [con[ri], nodes[ri], used]
 
         return pairs, resid
 
+    def _match_resid_faces(self, resid, pftype, fnodes):
+        if pftype not in resid:
+            raise ValueError('Unpaired faces in mesh')
+
+        rcon, rnodes, rused = resid[pftype]
+
+        # Assign each distinct set of nodes a unique key
+        allnodes = np.vstack([rnodes, np.sort(fnodes, axis=1)])
+        allnodes = np.ascontiguousarray(allnodes, dtype=np.int64)
+        allnodes = allnodes.view('V{0}'.format(8*allnodes.shape[1]))
+        inv = np.unique(allnodes.ravel(), return_inverse=True)[1]
+
+        # Map from keys to unpaired faces
+        kmap = np.full(len(inv) and inv.max() + 1, -1, dtype=np.int64)
+        kmap[inv[:len(rnodes)]] = np.arange(len(rnodes))
+
+        # Locate the faces, ensuring each is used at most once
+        fidx = kmap[inv[len(rnodes):]]
+        if (np.any(fidx < 0) or np.any(rused[fidx]) or
+            len(np.unique(fidx)) != len(fidx)):
+            raise ValueError('Unpaired faces in mesh')
+
+        rused[fidx] = True
+
+        return rcon[fidx]
+
     def _pair_periodic_fluid_faces(self, bpart, resid):
         pfaces = defaultdict(list)
-        nodepts = self._nodepts
 
         for lpent, rpent in self._pfacespents.values():
             for pftype in bpart[lpent]:
                 lfnodes = bpart[lpent][pftype]
                 rfnodes = bpart[rpent][pftype]
 
-                lfpts = np.array([[nodepts[n] for n in fn] for fn in lfnodes])
-                rfpts = np.array([[nodepts[n] for n in fn] for fn in rfnodes])
+                lfpts = self._get_nodepts(lfnodes)
+                rfpts = self._get_nodepts(rfnodes)
 
                 lfidx = fuzzysort(lfpts.mean(axis=1).T, range(len(lfnodes)))
                 rfidx = fuzzysort(rfpts.mean(axis=1).T, range(len(rfnodes)))
 
-                for lfn, rfn in zip(lfnodes[lfidx], rfnodes[rfidx]):
-                    lf = resid.pop(tuple(sorted(lfn)))
-                    rf = resid.pop(tuple(sorted(rfn)))
+                lf = self._match_resid_faces(resid, pftype, lfnodes[lfidx])
+                rf = self._match_resid_faces(resid, pftype, rfnodes[rfidx])
 
-                    pfaces[pftype].append([lf, rf])
+                pfaces[pftype].append(np.column_stack([lf, rf]))
 
-        return pfaces
+        return {k: np.concatenate(v) for k, v in pfaces.items()}
 
     def _ident_boundary_faces(self, bpart, resid):
         bfaces = defaultdict(list)
@@ -166,10 +332,11 @@ class NodalMeshAssembler(object):
 
         for epent, fnodes in bpart.items():
             if epent in bpents:
-                for fn in chain.from_iterable(fnodes.values()):
-                    bfaces[epent].append(resid.pop(tuple(sorted(fn))))
+                for pftype, fn in fnodes.items():
+                    bf = self._match_resid_faces(resid, pftype, fn)
+                    bfaces[epent].append(bf)
 
-        return bfaces
+        return {k: np.concatenate(v) for k, v in bfaces.items()}
 
     def get_connectivity(self):
         # For connectivity a first-order representation is sufficient
@@ -190,35 +357,32 @@ class NodalMeshAssembler(object):
         # Identify the fixed boundary faces
         bf = self._ident_boundary_faces(bpart, resid)
 
-        if any(resid.values()):
+        if any(not np.all(rused) for rcon, rnodes, rused in resid.values()):
             raise ValueError('Unpaired faces in mesh')
 
         # Flattern the face-pair dicts
-        pairs = chain(chain.from_iterable(fpairs.values()),
-                      chain.from_iterable(pfpairs.values()))
+        pairs = chain(fpairs.values(), pfpairs.values())
 
         # Generate the internal connectivity array
-        con = list(pairs)
+        con = [np.empty((0, 2), dtype=self._face_dtype)]
+        con = np.concatenate(con + list(pairs))
 
         # Generate boundary condition connectivity arrays
         bcon = {}
         for pbcrgn, pent in self._bfacespents.items():
-            bcon[pbcrgn] = bf[pent]
+            bcon[pbcrgn] = bf.get(pent, np.empty(0, dtype=self._face_dtype))
 
         # Output
-        ret = {'con_p0': np.array(con, dtype='S4,i4,i1,i1').T}
+        ret = {'con_p0': con.T}
 
         for k, v in bcon.items():
-            ret['bcon_{0}_p0'.format(k)] = np.array(v, dtype='S4,i4,i1,i1')
+            ret['bcon_{0}_p0'.format(k)] = v
 
         return ret
 
     def get_shape_points(self):
         spts = {}
 
-        # Global node map (node index to coords)
-        nodepts = self._nodepts
-
         for etype, pent in self._elenodes:
             if pent != self._felespent:
                 continue
@@ -234,10 +398,221 @@ class NodalMeshAssembler(object):
             ndim = self._petype_ndim[petype]
 
             # Build the array
-            arr = np.array([[nodepts[i] for i in nn] for nn in peles])
-            arr = arr.swapaxes(0, 1)
+            arr = self._get_nodepts(peles).swapaxes(0, 1)
             arr = arr[..., :ndim]
 
             spts['spt_{0}_p0'.format(petype)] = arr
 
         return spts
+
+
+class SpillMeshAssembler(NodalMeshAssembler):
+    # Number of elements to process at a time
+    _chunksize = 2**18
+
+    # Approximate number of faces in each bucket
+    _bucketsize = 2**23
+
+    def __init__(self, nodeids, nodepts, elenodes, pents, maps, store):
+        self._store = store
+
+        super().__init__(nodeids, nodepts, elenodes, pents, maps)
+
+    def _chunks(self, n):
+        for i in range(0, n, self._chunksize):
+            yield i, min(i + self._chunksize, n)
+
+    def _make_nodemap(self, nodeids):
+        nodemap = self._store.empty(np.max(nodeids) + 1, np.int64)
+        nodemap[:] = -1
+
+        for i, j in self._chunks(len(nodeids)):
+            nodemap[nodeids[i:j]] = np.arange(i, j)
+
+        return nodemap
+
+    def _split_parts(self):
+        fpart, bpart = {}, defaultdict(dict)
+
+        for (etype, epent), eles in self._elenodes.items():
+            petype = self._etype_map[etype][0]
+
+            # Fluid elements are left on disk
+            if epent == self._felespent:
+                fpart[petype] = eles
+
+                # Check if pyramids have a parallelogram base or not
+                if petype == 'pyr':
+                    for i, j in self._chunks(len(eles)):
+                        self._check_pyr_parallelogram(eles[i:j, :5])
+            # Whereas boundary elements are small enough to load
+            else:
+                focount = self._petype_focount[petype]
+                bpart[epent][petype] = np.array(eles[:, :focount])
+
+        return fpart, bpart
+
+    def _spill_buckets(self, key, bidx, arr):
+        srt = np.argsort(bidx, kind='mergesort')
+        bidx, arr = bidx[srt], arr[srt]
+
+        ubidx, start = np.unique(bidx, return_index=True)
+        for b, barr in zip(ubidx, np.split(arr, start[1:])):
+            self._store.append(key + (int(b),), barr)
+
+    def _spill_faces(self, pftype, eles):
+        finfo, nfaces = [], 0
+
+        # Faces are numbered by element type, element and face
+        for petype, peles in eles:
+            fnums = self._petype_fnums[petype][pftype]
+            finfo.append((petype, nfaces, fnums))
+            nfaces += len(fnums)*len(peles)
+
+        # Number of buckets
+        nb = max(1, -(-nfaces // self._bucketsize))
+
+        for (petype, off, fnums), (petype, peles) in zip(finfo, eles):
+            focount = self._petype_focount[petype]
+
+            for i, j in self._chunks(len(peles)):
+                foeles = np.asarray(peles[i:j, :focount])
+                nodes = self._foface_info(petype, pftype, foeles)[1]
+
+                # Bucket the faces by their lowest node
+                fidx = off + len(fnums)*i + np.arange(len(nodes))
+                arr = np.column_stack([fidx, nodes])
+                self._spill_buckets(('faces', pftype), nodes[:, 0] % nb, arr)
+
+        return finfo, nfaces, nb
+
+    def _pair_spilt_faces(self, pftype, nfaces, nb):
+        store = self._store
+        rfidx, rnodes, npairs = [], [], 0
+
+        for b in range(nb):
+            if ('faces', pftype, b) not in store:
+                continue
+
+            arr = np.asarray(store.get(('faces', pftype, b)))
+            fidx, nodes = arr[:, 0], arr[:, 1:]
+
+            lf, rf, ri = self._pair_nodes(nodes)
+
+            # Bucket the pairs by the number of their second face
+            pairs = np.column_stack([fidx[lf], fidx[rf]])
+            self._spill_buckets(('pairs', pftype), fidx[rf]*nb // nfaces,
+                                pairs)
+
+            rfidx.append(fidx[ri])
+            rnodes.append(nodes[ri])
+            npairs += len(lf)
+
+        return np.concatenate(rfidx), np.concatenate(rnodes), npairs
+
+    def _face_con(self, finfo, fidx):
+        petypes, offs, fnums = zip(*finfo)
+
+        # Element type, element number and face number tables
+        nfnums = np.array([len(fn) for fn in fnums])
+        tfnums = np.zeros((len(fnums), max(nfnums)), dtype=np.int64)
+        for i, fn in enumerate(fnums):
+            tfnums[i, :len(fn)] = fn
+
+        k = np.searchsorted(offs, fidx, side='right') - 1
+        l = fidx - np.array(offs)[k]
+
+        con = np.zeros(len(fidx), dtype=self._face_dtype)
+        con['f0'] = np.array(petypes, dtype='S4')[k]
+        con['f1'] = l // nfnums[k]
+        con['f2'] = tfnums[k, l % nfnums[k]]
+
+        return con
+
+    def get_connectivity(self):
+        # Split into fluid and boundary parts
+        fpart, bpart = self._split_parts()
+
+        # Group the fluid elements by face type
+        ffaces = defaultdict(list)
+        for petype, eles in fpart.items():
+            for pftype in self._petype_fnums[petype]:
+                ffaces[pftype].append((petype, eles))
+
+        # Pair the fluid-fluid faces one bucket at a time
+        finfo, resid, npairs = {}, {}, 0
+        for pftype, eles in ffaces.items():
+            fi, nfaces, nb = self._spill_faces(pftype, eles)
+            rfidx, rnodes, n = self._pair_spilt_faces(pftype, nfaces, nb)
+
+            used = np.zeros(len(rfidx), dtype=bool)
+            resid[pftype] = [self._face_con(fi, rfidx), rnodes, used]
+            finfo[pftype] = fi, nb
+            npairs += n
+
+        # Identify periodic boundary face pairs
+        pfpairs = self._pair_periodic_fluid_faces(bpart, resid)
+
+        # Identify the fixed boundary faces
+        bf = self._ident_boundary_faces(bpart, resid)
+
+        if any(not np.all(rused) for rcon, rnodes, rused in resid.values()):
+            raise ValueError('Unpaired faces in mesh')
+
+        # Generate the internal connectivity array on disk
+        npairs += sum(len(v) for v in pfpairs.values())
+        con = self._store.empty((2, npairs), self._face_dtype)
+
+        i = 0
+        for pftype, (fi, nb) in finfo.items():
+            for b in range(nb):
+                if ('pairs', pftype, b) not in self._store:
+                    continue
+
+                pairs = np.asarray(self._store.get(('pairs', pftype, b)))
+                pairs = pairs[np.argsort(pairs[:, 1])]
+
+                for j, fidx in enumerate(pairs.T):
+                    con[j, i:i + len(pairs)] = self._face_con(fi, fidx)
+
+                i += len(pairs)
+
+        for pairs in pfpairs.values():
+            con[:, i:i + len(pairs)] = pairs.T
+            i += len(pairs)
+
+        # Generate boundary condition connectivity arrays
+        ret = {'con_p0': con}
+
+        for pbcrgn, pent in self._bfacespents.items():
+            bcon = bf.get(pent, np.empty(0, dtype=self._face_dtype))
+            ret['bcon_{0}_p0'.format(pbcrgn)] = bcon
+
+        return ret
+
+    def get_shape_points(self):
+        spts = {}
+
+        for etype, pent in self._elenodes:
+            if pent != self._felespent:
+                continue
+
+            # Elements and type information
+            eles = self._elenodes[etype, pent]
+            petype, nnodes = self._etype_map[etype]
+            pnmap = self._nodemaps.from_pyfr[petype, nnodes]
+
+            # Obtain the dimensionality of the element type
+            ndim = self._petype_ndim[petype]
+
+            # Build the array on disk
+            arr = self._store.empty((nnodes, len(eles), ndim),
+                                    self._nodepts.dtype)
+
+            for i, j in self._chunks(len(eles)):
+                pts = self._get_nodepts(np.asarray(eles[i:j])[:, pnmap])
+                arr[:, i:j] = pts.swapaxes(0, 1)[..., :ndim]
+
+            spts['spt_{0}_p0'.format(petype)] = arr
+
+        return spts
@@ -1,13 +1,14 @@
 # -*- coding: utf-8 -*-
 
 from collections import defaultdict
-from ctypes import POINTER, create_string_buffer, c_char_p, c_int, c_void_p
+from ctypes import (POINTER, create_string_buffer, c_char_p, c_float, c_int,
+                    c_void_p)
 import re
 
 import numpy as np
 
 from pyfr.ctypesutil import load_library
-from pyfr.readers import BaseReader, NodalMeshAssembler
+from pyfr.readers.base import ArrayStore, BaseReader
 from pyfr.readers.nodemaps import CGNSNodeMaps
 
 
@@ -35,8 +36,11 @@ class CGNSWrappers(object):
 
         # Constants (from cgnslib.h)
         self.CG_MODE_READ = 0
-        self.RealDouble = 4
+        self.Integer, self.RealDouble = 2, 4
         self.Unstructured = 3
+        self.Vertex = 2
+        self.Abutting, self.Abutting1to1 = 3, 4
+        self.PointList, self.PointListDonor = 2, 3
         self.PointRange, self.ElementRange = 4, 6
 
         # cg_open
@@ -93,6 +97,30 @@ class CGNSWrappers(object):
                                      POINTER(c_int), c_void_p]
         lib.cg_boco_read.errcheck = self._errcheck
 
+        # cg_nconns
+        lib.cg_nconns.argtypes = [c_int, c_int, c_int, POINTER(c_int)]
+        lib.cg_nconns.errcheck = self._errcheck
+
+        # cg_conn_info
+        lib.cg_conn_info.argtypes = [
+            c_int, c_int, c_int, c_int, c_char_p, POINTER(c_int),
+            POINTER(c_int), POINTER(c_int), POINTER(c_int), c_char_p,
+            POINTER(c_int), POINTER(c_int), POINTER(c_int), POINTER(c_int)
+        ]
+        lib.cg_conn_info.errcheck = self._errcheck
+
+        # cg_conn_read
+        lib.cg_conn_read.argtypes = [c_int, c_int, c_int, c_int, c_void_p,
+                                     c_int, c_void_p]
+        lib.cg_conn_read.errcheck = self._errcheck
+
+        # cg_conn_periodic_read; as a missing node is not an error here
+        # the return code is checked by the caller
+        lib.cg_conn_periodic_read.argtypes = [
+            c_int, c_int, c_int, c_int, POINTER(c_float), POINTER(c_float),
+            POINTER(c_float)
+        ]
+
         # cg_nsections
         lib.cg_nsections.argtypes = [c_int, c_int, c_int, POINTER(c_int)]
         lib.cg_nsections.errcheck = self._errcheck
@@ -187,7 +215,7 @@ class CGNSWrappers(object):
         zone = zone['idx']
         n = c_int()
 
-        self.lib.cg_goto(file, base, b'Zone_t', 1, b'ZoneBC_t', 1, b'end')
+        self.lib.cg_goto(file, base, b'Zone_t', zone, b'ZoneBC_t', 1, b'end')
         self.lib.cg_nbocos(file, base, zone, n)
         return n.value
 
@@ -219,6 +247,68 @@ class CGNSWrappers(object):
         return {'name': name.value.decode('utf-8'),
                 'range': tuple(bcrange)}
 
+    def nconns(self, zone):
+        file = zone['base']['file']
+        base = zone['base']['idx']
+        zone = zone['idx']
+
+        n = c_int()
+        self.lib.cg_nconns(file, base, zone, n)
+
+        return n.value
+
+    def conn_info(self, zone, idx):
+        file = zone['base']['file']
+        base = zone['base']['idx']
+        zone = zone['idx']
+
+        name = create_string_buffer(32)
+        donorname = create_string_buffer(32)
+        location, conntype, ptset_type = c_int(), c_int(), c_int()
+        donor_zonetype, donor_ptset_type = c_int(), c_int()
+        donor_datatype = c_int()
+        npnts, ndonor = c_int(), c_int()
+
+        self.lib.cg_conn_info(
+            file, base, zone, idx + 1, name, location, conntype, ptset_type,
+            npnts, donorname, donor_zonetype, donor_ptset_type,
+            donor_datatype, ndonor
+        )
+
+        # See if the interface is periodic
+        centre, angle, trans = [(c_float * 3)() for i in range(3)]
+        periodic = self.lib.cg_conn_periodic_read(file, base, zone, idx + 1,
+                                                  centre, angle, trans) == 0
+
+        return {'idx': idx, 'name': name.value.decode('utf-8'),
+                'donor': donorname.value.decode('utf-8'),
+                'location': location.value, 'type': conntype.value,
+                'ptset_type': ptset_type.value,
+                'donor_ptset_type': donor_ptset_type.value,
+                'npnts': npnts.value, 'ndonor': ndonor.value,
+                'periodic': periodic}
+
+    def conn_read(self, zone, info):
+        file = zone['base']['file']
+        base = zone['base']['idx']
+        zone = zone['idx']
+
+        pnts = np.empty(info['npnts'], dtype=np.int32)
+        donor = np.empty(info['ndonor'], dtype=np.int32)
+
+        self.lib.cg_conn_read(file, base, zone, info['idx'] + 1,
+                              pnts.ctypes.data, self.Integer,
+                              donor.ctypes.data)
+
+        if info['ptset_type'] == self.PointRange:
+            pnts = np.arange(pnts[0], pnts[1] + 1, dtype=np.int32)
+
+        if len(pnts) != len(donor):
+            raise RuntimeError('Inconsistent zone connectivity')
+
+        return {'name': info['name'], 'donor': info['donor'],
+                'pnts': pnts, 'donor_pnts': donor}
+
     def nsections(self, zone):
         file = zone['base']['file']
         base = zone['base']['idx']
@@ -270,44 +360,56 @@ class CGNSZoneReader(object):
         20: ('mixed',),
     }
 
-    def __init__(self, cgns, base, idx):
+    def __init__(self, cgns, base, idx, multizone=False):
         self._cgns = cgns
-        zone = cgns.zone_read(base, idx)
+        self.zone = zone = cgns.zone_read(base, idx)
 
-        # Read nodes
-        self.nodepts = self._read_nodepts(zone)
+        # Number of nodes
+        self.nnodes = zone['size'][0]
 
         # Read bc
-        bc = self._read_bc(zone)
+        self.bc = self._read_bc(zone)
 
-        # Read elements
-        self.elenodes = elenodes = {}
-        self.pents = pents = {}
+        # Read the nodes shared with other zones
+        self.conns = self._read_conns(zone) if multizone else []
+
+        # Read the element sections and their connectivity sizes
+        self.sects = [cgns.section_read(zone, i)
+                      for i in range(cgns.nsections(zone))]
+        self.conn_size = sum(s['dim'] for s in self.sects)
+
+    def read_nodepts(self, nodepts):
+        self._cgns.coord_read(self.zone, 'CoordinateX', nodepts[0])
+        self._cgns.coord_read(self.zone, 'CoordinateY', nodepts[1])
+        self._cgns.coord_read(self.zone, 'CoordinateZ', nodepts[2])
+
+    def read_elements(self, conn):
+        # Read the connectivity of every section into the buffer
+        off = 0
+        for s in self.sects:
+            self._cgns.elements_read(s, conn[off:off + s['dim']])
+            off += s['dim']
 
         # Construct elenodes and physical entity
-        for idx in range(cgns.nsections(zone)):
-            elerng, elenode = self._read_element(zone, idx)
+        off = 0
+        for s in self.sects:
+            sconn = conn[off:off + s['dim']]
+            off += s['dim']
 
-            for bcname, bcrng in bc.items():
+            elerng = s['range']
+            for bcname, bcrng in self.bc.items():
                 if elerng[0] >= bcrng[0] and elerng[1] <= bcrng[1]:
                     name = bcname
                     break
             else:
                 name = 'fluid'
 
-            pent = pents.setdefault(name, idx)
-
-            elenodes.update({(k, pent): v for k, v in elenode.items()})
-
-    def _read_nodepts(self, zone):
-        nnode = zone['size'][0]
-        nodepts = np.zeros((3, nnode))
-
-        self._cgns.coord_read(zone, 'CoordinateX', nodepts[0])
-        self._cgns.coord_read(zone, 'CoordinateY', nodepts[1])
-        self._cgns.coord_read(zone, 'CoordinateZ', nodepts[2])
-
-        return nodepts
+            if self.cgns_map[s['etype']][0] == 'mixed':
+                for etype, eles in self._split_mixed(sconn):
+                    yield name, etype, eles
+            else:
+                spts = self.cgns_map[s['etype']][1]
+                yield name, s['etype'], sconn.reshape(-1, spts)
 
     def _read_bc(self, zone):
         nbc = self._cgns.nbocos(zone)
@@ -320,38 +422,59 @@ class CGNSZoneReader(object):
 
         return bc
 
-    def _read_element(self, zone, idx):
-        s = self._cgns.section_read(zone, idx)
+    def _read_conns(self, zone):
+        cgns = self._cgns
+        conns = []
 
-        elerng = s['range']
-        conn = np.zeros(s['dim'], dtype=np.int32)
-        self._cgns.elements_read(s, conn)
+        for idx in range(cgns.nconns(zone)):
+            info = cgns.conn_info(zone, idx)
 
-        cgns_type = s['etype']
-        petype = self.cgns_map[cgns_type][0]
+            # Periodic interfaces are handled through boundary conditions
+            # and merging their nodes would join opposite sides of the mesh
+            if info['periodic']:
+                continue
 
-        elenode = {}
+            # Only conformal interfaces can be described by matching nodes
+            if (info['location'] != cgns.Vertex or
+                info['type'] not in {cgns.Abutting, cgns.Abutting1to1} or
+                info['ptset_type'] not in {cgns.PointList, cgns.PointRange} or
+                info['donor_ptset_type'] != cgns.PointListDonor):
+                continue
 
-        if petype == 'mixed':
-            i = 0
-            mele = defaultdict(list)
+            conns.append(cgns.conn_read(zone, info))
 
-            while i < s['dim']:
-                try:
-                    cgns_type = conn[i]
-                    petype, spts = self.cgns_map[cgns_type]
-                except KeyError:
-                    raise
+        return conns
 
-                mele[cgns_type].append(conn[i + 1: i + 1 + spts])
-                i += 1 + spts
+    def _split_mixed(self, conn):
+        p = 0
 
-            elenode = {k: np.array(v) for k, v in mele.items()}
-        else:
-            spts = self.cgns_map[cgns_type][1]
-            elenode[cgns_type] = conn.reshape(-1, spts)
+        # Consume runs of elements with the same type
+        while p < len(conn):
+            etype = int(conn[p])
+            if etype not in self.cgns_map or etype == 20:
+                raise ValueError('Unsupported element type {}'.format(etype))
 
-        return elerng, elenode
+            # Number of integers for each element of the run
+            l = 1 + self.cgns_map[etype][1]
+
+            # Find where the run ends by examining windows of elements
+            m, mmax = 0, (len(conn) - p) // l
+            while m < mmax:
+                w = min(mmax - m, max(1024, m))
+                rows = conn[p + m*l:p + (m + w)*l].reshape(w, l)
+
+                diff = np.flatnonzero(rows[:, 0] != etype)
+                if len(diff):
+                    m += diff[0]
+                    break
+
+                m += w
+
+            if not m:
+                raise ValueError('Malformed mixed element section')
+
+            yield etype, conn[p:p + m*l].reshape(m, l)[:, 1:]
+            p += m*l
 
 
 class CGNSReader(BaseReader):
@@ -378,7 +501,10 @@ class CGNSReader(BaseReader):
     # Mappings between the node ordering of PyFR and that of CGNS
     _nodemaps = CGNSNodeMaps
 
-    def __init__(self, msh):
+    def __init__(self, msh, store=None):
+        # Store for the node and element arrays
+        self._store = store if store is not None else ArrayStore()
+
         # Load and wrap CGNS
         self._cgns = cgns = CGNSWrappers()
 
@@ -386,16 +512,39 @@ class CGNSReader(BaseReader):
         self._file = file = cgns.open(msh.name)
         base = cgns.base_read(file, 0)
 
-        if cgns.nzones(base) > 1:
-            raise ValueError('Only single zone is supported')
+        # Read the zone and section metadata
+        nzones = cgns.nzones(base)
+        zones = [CGNSZoneReader(cgns, base, i, nzones > 1)
+                 for i in range(nzones)]
+
+        # Read the nodes of every zone into a single array
+        noffs = np.cumsum([0] + [z.nnodes for z in zones])
+        nodepts = self._store.empty((3, noffs[-1]), np.float64)
 
-        # Read the single CGNS Zone
-        zone = CGNSZoneReader(cgns, base, 0)
+        for z, i, j in zip(zones, noffs[:-1], noffs[1:]):
+            z.read_nodepts(nodepts[:, i:j])
 
-        self._nodepts = {i + 1: v
-                         for i, v in enumerate(zone.nodepts.swapaxes(0, 1))}
-        self._elenodes = zone.elenodes
-        pents = zone.pents
+        # Nodes are numbered contiguously from one
+        self._nodepts = nodepts.swapaxes(0, 1)
+        self._nodeids = np.arange(1, noffs[-1] + 1)
+
+        # Merge the nodes which are shared between zones
+        nodemap = self._merge_nodes(zones, noffs)
+
+        # Read the connectivity of every zone into a single buffer
+        conn = self._store.empty(sum(z.conn_size for z in zones), np.int32)
+        coffs = np.cumsum([0] + [z.conn_size for z in zones])
+        pents = {}
+
+        for z, noff, i, j in zip(zones, noffs, coffs[:-1], coffs[1:]):
+            for name, etype, eles in z.read_elements(conn[i:j]):
+                if len(zones) > 1:
+                    eles = self._map_nodes(noff + eles, *nodemap)
+
+                pent = pents.setdefault(name, len(pents))
+                self._store.append((etype, pent), eles)
+
+        self._elenodes = {k: self._store.get(k) for k in self._store.keys()}
 
         # Physical entities can be divided up into:
         #  - fluid elements ('the mesh')
@@ -411,7 +560,7 @@ class CGNSReader(BaseReader):
                 if not p:
                     raise ValueError('Invalid periodic boundary condition')
 
-                self._pfacespents[p.group(1)].append(name)
+                self._pfacespents[p.group(1)].append(pent)
             # Other boundary faces
             else:
                 self._bfacespents[name] = pent
@@ -423,13 +572,50 @@ class CGNSReader(BaseReader):
         if hasattr(self, '_file'):
             self._cgns.close(self._file)
 
+    def _merge_nodes(self, zones, noffs):
+        zoffs = {z.zone['name']: off for z, off in zip(zones, noffs)}
+
+        # Pair up the numbers of the nodes either side of each interface
+        lhs, rhs = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        for z, off in zip(zones, noffs):
+            for c in z.conns:
+                if c['donor'] not in zoffs:
+                    raise ValueError('Invalid donor zone {}'
+                                     .format(c['donor']))
+
+                lhs.append(off + c['pnts'].astype(np.int64))
+                rhs.append(zoffs[c['donor']] + c['donor_pnts'])
+
+        lhs, rhs = np.concatenate(lhs), np.concatenate(rhs)
+
+        # Consider only those nodes which lie on an interface
+        ids = np.unique(np.concatenate([lhs, rhs]))
+        lhs, rhs = np.searchsorted(ids, lhs), np.searchsorted(ids, rhs)
+
+        # Map each node onto the lowest numbered node it is connected to;
+        # iterating ensures this holds for nodes shared by several zones
+        rep = ids.copy()
+        while True:
+            m = np.minimum(rep[lhs], rep[rhs])
+            if np.array_equal(m, rep[lhs]) and np.array_equal(m, rep[rhs]):
+                return ids, rep
+
+            np.minimum.at(rep, lhs, m)
+            np.minimum.at(rep, rhs, m)
+
+    def _map_nodes(self, eles, ids, rep):
+        if len(ids):
+            idx = np.searchsorted(ids, eles).clip(max=len(ids) - 1)
+            shared = ids[idx] == eles
+
+            eles[shared] = rep[idx[shared]]
+
+        return eles
+
     def _to_raw_pyfrm(self):
         # Assemble a nodal mesh
         maps = self._etype_map, self._petype_fnmap, self._nodemaps
         pents = self._felespent, self._bfacespents, self._pfacespents
-        mesh = NodalMeshAssembler(self._nodepts, self._elenodes, pents, maps)
 
-        rawm = {}
-        rawm.update(mesh.get_connectivity())
-        rawm.update(mesh.get_shape_points())
-        return rawm
+        return self._assemble_nodal(self._nodeids, self._nodepts,
+                                    self._elenodes, pents, maps)
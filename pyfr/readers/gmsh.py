@@ -5,19 +5,19 @@ import re
 
 import numpy as np
 
-from pyfr.readers import BaseReader, NodalMeshAssembler
+from pyfr.readers.base import ArrayStore, BaseReader
 from pyfr.readers.nodemaps import GmshNodeMaps
 
 
 def msh_section(mshit, section):
-    endln = '$End{}\n'.format(section)
+    endln = '$End{}\n'.format(section).encode()
     endix = int(next(mshit)) - 1
 
     for i, l in enumerate(mshit):
         if l == endln:
             raise ValueError('Unexpected end of section $' + section)
 
-        yield l.strip()
+        yield l.decode().strip()
 
         if i == endix:
             break
@@ -28,6 +28,38 @@ def msh_section(mshit, section):
         raise ValueError('Expected $End' + section)
 
 
+def msh_read_lines(msh, n, bufsize=2**24):
+    bufs = []
+
+    # Read in large blocks and then rewind to the end of the nth line
+    while n:
+        buf = msh.read(bufsize)
+        if not buf:
+            raise ValueError('Unexpected EOF')
+
+        nl = np.flatnonzero(np.frombuffer(buf, dtype=np.uint8) == 10)
+        if len(nl) >= n:
+            end = nl[n - 1] + 1
+            msh.seek(end - len(buf), 1)
+
+            bufs.append(buf[:end])
+            break
+        else:
+            bufs.append(buf)
+            n -= len(nl)
+
+    return b''.join(bufs)
+
+
+def msh_parse(buf, dtype, count=None):
+    arr = np.fromstring(buf, dtype=dtype, sep=' ')
+
+    if count is not None and arr.size != count:
+        raise ValueError('Malformed mesh section')
+
+    return arr
+
+
 class GmshReader(BaseReader):
     # Supported file types and extensions
     name = 'gmsh'
@@ -60,65 +92,92 @@ class GmshReader(BaseReader):
     # Mappings between the node ordering of PyFR and that of Gmsh
     _nodemaps = GmshNodeMaps
 
-    def __init__(self, msh):
+    # Number of node or element records to read at a time
+    _blksize = 2**18
+
+    def __init__(self, msh, store=None):
         if isinstance(msh, str):
-            msh = open(msh)
+            msh = open(msh, 'rb')
+
+        # Store for the node and element arrays
+        self._store = store if store is not None else ArrayStore()
 
         # Get an iterator over the lines of the mesh
-        mshit = iter(msh)
+        mshit = iter(msh.readline, b'')
 
         # Required section readers
         sect_map = {'MeshFormat': self._read_mesh_format,
                     'Nodes': self._read_nodes,
                     'Elements': self._read_eles,
-                    'PhysicalNames': self._read_phys_names}
-        req_sect = frozenset(sect_map)
+                    'PhysicalNames': self._read_phys_names,
+                    'Entities': self._read_entities}
+        req_sect = {'MeshFormat', 'Nodes', 'Elements', 'PhysicalNames'}
 
         # Seen sections
         seen_sect = set()
 
-        for l in filter(lambda l: l != '\n', mshit):
+        for l in filter(lambda l: l.strip(), mshit):
             # Ensure we have encountered a section
-            if not l.startswith('$'):
+            if not l.startswith(b'$'):
                 raise ValueError('Expected a mesh section')
 
             # Strip the '$' and '\n' to get the section name
-            sect = l[1:-1]
+            sect = l[1:].decode().strip()
 
             # If the section is known then read it
             if sect in sect_map:
-                sect_map[sect](mshit)
+                sect_map[sect](msh, mshit)
                 seen_sect.add(sect)
             # Else skip over it
             else:
-                endsect = '$End{}\n'.format(sect)
+                endsect = '$End{}'.format(sect).encode()
 
                 for el in mshit:
-                    if el == endsect:
+                    if el.rstrip() == endsect:
                         break
                 else:
                     raise ValueError('Expected $End' + sect)
 
+        # Version 4 files associate elements with entities
+        if self._version == 4:
+            req_sect.add('Entities')
+
         # Check that all of the required sections are present
         if seen_sect != req_sect:
             missing = req_sect - seen_sect
             raise ValueError('Required sections: {} not found'
                              .format(missing))
 
-    def _read_mesh_format(self, mshit):
+    def _read_mesh_format(self, msh, mshit):
         ver, ftype, dsize = next(mshit).split()
 
-        if ver != '2.2':
+        if ver not in {b'2.2', b'4.1'}:
             raise ValueError('Invalid mesh version')
-        if ftype != '0':
+        if ftype not in {b'0', b'1'}:
             raise ValueError('Invalid file type')
-        if dsize != '8':
+        if dsize != b'8':
             raise ValueError('Invalid data size')
 
-        if next(mshit) != '$EndMeshFormat\n':
+        self._version = int(float(ver))
+        self._binary = ftype == b'1'
+
+        # Binary files contain a one so that the byte order can be found
+        if self._binary:
+            one = msh.read(4)
+
+            if np.frombuffer(one, dtype='<i4')[0] == 1:
+                self._endian = '<'
+            elif np.frombuffer(one, dtype='>i4')[0] == 1:
+                self._endian = '>'
+            else:
+                raise ValueError('Invalid binary mesh')
+
+            next(mshit)
+
+        if next(mshit).rstrip() != b'$EndMeshFormat':
             raise ValueError('Expected $EndMeshFormat')
 
-    def _read_phys_names(self, msh):
+    def _read_phys_names(self, msh, mshit):
         # Physical entities can be divided up into:
         #  - fluid elements ('the mesh')
         #  - boundary faces
@@ -131,7 +190,7 @@ class GmshReader(BaseReader):
         seen = set()
 
         # Extract the physical names
-        for l in msh_section(msh, 'PhysicalNames'):
+        for l in msh_section(mshit, 'PhysicalNames'):
             m = re.match(r'(\d+) (\d+) "((?:[^"\\]|\\.)*)"$', l)
             if not m:
                 raise ValueError('Malformed physical entity')
@@ -164,39 +223,254 @@ class GmshReader(BaseReader):
         if any(len(pf) != 2 for pf in self._pfacespents.values()):
             raise ValueError('Unpaired periodic boundary in mesh')
 
-    def _read_nodes(self, msh):
-        self._nodepts = nodepts = {}
+    def _read_binary(self, msh, dtype, count=1):
+        dtype = np.dtype(dtype).newbyteorder(self._endian)
+        buf = msh.read(dtype.itemsize*count)
+
+        if len(buf) != dtype.itemsize*count:
+            raise ValueError('Unexpected EOF')
+
+        return np.frombuffer(buf, dtype=dtype).astype(dtype.newbyteorder('='))
+
+    def _iter_rows(self, msh, nrows, ncols, dtype):
+        # Read the records in blocks
+        for i in range(0, nrows, self._blksize):
+            n = min(self._blksize, nrows - i)
+
+            if self._binary:
+                arr = self._read_binary(msh, dtype, n*ncols)
+            else:
+                arr = msh_parse(msh_read_lines(msh, n), dtype, n*ncols)
+
+            yield i, arr.reshape(n, ncols)
+
+    def _read_end(self, mshit, section):
+        # Binary data is followed by a newline and then the end marker
+        l = next(mshit)
+        if self._binary and l == b'\n':
+            l = next(mshit)
+
+        if l.rstrip() != '$End{}'.format(section).encode():
+            raise ValueError('Expected $End' + section)
+
+    def _read_entities(self, msh, mshit):
+        # Physical entities associated with each (dim, tag) entity
+        self._entpents = entpents = {}
+
+        if self._binary:
+            counts = self._read_binary(msh, 'u8', 4)
+
+            for dim, n in enumerate(counts):
+                for i in range(n):
+                    tag = int(self._read_binary(msh, 'i4')[0])
+                    self._read_binary(msh, 'f8', 3 if dim == 0 else 6)
+
+                    nphys = int(self._read_binary(msh, 'u8')[0])
+                    pents = self._read_binary(msh, 'i4', nphys)
+
+                    if dim > 0:
+                        nbound = int(self._read_binary(msh, 'u8')[0])
+                        self._read_binary(msh, 'i4', nbound)
+
+                    entpents[dim, tag] = [int(p) for p in pents]
+        else:
+            counts = [int(c) for c in next(mshit).split()]
+
+            for dim, n in enumerate(counts):
+                for i in range(n):
+                    ent = next(mshit).split()
+
+                    # Skip over the coordinates or bounding box
+                    tag, j = int(ent[0]), 4 if dim == 0 else 7
+                    nphys = int(ent[j])
+
+                    entpents[dim, tag] = [int(p)
+                                          for p in ent[j + 1:j + 1 + nphys]]
+
+        self._read_end(mshit, 'Entities')
+
+    def _read_nodes(self, msh, mshit):
+        if self._version == 2:
+            self._read_nodes_v2(msh, mshit)
+        else:
+            self._read_nodes_v4(msh, mshit)
+
+        self._read_end(mshit, 'Nodes')
+
+    def _read_nodes_v2(self, msh, mshit):
+        nnodes = int(next(mshit))
+        ids, pts = self._alloc_nodes(nnodes)
+
+        if self._binary:
+            dtype = [('id', 'i4'), ('pt', 'f8', (3,))]
 
-        for l in msh_section(msh, 'Nodes'):
-            nv = l.split()
-            nodepts[int(nv[0])] = np.array([float(x) for x in nv[1:]])
+            for i in range(0, nnodes, self._blksize):
+                n = min(self._blksize, nnodes - i)
+                nodes = self._read_binary(msh, dtype, n)
 
-    def _read_eles(self, msh):
-        elenodes = defaultdict(list)
+                ids[i:i + n], pts[i:i + n] = nodes['id'], nodes['pt']
+        else:
+            for i, nodes in self._iter_rows(msh, nnodes, 4, 'f8'):
+                ids[i:i + len(nodes)] = nodes[:, 0]
+                pts[i:i + len(nodes)] = nodes[:, 1:]
 
-        for l in msh_section(msh, 'Elements'):
-            # Extract the raw element data
-            elei = [int(i) for i in l.split()]
-            enum, etype, entags = elei[:3]
-            etags, enodes = elei[3:3 + entags], elei[3 + entags:]
+    def _read_nodes_v4(self, msh, mshit):
+        if self._binary:
+            nblocks, nnodes = self._read_binary(msh, 'u8', 4)[:2]
+        else:
+            nblocks, nnodes = [int(c) for c in next(mshit).split()[:2]]
+
+        ids, pts = self._alloc_nodes(nnodes)
+        off = 0
+
+        for i in range(nblocks):
+            if self._binary:
+                dim, tag, param = self._read_binary(msh, 'i4', 3)
+                n = int(self._read_binary(msh, 'u8')[0])
+            else:
+                dim, tag, param, n = [int(c) for c in next(mshit).split()]
+
+            if off + n > nnodes:
+                raise ValueError('Malformed $Nodes section')
+
+            # Parametric nodes are followed by their parametric coordinates
+            ncoords = 3 + (dim if param else 0)
+
+            for j, bids in self._iter_rows(msh, n, 1, 'u8'):
+                ids[off + j:off + j + len(bids)] = bids[:, 0]
+
+            for j, bpts in self._iter_rows(msh, n, ncoords, 'f8'):
+                pts[off + j:off + j + len(bpts)] = bpts[:, :3]
+
+            off += n
+
+        if off != nnodes:
+            raise ValueError('Malformed $Nodes section')
+
+    def _alloc_nodes(self, nnodes):
+        self._nodeids = self._store.empty(nnodes, np.int64)
+        self._nodepts = self._store.empty((nnodes, 3), np.float64)
+
+        return self._nodeids, self._nodepts
+
+    def _read_eles(self, msh, mshit):
+        if self._version == 2:
+            self._read_eles_v2(msh, mshit)
+        else:
+            self._read_eles_v4(msh, mshit)
+
+        self._read_end(mshit, 'Elements')
+
+        self._elenodes = {k: self._store.get(k) for k in self._store.keys()}
+
+    def _add_eles(self, etype, epents, enodes):
+        if etype not in self._etype_map:
+            raise ValueError('Unsupported element type {}'.format(etype))
+
+        # Group the elements by their physical entity in order of appearance
+        upents, idx = np.unique(epents, return_index=True)
+
+        for epent in upents[np.argsort(idx)]:
+            self._store.append((etype, int(epent)), enodes[epents == epent])
+
+    def _read_eles_v2(self, msh, mshit):
+        neles = int(next(mshit))
+
+        if self._binary:
+            while neles:
+                # Elements come in blocks of the same type and tag count
+                etype, n, ntags = self._read_binary(msh, 'i4', 3)
+                if etype not in self._etype_map:
+                    raise ValueError('Unsupported element type {}'
+                                     .format(etype))
+
+                # Element number, tags and nodes
+                l = 1 + ntags + self._etype_map[etype][1]
+
+                for i, eles in self._iter_rows(msh, n, l, 'i4'):
+                    eles = eles.astype(np.int64)
+                    self._add_eles(etype, eles[:, 1], eles[:, 1 + ntags:])
+
+                neles -= n
+        else:
+            for i in range(0, neles, self._blksize):
+                n = min(self._blksize, neles - i)
+                self._parse_eles_v2(msh_parse(msh_read_lines(msh, n),
+                                              np.int64), n)
+
+    def _parse_eles_v2(self, arr, n):
+        p = 0
+
+        # Consume runs of elements with the same type and tag count
+        while n:
+            if p + 3 > len(arr):
+                raise ValueError('Malformed $Elements section')
+
+            etype, ntags = int(arr[p + 1]), int(arr[p + 2])
+            if etype not in self._etype_map:
+                raise ValueError('Unsupported element type {}'.format(etype))
+
+            # Number of integers on each line of the run
+            l = 3 + ntags + self._etype_map[etype][1]
+
+            # Find where the run ends by examining windows of lines
+            m, mmax = 0, min(n, (len(arr) - p) // l)
+            while m < mmax:
+                w = min(mmax - m, max(1024, m))
+                rows = arr[p + m*l:p + (m + w)*l].reshape(w, l)
+
+                diff = (rows[:, 1] != etype) | (rows[:, 2] != ntags)
+                diff = np.flatnonzero(diff)
+                if len(diff):
+                    m += diff[0]
+                    break
+
+                m += w
+
+            if not m:
+                raise ValueError('Malformed $Elements section')
+
+            eles = arr[p:p + m*l].reshape(m, l)
+            self._add_eles(etype, eles[:, 3], eles[:, 3 + ntags:])
+
+            p, n = p + m*l, n - m
+
+        if p != len(arr):
+            raise ValueError('Malformed $Elements section')
+
+    def _read_eles_v4(self, msh, mshit):
+        if self._binary:
+            nblocks = self._read_binary(msh, 'u8', 4)[0]
+        else:
+            nblocks = int(next(mshit).split()[0])
+
+        for i in range(nblocks):
+            if self._binary:
+                dim, tag, etype = [int(c) for c in
+                                   self._read_binary(msh, 'i4', 3)]
+                n = int(self._read_binary(msh, 'u8')[0])
+            else:
+                dim, tag, etype, n = [int(c) for c in next(mshit).split()]
 
             if etype not in self._etype_map:
                 raise ValueError('Unsupported element type {}'.format(etype))
 
-            # Physical entity type (used for BCs)
-            epent = etags[0]
+            # Element tag followed by the nodes
+            l = 1 + self._etype_map[etype][1]
+
+            # Elements belong to the physical entities of their entity
+            epents = self._entpents.get((dim, tag), [])
 
-            elenodes[etype, epent].append(enodes)
+            for j, eles in self._iter_rows(msh, n, l, 'u8'):
+                eles = eles[:, 1:].astype(np.int64)
 
-        self._elenodes = {k: np.array(v) for k, v in elenodes.items()}
+                for epent in epents:
+                    self._store.append((etype, epent), eles)
 
     def _to_raw_pyfrm(self):
         # Assemble a nodal mesh
         maps = self._etype_map, self._petype_fnmap, self._nodemaps
         pents = self._felespent, self._bfacespents, self._pfacespents
-        mesh = NodalMeshAssembler(self._nodepts, self._elenodes, pents, maps)
 
-        rawm = {}
-        rawm.update(mesh.get_connectivity())
-        rawm.update(mesh.get_shape_points())
-        return rawm
+        return self._assemble_nodal(self._nodeids, self._nodepts,
+                                    self._elenodes, pents, maps)
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from collections import Mapping, OrderedDict
+import os
 import re
 
 import h5py
@@ -9,25 +10,368 @@ import numpy as np
 from pyfr.util import memoize
 
 
+def _read_dataset(ds):
+    if ds.shape == ():
+        ret = ds.value
+    else:
+        ret = np.array(ds)
+
+    return ret.decode() if isinstance(ret, bytes) else ret
+
+
+def element_axis(name):
+    # Shape points are stored as (nspts, neles, ndims) with all other
+    # partitioned arrays having their elements along the last axis
+    return 1 if name.startswith('spt_') else -1
+
+
+def _element_slice(name, start, end):
+    if element_axis(name) == 1:
+        return (slice(None), slice(start, end))
+    else:
+        return (Ellipsis, slice(start, end))
+
+
+def _read_slice(ds, axis, start, end, collective):
+    shape = list(ds.shape)
+    shape[axis] = end - start
+    shape = tuple(shape)
+    arr = np.empty(shape, dtype=ds.dtype)
+
+    # Select the slice in the file; even when it is empty we must still
+    # take part in the read if it is collective
+    fspace = ds.id.get_space()
+    if end > start:
+        offset = [0]*len(shape)
+        offset[axis] = start
+        fspace.select_hyperslab(tuple(offset), shape)
+    else:
+        fspace.select_none()
+
+    mspace = h5py.h5s.create_simple(shape)
+    if end == start:
+        mspace.select_none()
+
+    dxpl = h5py.h5p.create(h5py.h5p.DATASET_XFER)
+    if collective:
+        dxpl.set_dxpl_mpio(h5py.h5fd.MPIO_COLLECTIVE)
+
+    ds.id.read(mspace, fspace, arr, dxpl=dxpl)
+
+    return arr
+
+
+def _unpack_array(name, arr, etypes):
+    # Expand any connectivity arrays with integer element types
+    if name in {'con', 'mcon'} or name.startswith('bcon_'):
+        con = np.empty(arr.shape, dtype='S4,i4,i1,i1')
+        con['f0'] = etypes[arr['f0']]
+        con['f1'], con['f2'], con['f3'] = arr['f1'], arr['f2'], arr['f3']
+
+        return con
+    else:
+        return arr
+
+
+def _mmap_dataset(ds):
+    # Only contiguous and unfiltered numeric datasets can be mapped
+    if (ds.chunks is not None or ds.dtype.kind not in 'fiu' or
+        ds.size == 0 or ds.file.driver != 'sec2'):
+        return None
+
+    # Offset of the data in the file; None if it has not been allocated
+    off = ds.id.get_offset()
+    if off is None:
+        return None
+
+    return np.memmap(ds.file.filename, dtype=ds.dtype, mode='r', offset=off,
+                     shape=ds.shape)
+
+
+class LazyArray(object):
+    def __init__(self, ds, start=0, end=None, etypes=None):
+        self._ds = ds
+        self._name = name = ds.name.split('/')[-1]
+        self._etypes = etypes
+
+        # Range of the dataset along the element axis we cover
+        self._axis = element_axis(name) % ds.ndim
+        self._start = start
+        self._end = ds.shape[self._axis] if end is None else end
+
+        shape = list(ds.shape)
+        shape[self._axis] = self._end - start
+
+        self.shape = tuple(shape)
+        self.dtype = ds.dtype
+
+        # Packed connectivity arrays are expanded as they are read
+        if etypes is not None:
+            empty = np.empty(0, dtype=ds.dtype)
+            self.dtype = _unpack_array(name, empty, etypes).dtype
+
+        # Where possible map the dataset directly into memory
+        self._mmap = _mmap_dataset(ds)
+        if self._mmap is not None:
+            self._mmap = self._mmap[_element_slice(name, start, self._end)]
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None):
+        arr = self._read(0, self.shape[self._axis])
+        return arr.astype(dtype) if dtype is not None else arr
+
+    def __getitem__(self, idx):
+        if self._mmap is not None:
+            return np.array(self._mmap[idx])
+
+        # Expand the index so that it has an entry for each axis
+        idx = list(idx) if isinstance(idx, tuple) else [idx]
+        for i, ix in enumerate(idx):
+            if ix is Ellipsis:
+                idx[i:i + 1] = [slice(None)]*(self.ndim - len(idx) + 1)
+                break
+
+        idx += [slice(None)]*(self.ndim - len(idx))
+
+        # Contiguous ranges of elements can be read directly
+        eidx = idx[self._axis] if len(idx) == self.ndim else None
+        full = all(isinstance(ix, slice) and ix == slice(None)
+                   for i, ix in enumerate(idx) if i != self._axis)
+
+        if full and isinstance(eidx, slice) and eidx.step in {None, 1}:
+            i, j, _ = eidx.indices(self.shape[self._axis])
+            return self._read(i, max(i, j))
+        # Otherwise read in the entire array and then index it
+        else:
+            return np.asarray(self)[tuple(idx)]
+
+    def astype(self, dtype):
+        return np.asarray(self, dtype=dtype)
+
+    def _read(self, i, j):
+        if self._mmap is not None:
+            eslice = _element_slice(self._name, i, j)
+            arr = np.array(self._mmap[eslice])
+        else:
+            eslice = _element_slice(self._name, self._start + i,
+                                    self._start + j)
+            arr = self._ds[eslice]
+
+        # Expand any packed connectivity arrays
+        if self._etypes is not None:
+            arr = _unpack_array(self._name, arr, self._etypes)
+
+        return arr
+
+
+def _part_path(dname, part):
+    return os.path.join(dname, 'p{0}.h5'.format(part))
+
+
+def read_partition(fname, index, prank, comm=None):
+    version, keys, packed, etypes, parts = index
+
+    # Datasets in our partition along with those shared by all partitions
+    names = []
+    for k in keys:
+        m = re.search(r'_p(\d+)(?:p\d+)?$', k)
+        if not m or int(m.group(1)) == prank:
+            names.append(k)
+
+    # For distributed files we need only open our own partition file
+    if parts:
+        ret = OrderedDict()
+
+        with h5py.File(os.path.join(fname, 'manifest.h5'), 'r') as mf, \
+             h5py.File(_part_path(fname, prank), 'r') as pf:
+            for k in names:
+                ret[k] = _read_dataset(pf[k] if k in parts else mf[k])
+
+        return ret
+
+    # When possible open the file collectively with MPI-IO
+    collective = comm is not None and h5py.get_config().mpi
+    if collective:
+        f = h5py.File(fname, 'r', driver='mpio', comm=comm)
+    else:
+        f = h5py.File(fname, 'r')
+
+    ret = OrderedDict()
+    with f:
+        # Every rank must visit each packed dataset in the same order
+        for name in sorted({v[0] for v in packed.values()}):
+            parts = [(k,) + packed[k][1:] for k in names
+                     if k in packed and packed[k][0] == name]
+
+            if not parts and not collective:
+                continue
+
+            # Read the range of the dataset which spans our parts
+            start = min(j for k, j, l in parts) if parts else 0
+            end = max(l for k, j, l in parts) if parts else 0
+            ds = f[name]
+            axis = element_axis(name) % ds.ndim
+            arr = _read_slice(ds, axis, start, end, collective)
+
+            for k, j, l in parts:
+                sarr = arr[_element_slice(name, j - start, l - start)]
+                sarr = np.ascontiguousarray(sarr)
+                ret[k] = _unpack_array(name, sarr, etypes)
+
+        # Read the remaining datasets independently
+        for k in names:
+            if k not in packed:
+                ret[k] = _read_dataset(f[k])
+
+    # Restore the ordering of the index
+    return OrderedDict((k, ret[k]) for k in names)
+
+
 class NativeReader(Mapping):
-    def __init__(self, fname):
-        self._file = h5py.File(fname, 'r')
+    def __init__(self, fname, lazy=False):
+        # If arrays should be read on demand
+        self._lazy = lazy
+
+        # Distributed files are directories containing a manifest along
+        # with a file for each partition
+        if os.path.isdir(fname):
+            self._dname = fname
+            self._file = h5py.File(os.path.join(fname, 'manifest.h5'), 'r')
+            self._parts = OrderedDict(
+                (n.decode(), int(p)) for n, p in self._file['index'][()]
+            )
+        else:
+            self._dname = None
+            self._file = h5py.File(fname, 'r')
+            self._parts = {}
+
+        # Open partition files
+        self._pfiles = {}
+
+        # Determine the layout of the file
+        self.version = int(self._file.attrs.get('version', 1))
+
+        if self.version == 1:
+            self._keys = list(self._file)
+            self._packed, self._etypes = {}, None
+        elif self.version == 2:
+            self._keys, self._packed = self._index_packed()
+        else:
+            raise ValueError('Unsupported file version')
+
+        # Replace the index in the manifest with the partition datasets
+        if self._dname:
+            self._keys.remove('index')
+            self._keys.extend(self._parts)
+
+    def reopen(self):
+        # HDF5 handles can not be shared with forked processes and so
+        # children must open the files anew
+        self._file = h5py.File(self._file.filename, 'r')
+        self._pfiles = {}
 
     def __getitem__(self, aname):
-        ret = self._file[aname]
+        if aname in self._packed:
+            name, start, end = self._packed[aname]
+
+            if self._lazy:
+                return LazyArray(self._file[name], start, end,
+                                 self._etypes)
+            else:
+                return self._get_packed(name, start, end)
+
+        if aname in self._parts:
+            ds = self._get_part_file(aname)[aname]
+        else:
+            ds = self._file[aname]
 
-        if ret.shape == ():
-            ret = ret.value
+        if self._lazy and ds.shape != ():
+            return LazyArray(ds)
         else:
-            ret = np.array(ret)
+            return _read_dataset(ds)
 
-        return ret.decode() if isinstance(ret, bytes) else ret
+    def __contains__(self, aname):
+        return (aname in self._packed or aname in self._parts or
+                aname in self._file)
 
     def __iter__(self):
-        return iter(self._file)
+        return iter(self._keys)
 
     def __len__(self):
-        return len(self._file)
+        return len(self._keys)
+
+    def _index_packed(self):
+        f = self._file
+        packed = OrderedDict()
+
+        # Element type table for the connectivity arrays
+        self._etypes = f['etypes'][()] if 'etypes' in f else None
+
+        # Datasets are split along their element axis into partitions
+        for name, off in f['offsets'].items():
+            off = off[()]
+
+            # MPI interfaces are indexed by pairs of partitions
+            if name == 'mcon':
+                vnames = ['con_p{0}p{1}'.format(*p)
+                          for p in f['mcon_parts'][()]]
+            elif name == 'con':
+                vnames = ['con_p{0}'.format(i) for i in range(len(off) - 1)]
+            else:
+                vnames = ['{0}_p{1}'.format(name, i)
+                          for i in range(len(off) - 1)]
+
+            # Skip over any empty partitions; every partition however has
+            # an interior connectivity array even if it has no such faces
+            for vname, j, k in zip(vnames, off[:-1], off[1:]):
+                if k > j or name in {'con', 'mcon'}:
+                    packed[vname] = (name, j, k)
+
+        # Hide the underlying datasets
+        hidden = set(f['offsets']) | {'etypes', 'mcon_parts', 'offsets'}
+
+        keys = [n for n in f if n not in hidden] + list(packed)
+
+        return keys, packed
+
+    @property
+    def index(self):
+        return (self.version, self._keys, self._packed, self._etypes,
+                self._parts)
+
+    def _get_part_file(self, aname):
+        part = self._parts[aname]
+
+        try:
+            return self._pfiles[part]
+        except KeyError:
+            f = h5py.File(_part_path(self._dname, part), 'r')
+            self._pfiles[part] = f
+            return f
+
+    def _get_packed(self, name, start, end):
+        arr = self._file[name][_element_slice(name, start, end)]
+
+        return _unpack_array(name, arr, self._etypes)
+
+    def _get_shape(self, aname):
+        if aname in self._packed:
+            name, start, end = self._packed[aname]
+
+            shape = list(self._file[name].shape)
+            shape[element_axis(name)] = end - start
+
+            return tuple(shape)
+        elif aname in self._parts:
+            return self._get_part_file(aname)[aname].shape
+        else:
+            return self._file[aname].shape
 
     @memoize
     def array_info(self, prefix):
@@ -44,15 +388,34 @@ class NativeReader(Mapping):
         info = OrderedDict()
         for i in range(fmaxpn + 1):
             for et in ftypes:
-                try:
-                    n = '{0}_{1}_p{2}'.format(prefix, et, i)
+                n = '{0}_{1}_p{2}'.format(prefix, et, i)
 
-                    info[n] = (et, self._file.get(n).shape)
-                except AttributeError:
-                    pass
+                if n in self:
+                    info[n] = (et, self._get_shape(n))
 
         return info
 
+    def combine_partitions(self, prefix):
+        combined = OrderedDict()
+
+        # Group the arrays for each element type in partition order
+        for n, (et, shape) in self.array_info(prefix).items():
+            combined.setdefault(et, []).append(n)
+
+        ret = OrderedDict()
+        for et, names in combined.items():
+            name = '{0}_{1}'.format(prefix, et)
+
+            # Packed datasets already hold the partitions contiguously
+            if names[0] in self._packed and self._packed[names[0]][0] == name:
+                ret[et] = _unpack_array(name, self._file[name][()],
+                                        self._etypes)
+            else:
+                ret[et] = np.concatenate([self[n] for n in names],
+                                         axis=element_axis(name))
+
+        return ret
+
     @memoize
     def partition_info(self, prefix):
         ai = self.array_info(prefix)
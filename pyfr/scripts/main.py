@@ -2,25 +2,27 @@
 # -*- coding: utf-8 -*-
 
 from argparse import ArgumentParser, FileType
-import itertools as it
+import glob
 import os
+import re
 
 import mpi4py.rc
 mpi4py.rc.initialize = False
 
-import h5py
-
 from pyfr.backends import BaseBackend, get_backend
 from pyfr.inifile import Inifile
-from pyfr.mpiutil import register_finalize_handler
+from pyfr.mpiutil import get_comm_rank_root, register_finalize_handler
 from pyfr.partitioners import BasePartitioner, get_partitioner
 from pyfr.progress_bar import ProgressBar
 from pyfr.rank_allocator import get_rank_allocation
-from pyfr.readers import BaseReader, get_reader_by_name, get_reader_by_extn
-from pyfr.readers.native import NativeReader
+from pyfr.readers import (ArrayStore, BaseReader, SpillStore,
+                          get_reader_by_name, get_reader_by_extn)
+from pyfr.readers.native import NativeReader, read_partition
 from pyfr.solvers import get_solver
-from pyfr.util import subclasses
+from pyfr.timer import startup_timer
+from pyfr.util import fork_starmap, subclasses
 from pyfr.writers import BaseWriter, get_writer_by_name, get_writer_by_extn
+from pyfr.writers.native import write_native
 
 
 def main():
@@ -32,13 +34,15 @@ def main():
 
     # Import command
     ap_import = sp.add_parser('import', help='import --help')
-    ap_import.add_argument('inmesh', type=FileType('r'),
+    ap_import.add_argument('inmesh', type=FileType('rb'),
                            help='input mesh file')
     ap_import.add_argument('outmesh', help='output PyFR mesh file')
     types = sorted(cls.name for cls in subclasses(BaseReader))
     ap_import.add_argument('-t', dest='type', choices=types,
                            help='input file type; this is usually inferred '
                            'from the extension of inmesh')
+    ap_import.add_argument('-s', '--scratch', help='import out-of-core '
+                           'using temporary files in this directory')
     ap_import.set_defaults(process=process_import)
 
     # Partition command
@@ -57,13 +61,38 @@ def main():
                               help='partitioner-specific option')
     ap_partition.set_defaults(process=process_partition)
 
+    # Convert mesh command
+    ap_convert = sp.add_parser('convert-mesh', help='convert-mesh --help',
+                               description='Converts a PyFR mesh file '
+                               'between layout versions.')
+    ap_convert.add_argument('inmesh', help='input PyFR mesh file')
+    ap_convert.add_argument('outmesh', help='output PyFR mesh file')
+    ap_convert.add_argument('-V', '--mesh-version', type=int, choices=[1, 2],
+                            default=2, help='output layout version; '
+                            'defaults to 2')
+    ap_convert.set_defaults(process=process_convert_mesh)
+
+    # Merge command
+    ap_merge = sp.add_parser('merge', help='merge --help',
+                             description='Merges a directory of per-rank '
+                             'PyFR solution files into a single file.')
+    ap_merge.add_argument('indir', help='input solution directory')
+    ap_merge.add_argument('outf', help='output PyFR solution file')
+    ap_merge.add_argument('-V', '--file-version', type=int, choices=[1, 2],
+                          default=1, help='output layout version; '
+                          'defaults to 1')
+    ap_merge.set_defaults(process=process_merge)
+
     # Export command
     ap_export = sp.add_parser('export', help='export --help',
                               description='Converts .pyfr[ms] files for '
                               'visualisation in external software.')
     ap_export.add_argument('meshf', help='PyFR mesh file to be converted')
-    ap_export.add_argument('solnf', help='PyFR solution file to be converted')
-    ap_export.add_argument('outf', type=str, help='Output filename')
+    ap_export.add_argument('solnf', nargs='+', help='PyFR solution files to '
+                           'be converted; wildcards are expanded')
+    ap_export.add_argument('outf', type=str, help='Output filename; when '
+                           'exporting several solutions this must contain '
+                           '{n} or {soln}')
     types = [cls.name for cls in subclasses(BaseWriter)]
     ap_export.add_argument('-t', dest='type', choices=types, required=False,
                            help='Output file type; this is usually inferred '
@@ -77,6 +106,12 @@ def main():
     ap_export.add_argument('-p', '--precision', choices=['single', 'double'],
                            default='single', help='Output number precision, '
                            'defaults to single')
+    ap_export.add_argument('-c', '--chunk-size', type=int, default=0,
+                           help='Number of elements to process at a time; '
+                           'bounds the memory required by the export')
+    ap_export.add_argument('-j', '--jobs', type=int, default=1,
+                           help='Number of solutions, or pieces of a .pvtu '
+                           'file, to export concurrently')
     ap_export.set_defaults(process=process_export)
 
     # Run command
@@ -112,20 +147,22 @@ def main():
 
 
 def process_import(args):
-    # Get a suitable mesh reader instance
-    if args.type:
-        reader = get_reader_by_name(args.type, args.inmesh)
-    else:
-        extn = os.path.splitext(args.inmesh.name)[1]
-        reader = get_reader_by_extn(extn, args.inmesh)
+    # Out-of-core imports keep their working arrays in scratch files
+    store = SpillStore(args.scratch) if args.scratch else ArrayStore()
 
-    # Get the mesh in the PyFR format
-    mesh = reader.to_pyfrm()
+    with store:
+        # Get a suitable mesh reader instance
+        if args.type:
+            reader = get_reader_by_name(args.type, args.inmesh, store=store)
+        else:
+            extn = os.path.splitext(args.inmesh.name)[1]
+            reader = get_reader_by_extn(extn, args.inmesh, store=store)
 
-    # Save to disk
-    with h5py.File(args.outmesh, 'w') as f:
-        for k, v in mesh.items():
-            f[k] = v
+        # Get the mesh in the PyFR format
+        mesh = reader.to_pyfrm()
+
+        # Save to disk
+        write_native(args.outmesh, mesh)
 
 
 def process_partition(args):
@@ -156,27 +193,50 @@ def process_partition(args):
             raise RuntimeError('No partitioners available')
 
     # Partition the mesh
-    mesh, part_soln_fn = part.partition(NativeReader(args.mesh))
+    inmesh = NativeReader(args.mesh)
+    mesh, part_soln_fn = part.partition(inmesh)
 
-    # Prepare the solutions
-    solnit = (part_soln_fn(NativeReader(s)) for s in args.solns)
+    # Save the mesh to disk using the same layout as the input
+    path = os.path.join(args.outd, os.path.basename(args.mesh.rstrip('/')))
+    write_native(path, mesh, inmesh.version)
 
-    # Output paths/files
-    paths = it.chain([args.mesh], args.solns)
-    files = it.chain([mesh], solnit)
+    # Partition and save the solutions, again preserving their layout
+    for s in args.solns:
+        insoln = NativeReader(s)
+        soln = part_soln_fn(insoln)
 
-    # Iterate over the output mesh/solutions
-    for path, data in zip(paths, files):
         # Compute the output path
-        path = os.path.join(args.outd, os.path.basename(path.rstrip('/')))
+        path = os.path.join(args.outd, os.path.basename(s.rstrip('/')))
 
         # Save to disk
-        with h5py.File(path, 'w') as f:
-            for k, v in data.items():
-                f[k] = v
+        write_native(path, soln, insoln.version)
+
+
+def process_convert_mesh(args):
+    write_native(args.outmesh, NativeReader(args.inmesh), args.mesh_version)
+
+
+def process_merge(args):
+    write_native(args.outf, NativeReader(args.indir), args.file_version)
 
 
 def process_export(args):
+    # Expand any wildcards in the solution file names
+    solnfs = [f for s in args.solnf for f in sorted(glob.glob(s)) or [s]]
+
+    # Determine the output file for each solution
+    if len(solnfs) == 1:
+        outfs = [args.outf]
+    elif re.search(r'{(n|soln)\b', args.outf):
+        outfs = [args.outf.format(n=i, soln=os.path.splitext(
+                                      os.path.basename(f))[0])
+                 for i, f in enumerate(solnfs)]
+    else:
+        raise ValueError('Output filename must contain {n} or {soln} when '
+                         'exporting multiple solutions')
+
+    args.solnf, args.outf = solnfs[0], outfs[0]
+
     # Get writer instance by specified type or outf extension
     if args.type:
         writer = get_writer_by_name(args.type, args)
@@ -184,11 +244,27 @@ def process_export(args):
         extn = os.path.splitext(args.outf)[1]
         writer = get_writer_by_extn(extn, args)
 
-    # Write the output file
-    writer.write_out()
+    # Retain the mesh-dependent arrays when exporting several solutions
+    writer.reuse_mesh = len(solnfs) > 1
+
+    # Write the first output file; if it is the only one then its pieces
+    # can instead be written in parallel
+    writer.write_out(jobs=args.jobs if len(solnfs) == 1 else 1)
 
+    def export(solnf, outf):
+        writer.set_soln(solnf, outf)
+        writer.write_out()
+
+    # Followed by any remaining files
+    rest = list(zip(solnfs[1:], outfs[1:]))
+    if args.jobs > 1 and len(rest) > 1:
+        fork_starmap(export, rest, args.jobs, init=writer.reopen)
+    else:
+        for solnf, outf in rest:
+            export(solnf, outf)
 
-def _process_common(args, mesh, soln, cfg):
+
+def _process_common(args, meshf, solnf, cfg):
     # Prefork to allow us to exec processes after MPI is initialised
     if hasattr(os, 'fork'):
         from pytools.prefork import enable_prefork
@@ -199,19 +275,66 @@ def _process_common(args, mesh, soln, cfg):
     from mpi4py import MPI
 
     # Manually initialise MPI
-    MPI.Init()
+    with startup_timer('mpi-init'):
+        MPI.Init()
 
     # Ensure MPI is suitably cleaned up
     register_finalize_handler()
 
+    comm, rank, root = get_comm_rank_root()
+
+    # Have the root rank index the mesh and solution files
+    with startup_timer('index'):
+        if rank == root:
+            mesh = NativeReader(meshf)
+            soln = NativeReader(solnf) if solnf else None
+
+            # Ensure the solution is from the mesh we are using
+            if soln and soln['mesh_uuid'] != mesh['mesh_uuid']:
+                info = RuntimeError('Invalid solution for mesh.')
+            else:
+                info = (mesh.index, soln.index if soln else None,
+                        soln['config'] if cfg is None else None)
+        else:
+            mesh = info = None
+
+        # Broadcast the indices along with any config from the solution
+        info = comm.bcast(info, root=root)
+
+        # If the root encountered an error then raise it on all ranks
+        if isinstance(info, Exception):
+            raise info
+
+        mindex, sindex, solncfg = info
+
+    # Process the config file
+    if cfg is None:
+        cfg = Inifile(solncfg)
+
     # Create a backend
-    backend = get_backend(args.backend, cfg)
+    with startup_timer('backend'):
+        backend = get_backend(args.backend, cfg)
 
     # Get the mapping from physical ranks to MPI ranks
-    rallocs = get_rank_allocation(mesh, cfg)
+    with startup_timer('rank-allocation'):
+        rallocs = get_rank_allocation(mesh, cfg)
+
+    # Read in only those parts of the mesh and solution which we need
+    with startup_timer('load'):
+        mesh = read_partition(meshf, mindex, rallocs.prank, comm)
+        if solnf:
+            soln = read_partition(solnf, sindex, rallocs.prank, comm)
+        else:
+            soln = None
 
     # Construct the solver
-    solver = get_solver(backend, rallocs, mesh, soln, cfg)
+    with startup_timer('solver'):
+        solver = get_solver(backend, rallocs, mesh, soln, cfg)
+
+    # Stop timing and report where the start-up time went
+    startup_timer.close()
+    if args.verbose:
+        startup_timer.print_report()
 
     # If we are running interactively then create a progress bar
     if args.progress and MPI.COMM_WORLD.rank == 0:
@@ -226,26 +349,14 @@ def _process_common(args, mesh, soln, cfg):
 
 
 def process_run(args):
-    _process_common(
-        args, NativeReader(args.mesh), None, Inifile.load(args.cfg)
-    )
+    _process_common(args, args.mesh, None, Inifile.load(args.cfg))
 
 
 def process_restart(args):
-    mesh = NativeReader(args.mesh)
-    soln = NativeReader(args.soln)
-
-    # Ensure the solution is from the mesh we are using
-    if soln['mesh_uuid'] != mesh['mesh_uuid']:
-        raise RuntimeError('Invalid solution for mesh.')
-
-    # Process the config file
-    if args.cfg:
-        cfg = Inifile.load(args.cfg)
-    else:
-        cfg = Inifile(soln['config'])
+    # Unless a config file is given the one in the solution is used
+    cfg = Inifile.load(args.cfg) if args.cfg else None
 
-    _process_common(args, mesh, soln, cfg)
+    _process_common(args, args.mesh, args.soln, cfg)
 
 
 if __name__ == '__main__':
@@ -2,10 +2,12 @@
 
 import itertools as it
 from math import exp
+import os
 import re
 
 import numpy as np
 
+from pyfr.cache import cached_op, default_cachedir
 from pyfr.nputil import block_diag, chop
 from pyfr.polys import get_polybasis
 from pyfr.quadrules import get_quadrule
@@ -78,11 +80,33 @@ class BaseShape(object):
         else:
             raise ValueError('Invalid number of shape points')
 
-    @chop
     def opmat(self, expr):
         if not re.match(r'[M0-9\-+*() ]+$', expr):
             raise ValueError('Invalid operator matrix expression')
 
+        return self.cached_op(lambda: self._opmat(expr), 'opmat', expr)
+
+    def cached_op(self, fn, *key):
+        # See if the operator cache is enabled
+        if not self.cfg.getbool('backend', 'op-cache', True):
+            return fn()
+
+        cdir = self.cfg.getpath('backend', 'op-cache-dir',
+                                os.path.join(default_cachedir(), 'ops'))
+
+        # Operators depend on the shape, order and the point sets in use
+        sects = ['solver-elements-' + self.name, 'soln-filter']
+        sects.extend(sorted({'solver-interfaces-' + k
+                             for k, p, n in self.faces}))
+
+        ckey = [self.name, self.nspts, self.order, sorted(self.antialias)]
+        ckey.extend((s, sorted(self.cfg.items(s).items()))
+                    for s in sects if s in self.cfg.sections())
+
+        return cached_op(ckey + list(key), fn, cdir)
+
+    @chop
+    def _opmat(self, expr):
         mats = {m: np.asmatrix(getattr(self, m.lower()))
                 for m in re.findall(r'M\d+', expr)}
 
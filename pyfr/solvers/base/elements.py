@@ -6,7 +6,8 @@ import re
 
 import numpy as np
 
-from pyfr.nputil import npeval, fuzzysort
+from pyfr.nputil import fuzzysort_batch, npeval
+from pyfr.timer import startup_timer
 from pyfr.util import lazyprop, memoize
 
 
@@ -76,18 +77,25 @@ class BaseElements(object, metaclass=ABCMeta):
         for i, v in enumerate(self.pri_to_con(ics, self.cfg)):
             self._scal_upts[:, i, :] = v
 
-    def set_ics_from_soln(self, solnmat, solncfg):
+    def set_ics_from_soln(self, solnmat, solncfg, solnsts=None):
         # Recreate the existing solution basis
         solnb = self.basis.__class__(None, solncfg)
 
-        # Form the interpolation operator
-        interp = solnb.ubasis.nodal_basis_at(self.basis.upts)
+        # Form the interpolation operator; for modally encoded solutions
+        # this evaluates the retained modes at our solution points
+        if solnsts and solnsts.get('data', 'encoding', 'nodal') == 'modal':
+            modes = solnb.ubasis.modes_upto(
+                solnsts.getint('data', 'modal-degree')
+            )
+            interp = solnb.ubasis.ortho_basis_at(self.basis.upts)[modes].T
+        else:
+            interp = solnb.ubasis.nodal_basis_at(self.basis.upts)
 
         # Sizes
         nupts, neles, nvars = self.nupts, self.neles, self.nvars
 
         # Apply and reshape
-        self._scal_upts = np.dot(interp, solnmat.reshape(solnb.nupts, -1))
+        self._scal_upts = np.dot(interp, solnmat.reshape(interp.shape[1], -1))
         self._scal_upts = self._scal_upts.reshape(nupts, nvars, neles)
 
     @lazyprop
@@ -103,10 +111,14 @@ class BaseElements(object, metaclass=ABCMeta):
 
     @lazyprop
     def _srtd_face_fpts(self):
-        plocfpts = self.plocfpts.transpose(1, 2, 0).tolist()
+        plocfpts = self.plocfpts.transpose(2, 1, 0)
+
+        srtd = []
+        for ffpts in self.basis.facefpts:
+            idx = fuzzysort_batch(plocfpts[...,ffpts])
+            srtd.append(np.array(ffpts)[idx])
 
-        return [[fuzzysort(pts, ffpts) for pts in plocfpts]
-                for ffpts in self.basis.facefpts]
+        return srtd
 
     @abstractproperty
     def _scratch_bufs(self):
@@ -274,6 +286,10 @@ class BaseElements(object, metaclass=ABCMeta):
 
     @lazyprop
     def _smats_djacs_mpts(self):
+        with startup_timer('metrics'):
+            return self._get_smats_djacs_mpts()
+
+    def _get_smats_djacs_mpts(self):
         # Metric basis with grid point (q<=p) or pseudo grid points (q>p)
         mpts = self.basis.mpts
         mbasis = self.basis.mbasis
@@ -332,42 +348,57 @@ class BaseElements(object, metaclass=ABCMeta):
         fpts_idx = self.basis.facefpts[fidx]
         return self._mag_pnorm_fpts[fpts_idx,eidx]
 
-    def get_mag_pnorms_for_inter(self, eidx, fidx):
-        fpts_idx = self._srtd_face_fpts[fidx][eidx]
-        return self._mag_pnorm_fpts[fpts_idx,eidx]
-
-    def get_norm_pnorms_for_inter(self, eidx, fidx):
-        fpts_idx = self._srtd_face_fpts[fidx][eidx]
-        return self._norm_pnorm_fpts[fpts_idx,eidx]
-
     def get_norm_pnorms(self, eidx, fidx):
         fpts_idx = self.basis.facefpts[fidx]
         return self._norm_pnorm_fpts[fpts_idx,eidx]
 
+    def _get_fpts_for_inter(self, eidx, fidx):
+        nfp = np.array(self.nfacefpts)[fidx]
+        off = np.cumsum(nfp) - nfp
+
+        # Gather the sorted flux points of each face type in turn
+        fpidx = np.empty(nfp.sum(), dtype=np.int64)
+        for f, ffpts in enumerate(self._srtd_face_fpts):
+            ix = np.nonzero(fidx == f)[0]
+            fpidx[off[ix,None] + np.arange(ffpts.shape[1])] = ffpts[eidx[ix]]
+
+        return fpidx, np.repeat(eidx, nfp)
+
+    def get_mag_pnorms_for_inter(self, eidx, fidx):
+        fpidx, eidx = self._get_fpts_for_inter(eidx, fidx)
+        return self._mag_pnorm_fpts[fpidx,eidx]
+
+    def get_norm_pnorms_for_inter(self, eidx, fidx):
+        fpidx, eidx = self._get_fpts_for_inter(eidx, fidx)
+        return self._norm_pnorm_fpts[fpidx,eidx]
+
     def get_scal_fpts_for_inter(self, eidx, fidx):
-        nfp = self.nfacefpts[fidx]
+        fpidx, eidx = self._get_fpts_for_inter(eidx, fidx)
+        nfp = len(fpidx)
 
-        rcmap = [(fpidx, eidx) for fpidx in self._srtd_face_fpts[fidx][eidx]]
-        cstri = ((self._scal_fpts.leadsubdim,),)*nfp
+        rcmap = np.column_stack((fpidx, eidx))
+        cstri = np.full((nfp, 1), self._scal_fpts.leadsubdim)
 
-        return (self._scal_fpts.mid,)*nfp, rcmap, cstri
+        return np.full(nfp, self._scal_fpts.mid), rcmap, cstri
 
     def get_vect_fpts_for_inter(self, eidx, fidx):
-        nfp = self.nfacefpts[fidx]
+        fpidx, eidx = self._get_fpts_for_inter(eidx, fidx)
+        nfp = len(fpidx)
 
-        rcmap = [(fpidx, eidx) for fpidx in self._srtd_face_fpts[fidx][eidx]]
-        rcstri = ((self.nfpts, self._vect_fpts.leadsubdim),)*nfp
+        rcmap = np.column_stack((fpidx, eidx))
+        rcstri = np.tile([self.nfpts, self._vect_fpts.leadsubdim], (nfp, 1))
 
-        return (self._vect_fpts.mid,)*nfp, rcmap, rcstri
+        return np.full(nfp, self._vect_fpts.mid), rcmap, rcstri
 
     def get_avis_fpts_for_inter(self, eidx, fidx):
-        nfp = self.nfacefpts[fidx]
+        fpidx, eidx = self._get_fpts_for_inter(eidx, fidx)
+        nfp = len(fpidx)
 
-        rcmap = [(fpidx, eidx) for fpidx in self._srtd_face_fpts[fidx][eidx]]
-        cstri = ((self._avis_fpts.leadsubdim,),)*nfp
+        rcmap = np.column_stack((fpidx, eidx))
+        cstri = np.full((nfp, 1), self._avis_fpts.leadsubdim)
 
-        return (self._avis_fpts.mid,)*nfp, rcmap, cstri
+        return np.full(nfp, self._avis_fpts.mid), rcmap, cstri
 
     def get_ploc_for_inter(self, eidx, fidx):
-        fpts_idx = self._srtd_face_fpts[fidx][eidx]
-        return self.plocfpts[fpts_idx,eidx]
+        fpidx, eidx = self._get_fpts_for_inter(eidx, fidx)
+        return self.plocfpts[fpidx,eidx]
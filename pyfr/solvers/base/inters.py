@@ -3,17 +3,51 @@
 import numpy as np
 
 
+def _get_inter_nfpts(interside, elemap):
+    nfps = np.empty(len(interside), dtype=np.int64)
+
+    for type, ele in elemap.items():
+        ix = np.nonzero(interside['f0'] == type)[0]
+        nfps[ix] = np.array(ele.nfacefpts)[interside['f2'][ix]]
+
+    return nfps
+
+
 def _get_inter_objs(interside, getter, elemap):
-    # Map from element type to view mat getter
-    emap = {type: getattr(ele, getter) for type, ele in elemap.items()}
+    # Number of flux points at each interface and their offsets
+    nfps = _get_inter_nfpts(interside, elemap)
+    offs = np.cumsum(nfps) - nfps
+
+    objs = []
+    for type, ele in elemap.items():
+        ix = np.nonzero(interside['f0'] == type)[0]
+        if not len(ix):
+            continue
+
+        # Get the data for all of the faces of this type at once
+        eobjs = getattr(ele, getter)(interside['f1'][ix], interside['f2'][ix])
+        istuple = isinstance(eobjs, tuple)
+
+        # Determine where their flux points belong in the interface
+        nfp = nfps[ix]
+        fpix = np.repeat(offs[ix] - np.cumsum(nfp) + nfp, nfp)
+        fpix += np.arange(len(fpix))
+
+        objs.append((fpix, eobjs if istuple else (eobjs,)))
+
+    # Assemble the data for the interface as a whole
+    mats = []
+    for i, m in enumerate(objs[0][1]):
+        mats.append(np.empty((nfps.sum(),) + m.shape[1:], dtype=m.dtype))
+
+        for fpix, eobjs in objs:
+            mats[-1][fpix] = eobjs[i]
 
-    # Get the data from the interface
-    return [emap[type](eidx, fidx) for type, eidx, fidx, flags in interside]
+    return tuple(mats) if istuple else mats[0]
 
 
 def get_opt_view_perm(interside, mat, elemap):
-    vm = _get_inter_objs(interside, mat, elemap)
-    matmap, rcmap = [np.concatenate([m[i] for m in vm]) for i in range(2)]
+    matmap, rcmap, stridemap = _get_inter_objs(interside, mat, elemap)
 
     # Sort
     return np.lexsort((matmap, rcmap[:,1], rcmap[:,0]))
@@ -33,8 +67,7 @@ class BaseInters(object):
         self.ninters = len(lhs)
 
         # Compute the total number of interface flux points
-        self.ninterfpts = sum(elemap[etype].nfacefpts[fidx]
-                              for etype, eidx, fidx, flags in lhs)
+        self.ninterfpts = int(_get_inter_nfpts(lhs, elemap).sum())
 
         # By default do not permute any of the interface arrays
         self._perm = Ellipsis
@@ -49,7 +82,6 @@ class BaseInters(object):
         m = _get_inter_objs(inter, meth, self._elemap)
 
         # Swizzle the dimensions and permute
-        m = np.concatenate(m)
         m = np.atleast_2d(m.T)
         m = m[:,self._perm]
 
@@ -57,7 +89,7 @@ class BaseInters(object):
 
     def _view(self, inter, meth, vshape=tuple()):
         vm = _get_inter_objs(inter, meth, self._elemap)
-        vm = [np.concatenate(m)[self._perm] for m in zip(*vm)]
+        vm = [m[self._perm] for m in vm]
         return self._be.view(*vm, vshape=vshape)
 
     def _scal_view(self, inter, meth):
@@ -68,7 +100,7 @@ class BaseInters(object):
 
     def _xchg_view(self, inter, meth, vshape=tuple()):
         vm = _get_inter_objs(inter, meth, self._elemap)
-        vm = [np.concatenate(m)[self._perm] for m in zip(*vm)]
+        vm = [m[self._perm] for m in vm]
         return self._be.xchg_view(*vm, vshape=vshape)
 
     def _scal_xchg_view(self, inter, meth):
@@ -7,6 +7,7 @@ import re
 
 from pyfr.inifile import Inifile
 from pyfr.shapes import BaseShape
+from pyfr.timer import startup_timer
 from pyfr.util import proxylist, subclasses
 
 
@@ -25,8 +26,11 @@ class BaseSystem(object, metaclass=ABCMeta):
         self.cfg = cfg
 
         # Load the elements
-        eles, elemap = self._load_eles(rallocs, mesh, initsoln, nreg)
-        backend.commit()
+        with startup_timer('elements'):
+            eles, elemap = self._load_eles(rallocs, mesh, initsoln, nreg)
+
+        with startup_timer('commit'):
+            backend.commit()
 
         # Retain the element map; this may be deleted by clients
         self.ele_map = elemap
@@ -49,15 +53,21 @@ class BaseSystem(object, metaclass=ABCMeta):
         self.nvars = eles[0].nvars
 
         # Load the interfaces
-        int_inters = self._load_int_inters(rallocs, mesh, elemap)
-        mpi_inters = self._load_mpi_inters(rallocs, mesh, elemap)
-        bc_inters = self._load_bc_inters(rallocs, mesh, elemap)
-        backend.commit()
+        with startup_timer('interfaces'):
+            int_inters = self._load_int_inters(rallocs, mesh, elemap)
+            mpi_inters = self._load_mpi_inters(rallocs, mesh, elemap)
+            bc_inters = self._load_bc_inters(rallocs, mesh, elemap)
+
+        with startup_timer('commit'):
+            backend.commit()
+
+        # Prepare the queues and kernels; committing also completes any
+        # outstanding kernel compilations
+        with startup_timer('kernels'):
+            self._gen_queues()
+            self._gen_kernels(eles, int_inters, mpi_inters, bc_inters)
 
-        # Prepare the queues and kernels
-        self._gen_queues()
-        self._gen_kernels(eles, int_inters, mpi_inters, bc_inters)
-        backend.commit()
+            backend.commit()
 
     def _load_eles(self, rallocs, mesh, initsoln, nreg):
         basismap = {b.name: b for b in subclasses(BaseShape, just_leaf=True)}
@@ -93,7 +103,7 @@ class BaseSystem(object, metaclass=ABCMeta):
             # Process the solution
             for k, ele in elemap.items():
                 soln = initsoln['soln_%s_p%d' % (k, rallocs.prank)]
-                ele.set_ics_from_soln(soln, solncfg)
+                ele.set_ics_from_soln(soln, solncfg, solnsts)
         else:
             eles.set_ics_from_cfg()
 
@@ -105,7 +115,7 @@ class BaseSystem(object, metaclass=ABCMeta):
     def _load_int_inters(self, rallocs, mesh, elemap):
         key = 'con_p{0}'.format(rallocs.prank)
 
-        lhs, rhs = mesh[key].astype('U4,i4,i1,i1').tolist()
+        lhs, rhs = mesh[key].astype('U4,i4,i1,i1')
         int_inters = self.intinterscls(self.backend, lhs, rhs, elemap,
                                        self.cfg)
 
@@ -120,7 +130,7 @@ class BaseSystem(object, metaclass=ABCMeta):
         for rhsprank in rallocs.prankconn[lhsprank]:
             rhsmrank = rallocs.pmrankmap[rhsprank]
             interarr = mesh['con_p%dp%d' % (lhsprank, rhsprank)]
-            interarr = interarr.astype('U4,i4,i1,i1').tolist()
+            interarr = interarr.astype('U4,i4,i1,i1')
 
             mpiiface = self.mpiinterscls(self.backend, interarr, rhsmrank,
                                          rallocs, elemap, self.cfg)
@@ -143,7 +153,7 @@ class BaseSystem(object, metaclass=ABCMeta):
                 cfgsect = 'soln-bcs-%s' % rgn
 
                 # Get the interface
-                interarr = mesh[f].astype('U4,i4,i1,i1').tolist()
+                interarr = mesh[f].astype('U4,i4,i1,i1')
 
                 # Instantiate
                 bcclass = bcmap[self.cfg.get(cfgsect, 'type')]
@@ -1,15 +1,25 @@
- # -*- coding: utf-8 -*-
+# -*- coding: utf-8 -*-
 
+import importlib.util
+import os
 import pkgutil
+import time
 
 from mako.lookup import TemplateLookup
 from mako.template import Template
 
+from pyfr.timer import startup_timer
+
 
 class DottedTemplateLookup(TemplateLookup):
-    def __init__(self, pkg, **kwargs):
+    # Compiled templates, and the time taken to compile them, shared
+    # between all lookups in this process
+    _tpl_cache = {}
+
+    def __init__(self, pkg, *, moddir=None, **kwargs):
         self.dfltpkg = pkg
         self.dfltargs = kwargs
+        self.moddir = moddir
 
     def adjust_uri(self, uri, relto):
         return uri
@@ -25,14 +35,47 @@ class DottedTemplateLookup(TemplateLookup):
             pkg = self.dfltpkg
             basename = name
 
-        # Attempt to load the template
-        src = pkgutil.get_data(pkg, basename + '.mako')
-        if not src:
-            raise RuntimeError('Template "{}" not found'.format(name))
+        # See if we have already compiled this template
+        key = (self.dfltpkg, pkg, basename,
+               tuple(sorted(self.dfltargs.items())))
+        try:
+            tpl, tcompile = self._tpl_cache[key]
+        except KeyError:
+            startup_timer.count('template-cache-misses')
+        else:
+            startup_timer.count('template-cache-hits')
+            startup_timer.count('template-cache-time-saved', tcompile)
+            return tpl
+
+        tstart = time.perf_counter()
 
         # Subclass Template to support implicit arguments
         class DefaultTemplate(Template):
             def render(iself, *args, **kwargs):
                 return super().render(*args, **dict(self.dfltargs, **kwargs))
 
-        return DefaultTemplate(src, lookup=self)
+        # Where possible let Mako persist the compiled module to disk
+        tpath = self.moddir and self._template_path(pkg, basename)
+        if tpath:
+            uri = os.path.join(*pkg.split('.'), basename + '.mako')
+            tpl = DefaultTemplate(filename=tpath, uri=uri, lookup=self,
+                                  module_directory=self.moddir)
+        # Otherwise, attempt to load and compile the template in memory
+        else:
+            src = pkgutil.get_data(pkg, basename + '.mako')
+            if not src:
+                raise RuntimeError('Template "{}" not found'.format(name))
+
+            tpl = DefaultTemplate(src, lookup=self)
+
+        self._tpl_cache[key] = (tpl, time.perf_counter() - tstart)
+        return tpl
+
+    def _template_path(self, pkg, basename):
+        spec = importlib.util.find_spec(pkg)
+        if not spec or not spec.has_location:
+            return None
+
+        # Templates inside of archives can not be loaded by file name
+        path = os.path.join(os.path.dirname(spec.origin), basename + '.mako')
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+import pyfr.readers.cgns as cgns
+from pyfr.readers.cgns import CGNSReader, CGNSZoneReader
+
+
+class _File(object):
+    name = 'mesh.cgns'
+
+
+def _make_zone(x0, x1, ny, left=True, right=True, perturb=0):
+    # Structured grid of nodes
+    x, y = np.meshgrid(np.arange(x0, x1 + 1.0), np.arange(ny + 1.0))
+    x[:, 0] += perturb
+    ids = np.arange(1, x.size + 1).reshape(x.shape)
+
+    # Quadrangles as a mixed section where every other row is split
+    # into a pair of triangles
+    quads = np.stack([ids[:-1, :-1], ids[:-1, 1:], ids[1:, 1:],
+                      ids[1:, :-1]], axis=-1)
+
+    mixed = []
+    for i, row in enumerate(quads):
+        if i % 2:
+            tris = np.vstack([row[:, [0, 1, 2]], row[:, [0, 2, 3]]])
+            mixed.append(np.column_stack([np.full(len(tris), 5), tris]))
+        else:
+            mixed.append(np.column_stack([np.full(len(row), 7), row]))
+
+    nfluid = sum(len(m) for m in mixed)
+    mixed = np.concatenate([m.ravel() for m in mixed])
+
+    # Walls on the bottom, top and, optionally, the sides
+    wall = [np.column_stack([ids[0, :-1], ids[0, 1:]]),
+            np.column_stack([ids[-1, 1:], ids[-1, :-1]])]
+    if left:
+        wall.append(np.column_stack([ids[1:, 0], ids[:-1, 0]]))
+    if right:
+        wall.append(np.column_stack([ids[:-1, -1], ids[1:, -1]]))
+
+    wall = np.vstack(wall)
+
+    return {
+        'pts': np.array([x.ravel(), y.ravel(), 0*x.ravel()]),
+        'sects': [(20, mixed, (1, nfluid)),
+                  (3, wall.ravel(), (nfluid + 1, nfluid + len(wall)))],
+        'bc': {'wall': (nfluid + 1, nfluid + len(wall))},
+        'left': ids[:, 0], 'right': ids[:, -1], 'conns': []
+    }
+
+
+class _Wrappers(object):
+    Vertex, CellCenter = 2, 3
+    Abutting, Abutting1to1 = 3, 4
+    PointList, PointListDonor, PointRange = 2, 3, 4
+
+    zones = {}
+
+    def open(self, name):
+        return 1
+
+    def close(self, file):
+        pass
+
+    def base_read(self, file, idx):
+        return {'file': file, 'idx': idx + 1}
+
+    def nzones(self, base):
+        return len(self.zones)
+
+    def zone_read(self, base, idx):
+        name = sorted(self.zones)[idx]
+        return {'base': base, 'idx': idx + 1, 'name': name,
+                'size': [self.zones[name]['pts'].shape[1]]}
+
+    def _zone(self, zone):
+        return self.zones[zone['name']]
+
+    def coord_read(self, zone, name, x):
+        x[:] = self._zone(zone)['pts']['XYZ'.index(name[-1])]
+
+    def nbocos(self, zone):
+        return len(self._zone(zone)['bc'])
+
+    def boco_read(self, zone, idx):
+        name, rng = sorted(self._zone(zone)['bc'].items())[idx]
+        return {'name': name, 'range': rng}
+
+    def nconns(self, zone):
+        if len(self.zones) == 1:
+            raise AssertionError('Connectivity read for a single zone')
+
+        return len(self._zone(zone)['conns'])
+
+    def conn_info(self, zone, idx):
+        return dict(self._zone(zone)['conns'][idx], idx=idx)
+
+    def conn_read(self, zone, info):
+        if info['location'] != self.Vertex:
+            raise AssertionError('Unsupported connectivity read')
+
+        return {'name': 'conn', 'donor': info['donor'],
+                'pnts': info['pnts'], 'donor_pnts': info['donor_pnts']}
+
+    def nsections(self, zone):
+        return len(self._zone(zone)['sects'])
+
+    def section_read(self, zone, idx):
+        etype, conn, rng = self._zone(zone)['sects'][idx]
+        return {'zone': zone, 'idx': idx + 1, 'dim': len(conn),
+                'etype': etype, 'range': rng}
+
+    def elements_read(self, sect, conn):
+        conn[:] = self._zone(sect['zone'])['sects'][sect['idx'] - 1][1]
+
+
+def _conn(donor, pnts, donor_pnts, location=2, periodic=False):
+    return {'donor': donor, 'location': location, 'type': 4,
+            'ptset_type': 2, 'donor_ptset_type': 3, 'periodic': periodic,
+            'pnts': pnts, 'donor_pnts': donor_pnts}
+
+
+def _read(monkeypatch, zones):
+    monkeypatch.setattr(_Wrappers, 'zones', zones)
+    monkeypatch.setattr(cgns, 'CGNSWrappers', _Wrappers)
+
+    return CGNSReader(_File()).to_pyfrm()
+
+
+def _summarise(mesh):
+    # Element centroids and the number of faces of each kind
+    cents = {k: np.sort(np.round(v.mean(axis=0), 8), axis=0)
+             for k, v in mesh.items() if k.startswith('spt_')}
+    nfaces = {k: v.shape[-1] for k, v in mesh.items()
+              if k.startswith(('con_', 'bcon_'))}
+
+    return cents, nfaces
+
+
+def test_single_zone(monkeypatch):
+    mesh = _read(monkeypatch, {'a': _make_zone(0, 4, 4)})
+
+    cents, nfaces = _summarise(mesh)
+    assert {k: len(v) for k, v in cents.items()} == {'spt_quad_p0': 8,
+                                                      'spt_tri_p0': 16}
+    assert nfaces == {'con_p0': 32, 'bcon_wall_p0': 16}
+
+
+def test_multi_zone(monkeypatch):
+    ref = _summarise(_read(monkeypatch, {'a': _make_zone(0, 4, 4)}))
+
+    # Split the mesh into two zones, perturbing the nodes on one side of
+    # the interface by roundoff
+    a = _make_zone(0, 1, 4, right=False)
+    b = _make_zone(1, 4, 4, left=False, perturb=1e-15)
+    a['conns'] = [
+        _conn('b', a['right'], b['left']),
+        # Periodic and cell-centred connectivity should be ignored
+        _conn('b', a['left'], b['right'], periodic=True),
+        _conn('b', None, None, location=_Wrappers.CellCenter)
+    ]
+    b['conns'] = [_conn('a', b['left'], a['right'])]
+
+    cents, nfaces = _summarise(_read(monkeypatch, {'a': a, 'b': b}))
+    assert nfaces == ref[1]
+
+    for k, v in cents.items():
+        assert np.allclose(v, ref[0][k])
+
+
+def test_split_mixed():
+    reader = CGNSZoneReader.__new__(CGNSZoneReader)
+
+    # Runs of quadrangles and triangles; the first spans several windows
+    runs = [(7, 3000), (5, 1), (7, 2), (5, 1500)]
+    rng = np.random.RandomState(4)
+
+    conn, ref = [], []
+    for etype, n in runs:
+        nodes = rng.randint(1, 100, size=(n, 4 if etype == 7 else 3))
+        conn.append(np.column_stack([np.full(n, etype), nodes]).ravel())
+        ref.append((etype, nodes))
+
+    split = list(reader._split_mixed(np.concatenate(conn)))
+    assert [etype for etype, eles in split] == [etype for etype, n in runs]
+
+    for (etype, eles), (retype, reles) in zip(split, ref):
+        assert np.array_equal(eles, reles)
+
+    # Truncated and unknown elements should be rejected
+    with pytest.raises(ValueError):
+        list(reader._split_mixed(np.array([7, 1, 2, 3, 4, 7, 1, 2])))
+
+    with pytest.raises(ValueError):
+        list(reader._split_mixed(np.array([99, 1, 2, 3])))
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+
+from argparse import Namespace
+import filecmp
+import os
+import tempfile
+
+import numpy as np
+
+from pyfr.inifile import Inifile
+from pyfr.scripts.main import process_export
+from pyfr.shapes import BaseShape
+from pyfr.util import subclass_where
+from pyfr.writers.vtk import VTKWriter
+from pyfr.writers.native import write_native
+
+
+_cfg = '''
+[solver]
+system = euler
+order = 2
+
+[solver-elements-quad]
+soln-pts = gauss-legendre
+
+[solver-elements-tri]
+soln-pts = williams-shunn
+
+[constants]
+gamma = 1.4
+'''
+
+
+def _make_mesh():
+    # Lower left corners of the unit squares in the mesh
+    quads = [[(0, 0), (1, 0)], [(2, 0)], []]
+    tris = [[], [(0, 1)], [(1, 1), (2, 1)]]
+
+    mesh = {'mesh_uuid': np.array('uuid', dtype='S')}
+    for i, (q, t) in enumerate(zip(quads, tris)):
+        if q:
+            q = np.array(q, dtype=float)
+            mesh['spt_quad_p{0}'.format(i)] = np.array([
+                q, q + [1, 0], q + [0, 1], q + [1, 1]
+            ])
+
+        # Split each square into a pair of triangles
+        if t:
+            t = np.array(t, dtype=float)
+            mesh['spt_tri_p{0}'.format(i)] = np.hstack([
+                [t, t + [1, 0], t + [0, 1]],
+                [t + [1, 1], t + [0, 1], t + [1, 0]]
+            ])
+
+    return mesh
+
+
+def _make_soln(mesh, seed, degree=None):
+    rng = np.random.RandomState(seed)
+    nupts = {'quad': 9, 'tri': 6}
+
+    stats = Inifile()
+    stats.set('data', 'prefix', 'soln')
+    stats.set('data', 'fields', 'rho,rhou,rhov,E')
+
+    # Optionally store the modes up to a given degree
+    if degree is not None:
+        stats.set('data', 'encoding', 'modal')
+        stats.set('data', 'modal-degree', degree)
+
+    soln = {'mesh_uuid': mesh['mesh_uuid'],
+            'config': np.array(_cfg, dtype='S'),
+            'stats': np.array(stats.tostr(), dtype='S')}
+
+    for k, v in mesh.items():
+        if k.startswith('spt_'):
+            etype, neles = k.split('_')[1], v.shape[1]
+
+            # Keep the density and energy positive
+            s = rng.rand(nupts[etype], 4, neles)
+            s[:, 0] += 1
+            s[:, 3] += 3
+
+            if degree is not None:
+                shapecls = subclass_where(BaseShape, name=etype)
+                ub = shapecls(len(v), Inifile(_cfg)).ubasis
+
+                encop = np.linalg.inv(ub.vdm.T)[ub.modes_upto(degree)]
+                s = np.einsum('ij,jkl->ikl', encop, s)
+
+            soln['soln' + k[3:]] = s
+
+    return soln
+
+
+def _export(meshf, solnf, outf, **kwargs):
+    args = dict(type=None, divisor=0, gradients=False, precision='single',
+                chunk_size=0, jobs=1)
+    args.update(kwargs)
+
+    process_export(Namespace(meshf=meshf, solnf=solnf, outf=outf, **args))
+
+
+def _write_files(tdir, nsoln, degrees=None):
+    mesh = _make_mesh()
+
+    meshf = os.path.join(tdir, 'mesh.pyfrm')
+    write_native(meshf, mesh)
+
+    solnfs = []
+    for i in range(nsoln):
+        degree = degrees[i] if degrees else None
+
+        solnfs.append(os.path.join(tdir, 'soln-{0}.pyfrs'.format(i)))
+        write_native(solnfs[-1], _make_soln(mesh, i, degree))
+
+    return meshf, solnfs
+
+
+def test_export_batch():
+    with tempfile.TemporaryDirectory() as tdir:
+        meshf, solnfs = _write_files(tdir, 3)
+
+        for grad in [False, True]:
+            # Export each of the solutions on its own
+            for f in solnfs:
+                outf = os.path.splitext(f)[0] + '-ref.vtu'
+                _export(meshf, [f], outf, gradients=grad)
+
+            # And then all of them in a single batch
+            _export(meshf, [os.path.join(tdir, 'soln-*.pyfrs')],
+                    os.path.join(tdir, '{soln}-batch.vtu'), gradients=grad)
+
+            for f in solnfs:
+                ref = os.path.splitext(f)[0] + '-ref.vtu'
+                out = os.path.splitext(f)[0] + '-batch.vtu'
+                assert filecmp.cmp(ref, out, shallow=False)
+
+
+def test_export_modal():
+    with tempfile.TemporaryDirectory() as tdir:
+        meshf, solnfs = _write_files(tdir, 3, degrees=[1, 2, 1])
+
+        # Solutions stored with differing numbers of modes should export
+        # the same in a batch as they do on their own
+        for f in solnfs:
+            _export(meshf, [f], os.path.splitext(f)[0] + '-ref.vtu')
+
+        _export(meshf, [os.path.join(tdir, 'soln-*.pyfrs')],
+                os.path.join(tdir, '{soln}-batch.vtu'))
+
+        for f in solnfs:
+            ref = os.path.splitext(f)[0] + '-ref.vtu'
+            out = os.path.splitext(f)[0] + '-batch.vtu'
+            assert filecmp.cmp(ref, out, shallow=False)
+
+
+def test_export_parallel(monkeypatch):
+    with tempfile.TemporaryDirectory() as tdir:
+        meshf, solnfs = _write_files(tdir, 3)
+        globf = os.path.join(tdir, 'soln-*.pyfrs')
+
+        # Record the processes which write out each piece
+        pidf = os.path.join(tdir, 'pids')
+        write_vtu = VTKWriter._write_vtu
+
+        def _write_vtu(self, pfn, misil):
+            with open(pidf, 'a') as f:
+                f.write('{0}\n'.format(os.getpid()))
+
+            write_vtu(self, pfn, misil)
+
+        monkeypatch.setattr(VTKWriter, '_write_vtu', _write_vtu)
+
+        for jobs in [1, 2]:
+            odir = os.path.join(tdir, 'j{0}'.format(jobs))
+            os.mkdir(odir)
+
+            # Write out the pieces of a partitioned solution concurrently
+            _export(meshf, solnfs[:1], os.path.join(odir, 'soln.pvtu'),
+                    gradients=True, jobs=jobs)
+
+            with open(pidf) as f:
+                pids = {int(l) for l in f}
+
+            assert (os.getpid() in pids) == (jobs == 1)
+
+            # Along with a batch of solutions
+            _export(meshf, [globf], os.path.join(odir, 'batch-{n}.vtu'),
+                    jobs=jobs)
+
+            os.remove(pidf)
+
+        # Irrespective of the number of jobs the output should be the same
+        names = sorted(os.listdir(os.path.join(tdir, 'j1')))
+        assert len(names) == 7
+
+        match, mismatch, errors = filecmp.cmpfiles(
+            os.path.join(tdir, 'j1'), os.path.join(tdir, 'j2'), names,
+            shallow=False
+        )
+        assert match == names
+
+
+def test_export_chunked():
+    with tempfile.TemporaryDirectory() as tdir:
+        meshf, solnfs = _write_files(tdir, 2)
+        globf = os.path.join(tdir, 'soln-*.pyfrs')
+
+        for csize in [0, 1, 2]:
+            odir = os.path.join(tdir, 'c{0}'.format(csize))
+            os.mkdir(odir)
+
+            _export(meshf, solnfs[:1], os.path.join(odir, 'soln.pvtu'),
+                    chunk_size=csize)
+            _export(meshf, [globf], os.path.join(odir, 'batch-{n}.vtu'),
+                    chunk_size=csize)
+
+        # Processing the elements in chunks should not change the output;
+        # gradients are excluded as the rounding of the BLAS can depend on
+        # the number of elements in a chunk
+        names = sorted(os.listdir(os.path.join(tdir, 'c0')))
+        assert len(names) == 6
+
+        for csize in [1, 2]:
+            match, mismatch, errors = filecmp.cmpfiles(
+                os.path.join(tdir, 'c0'), os.path.join(tdir, 'c{0}'
+                                                      .format(csize)),
+                names, shallow=False
+            )
+            assert match == names
+
+        # Only the arrays of a single block should be kept between solutions
+        args = Namespace(meshf=meshf, solnf=solnfs[0],
+                         outf=os.path.join(tdir, 'soln.vtu'), divisor=0,
+                         gradients=True, precision='single', chunk_size=1)
+
+        writer = VTKWriter(args)
+        writer.reuse_mesh = True
+
+        for i, f in enumerate(solnfs):
+            writer.set_soln(f, args.outf)
+
+            # Operators should be kept as the configuration is unchanged
+            assert bool(getattr(writer, '_memoize_cache', {})) == (i > 0)
+
+            writer.write_out()
+
+            assert len(writer._vtu_geom) == len(writer._grad_ops) == 1
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from io import BytesIO
+import pkgutil
+import tempfile
+
+import numpy as np
+import pytest
+
+from pyfr.readers.base import SpillMeshAssembler, SpillStore
+from pyfr.readers.gmsh import GmshReader
+
+
+def _read_msh(name, store=None):
+    return GmshReader(BytesIO(pkgutil.get_data(__name__, name)), store)
+
+
+def _edit_elements(name, fn):
+    lines = pkgutil.get_data(__name__, name).decode().splitlines()
+
+    # Apply the edit to the element records and renumber them
+    i = lines.index('$Elements')
+    j = lines.index('$EndElements')
+    eles = fn([l.split(' ', 1)[1] for l in lines[i + 2:j]])
+    eles = ['{0} {1}'.format(k + 1, e) for k, e in enumerate(eles)]
+
+    lines[i + 1:j] = [str(len(eles))] + eles
+
+    return GmshReader(BytesIO('\n'.join(lines).encode()))
+
+
+def _check_mesh(mesh, ref):
+    assert sorted(mesh) == sorted(ref)
+
+    for k in ref:
+        if k != 'mesh_uuid':
+            assert np.array_equal(mesh[k], ref[k])
+
+
+def test_v22_ascii():
+    mesh = _read_msh('mixed-v2.2-ascii.msh').to_pyfrm()
+
+    assert mesh['spt_quad_p0'].shape == (4, 2, 2)
+    assert mesh['spt_tri_p0'].shape == (3, 4, 2)
+    assert mesh['con_p0'].shape == (2, 6)
+    assert mesh['bcon_inlet_p0'].shape == (2,)
+    assert mesh['bcon_wall_p0'].shape == (6,)
+
+
+def test_v22_binary():
+    ref = _read_msh('mixed-v2.2-ascii.msh').to_pyfrm()
+
+    for endian in ['le', 'be']:
+        reader = _read_msh('mixed-v2.2-binary-{0}.msh'.format(endian))
+
+        assert reader._version == 2
+        assert reader._endian == {'le': '<', 'be': '>'}[endian]
+
+        _check_mesh(reader.to_pyfrm(), ref)
+
+
+def test_v41():
+    ref = _read_msh('mixed-v2.2-ascii.msh').to_pyfrm()
+
+    # Entity tags differ from the physical tags and the nodes are split
+    # over two blocks, the second of which is parametric
+    for ftype in ['ascii', 'binary-le', 'binary-be']:
+        reader = _read_msh('mixed-v4.1-{0}.msh'.format(ftype))
+
+        assert reader._version == 4
+
+        _check_mesh(reader.to_pyfrm(), ref)
+
+
+def test_spill_store(monkeypatch):
+    # Process a few elements at a time and spread the faces over several
+    # buckets so each of the out-of-core code paths is exercised
+    monkeypatch.setattr(SpillMeshAssembler, '_chunksize', 3)
+    monkeypatch.setattr(SpillMeshAssembler, '_bucketsize', 4)
+    monkeypatch.setattr(GmshReader, '_blksize', 5)
+
+    for name in ['mixed-v2.2-ascii.msh', 'mixed-v2.2-binary-le.msh',
+                 'mixed-v4.1-ascii.msh', 'mixed-v4.1-binary-be.msh']:
+        ref = _read_msh(name).to_pyfrm()
+
+        with tempfile.TemporaryDirectory() as tdir:
+            with SpillStore(tdir) as store:
+                _check_mesh(_read_msh(name, store).to_pyfrm(), ref)
+
+
+def test_periodic():
+    ref = np.load(BytesIO(pkgutil.get_data(__name__,
+                                           'periodic-v2.2-con.npz')))
+
+    # Connectivity should match that of the original dict-based pairing
+    for store in [None, SpillStore()]:
+        mesh = _read_msh('periodic-v2.2-ascii.msh', store).to_pyfrm()
+
+        assert sorted(k for k in mesh if 'con' in k) == sorted(ref)
+        for k in ref:
+            assert np.array_equal(mesh[k], ref[k])
+
+        if store:
+            store.close()
+
+
+def test_unpaired_faces():
+    # Index of the first wall face in the element records
+    def wall(eles):
+        return next(i for i, e in enumerate(eles) if e.startswith('1 2 4 4 '))
+
+    # Faces which are on neither a boundary nor another element
+    def drop(eles):
+        i = wall(eles)
+        return eles[:i] + eles[i + 1:]
+
+    # Or which are claimed by multiple boundaries
+    def dup(eles):
+        return eles + [eles[wall(eles)]]
+
+    for fn in [drop, dup]:
+        reader = _edit_elements('periodic-v2.2-ascii.msh', fn)
+
+        with pytest.raises(ValueError):
+            reader.to_pyfrm()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+from types import SimpleNamespace
+
+import numpy as np
+
+from pyfr.solvers.base.elements import BaseElements
+from pyfr.solvers.base.inters import _get_inter_nfpts, _get_inter_objs
+
+
+class _Elements(object):
+    _get_fpts_for_inter = BaseElements._get_fpts_for_inter
+    get_scal_fpts_for_inter = BaseElements.get_scal_fpts_for_inter
+    get_ploc_for_inter = BaseElements.get_ploc_for_inter
+
+    def __init__(self, rng, nfacefpts, neles, mid):
+        self.nfacefpts = nfacefpts
+        self.nfpts = sum(nfacefpts)
+        self.plocfpts = rng.rand(self.nfpts, neles, 2)
+        self._scal_fpts = SimpleNamespace(mid=mid, leadsubdim=7)
+
+        # Give each face a random per-element flux point ordering
+        self._srtd_face_fpts = []
+        for f, off in enumerate(np.cumsum(nfacefpts) - nfacefpts):
+            perm = rng.rand(neles, nfacefpts[f]).argsort(axis=1)
+            self._srtd_face_fpts.append(off + perm)
+
+    def ploc_for_face(self, eidx, fidx):
+        return self.plocfpts[self._srtd_face_fpts[fidx][eidx], eidx]
+
+    def scal_fpts_for_face(self, eidx, fidx):
+        fpts = self._srtd_face_fpts[fidx][eidx]
+        nfp = len(fpts)
+
+        return (np.full(nfp, self._scal_fpts.mid),
+                np.column_stack((fpts, np.full(nfp, eidx))),
+                np.full((nfp, 1), self._scal_fpts.leadsubdim))
+
+
+def _make_elemap():
+    rng = np.random.RandomState(3)
+
+    return {'tri': _Elements(rng, [3, 3, 3], 5, 11),
+            'quad': _Elements(rng, [2, 2, 2, 2], 4, 12)}
+
+
+def _make_interside():
+    return np.array([('quad', 1, 3, 0), ('tri', 4, 0, 0), ('tri', 0, 2, 0),
+                     ('quad', 3, 0, 0), ('tri', 4, 1, 0), ('quad', 1, 1, 0),
+                     ('tri', 2, 2, 0)], dtype='U4,i4,i1,i1')
+
+
+def test_get_inter_nfpts():
+    elemap = _make_elemap()
+    interside = _make_interside()
+
+    nfps = _get_inter_nfpts(interside, elemap)
+    assert list(nfps) == [2, 3, 3, 2, 3, 2, 3]
+
+
+def test_get_inter_objs():
+    elemap = _make_elemap()
+    interside = _make_interside()
+
+    # Gathering the data for all faces at once should be equivalent to
+    # stacking the data for each face in interface order
+    ploc = _get_inter_objs(interside, 'get_ploc_for_inter', elemap)
+    ref = [elemap[t].ploc_for_face(e, f) for t, e, f, _ in interside]
+    assert np.array_equal(ploc, np.vstack(ref))
+
+    scal = _get_inter_objs(interside, 'get_scal_fpts_for_inter', elemap)
+    ref = [elemap[t].scal_fpts_for_face(e, f) for t, e, f, _ in interside]
+    for m, r in zip(scal, zip(*ref)):
+        assert np.array_equal(m, np.concatenate(r))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import time
+
+from pyfr.backends.openmp.compiler import SourceModule
+from pyfr.cache import lock_file
+from pyfr.ctypesutil import platform_libname
+from pyfr.inifile import Inifile
+
+
+class _SourceModule(SourceModule):
+    def _build_cmd(self, tmpdir):
+        pass
+
+    def _cache_key(self):
+        return ('cc',)
+
+
+def _touch(path, size=0, mtime=None):
+    with open(path, 'wb') as f:
+        f.write(b'\0'*size)
+
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_cache_evict():
+    with tempfile.TemporaryDirectory() as tdir:
+        cfg = Inifile()
+        cfg.set('backend-openmp', 'cache-dir', tdir)
+        cfg.set('backend-openmp', 'cache-size', 2.5/1024)
+
+        mod = _SourceModule('src', cfg)
+
+        def lpath(n):
+            return os.path.join(tdir, platform_libname(n))
+
+        def cached():
+            return sorted(os.listdir(tdir))
+
+        def expected(names):
+            return sorted(platform_libname(n) + e for n in names
+                          for e in ['', '.lock'])
+
+        # Libraries of 1 KiB from oldest to newest, each with a lock file
+        now = time.time()
+        for i, n in enumerate('abcde'):
+            _touch(lpath(n), 1024, now - 10 + i)
+            _touch(lpath(n) + '.lock')
+
+        # Along with the lock file of a library which is no longer present
+        _touch(lpath('f') + '.lock')
+
+        # Libraries whose lock is held by another process should be kept
+        with lock_file(lpath('a') + '.lock'):
+            mod._cache_evict()
+
+        assert cached() == expected('ae')
+
+        # Once it is no longer held the library can be removed
+        mod._cachesize = 1024
+        mod._cache_evict()
+        assert cached() == expected('e')
+
+
+def test_lock_file_removed():
+    with tempfile.TemporaryDirectory() as tdir:
+        path = os.path.join(tdir, 'lock')
+
+        # Take the lock and then remove the file whilst holding it
+        lockf = lock_file(path)
+        os.remove(path)
+        lockf.close()
+
+        # Subsequent locks should be on a new file
+        with lock_file(path) as lockf:
+            assert os.path.samestat(os.fstat(lockf.fileno()), os.stat(path))
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+
+import h5py
+import numpy as np
+
+from pyfr.readers.native import NativeReader, read_partition
+from pyfr.writers.native import write_native
+
+
+def _make_con(recs):
+    return np.array(recs, dtype='S4,i4,i1,i1')
+
+
+def _make_mesh():
+    rng = np.random.RandomState(42)
+
+    # Four partitions with differing numbers of elements of each type;
+    # the final one has a single element and so no internal faces
+    mesh = {
+        'spt_quad_p0': rng.rand(4, 3, 2),
+        'spt_quad_p1': rng.rand(4, 7, 2),
+        'spt_quad_p2': rng.rand(4, 1, 2),
+        'spt_tri_p1': rng.rand(3, 2, 2),
+        'spt_tri_p2': rng.rand(3, 5, 2),
+        'spt_tri_p3': rng.rand(3, 1, 2),
+        'con_p0': _make_con([[('quad', 0, 1, 0), ('quad', 1, 1, 0)],
+                             [('quad', 1, 3, 0), ('quad', 2, 3, 0)]]),
+        'con_p1': _make_con([[('quad', 0, 1, 0)], [('tri', 1, 0, 0)]]),
+        'con_p2': _make_con([[('tri', 0, 1, 0), ('tri', 3, 2, 0),
+                              ('quad', 0, 0, 0)],
+                             [('tri', 4, 0, 0), ('tri', 1, 2, 0),
+                              ('tri', 2, 1, 0)]]),
+        'con_p3': _make_con([[], []]),
+        'con_p0p1': _make_con([('quad', 2, 1, 0)]),
+        'con_p1p0': _make_con([('quad', 6, 3, 0)]),
+        'con_p2p3': _make_con([('tri', 4, 1, 0)]),
+        'con_p3p2': _make_con([('tri', 0, 0, 0)]),
+        'bcon_wall_p0': _make_con([('quad', 0, 0, 0)]),
+        'bcon_wall_p2': _make_con([('tri', 1, 0, 0), ('tri', 2, 0, 0)]),
+        'bcon_inlet_p1': _make_con([('tri', 0, 2, 0), ('quad', 5, 0, 0),
+                                    ('quad', 6, 0, 0)]),
+        'bcon_inlet_p3': _make_con([('tri', 0, 1, 0), ('tri', 0, 2, 0)]),
+        'mesh_uuid': np.array('uuid', dtype='S')
+    }
+
+    return mesh
+
+
+def _check_arrays(mesh, arrs):
+    assert sorted(arrs) == sorted(mesh)
+
+    for k, v in mesh.items():
+        assert np.array_equal(np.asarray(arrs[k]), v.astype(str)
+                              if v.shape == () else v)
+
+
+def test_v2_uneven_partitions():
+    mesh = _make_mesh()
+
+    with tempfile.TemporaryDirectory() as tdir:
+        path = os.path.join(tdir, 'mesh.pyfrm')
+        write_native(path, mesh, version=2)
+
+        # The packed file should round-trip through the reader
+        reader = NativeReader(path)
+        assert reader.version == 2
+        _check_arrays(mesh, {k: reader[k] for k in reader})
+
+        # Each partition should also be readable on its own
+        for i in range(4):
+            part = read_partition(path, reader.index, i)
+            _check_arrays({k: v for k, v in mesh.items()
+                           if '_p' not in k or '_p{0}'.format(i) in k}, part)
+
+        # As should the arrays when accessed lazily
+        lazy = NativeReader(path, lazy=True)
+        for k in mesh:
+            if mesh[k].shape:
+                assert lazy[k].shape == mesh[k].shape
+                assert np.array_equal(np.asarray(lazy[k]), mesh[k])
+
+
+def test_lazy_array():
+    rng = np.random.RandomState(5)
+    spt, soln = rng.rand(4, 9, 3), rng.rand(6, 2, 9)
+
+    with tempfile.TemporaryDirectory() as tdir:
+        path = os.path.join(tdir, 'data.h5')
+
+        with h5py.File(path, 'w') as f:
+            f['spt_hex_p0'] = spt
+            f['soln_hex_p0'] = soln
+            f.create_dataset('soln_hex_p1', data=soln, compression='gzip')
+
+        reader = NativeReader(path, lazy=True)
+
+        # Contiguous datasets should be memory mapped
+        assert reader['spt_hex_p0']._mmap is not None
+        assert reader['soln_hex_p1']._mmap is None
+
+        for k, v in [('spt_hex_p0', spt), ('soln_hex_p0', soln),
+                     ('soln_hex_p1', soln)]:
+            arr = reader[k]
+            assert arr.shape == v.shape and arr.dtype == v.dtype
+            assert np.array_equal(np.asarray(arr), v)
+
+            # Slices along the element axis
+            if k.startswith('spt'):
+                assert np.array_equal(arr[:, 2:7], v[:, 2:7])
+                assert np.array_equal(arr[:, 5:2], v[:, 5:2])
+            else:
+                assert np.array_equal(arr[..., 2:7], v[..., 2:7])
+                assert np.array_equal(arr[:, :, -3:], v[:, :, -3:])
+
+            # Along with more general indexing
+            assert np.array_equal(arr[1], v[1])
+            assert np.array_equal(arr[..., ::2], v[..., ::2])
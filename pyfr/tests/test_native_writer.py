@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+import os
+from types import SimpleNamespace
+import tempfile
+
+import numpy as np
+
+from pyfr.inifile import Inifile
+from pyfr.readers.native import NativeReader, read_partition
+from pyfr.shapes import BaseShape
+from pyfr.solvers.base.elements import BaseElements
+from pyfr.util import subclass_where
+import pyfr.writers.native as native
+
+
+# Element types, number of solution points and number of elements in
+# each of the partitions; the final partition is larger than the others
+_parts = [
+    [('quad', 9, 3), ('tri', 6, 2)],
+    [('quad', 9, 5)],
+    [('quad', 9, 1), ('tri', 6, 9)]
+]
+_nvars = 2
+
+_cfg = '''
+[solver]
+order = 2
+
+[solver-elements-quad]
+soln-pts = gauss-legendre
+
+[solver-elements-tri]
+soln-pts = williams-shunn
+'''
+
+
+class _Request(object):
+    def Wait(self):
+        pass
+
+
+class _Comm(object):
+    def __init__(self, data, parts=_parts):
+        self.data = data
+        self.parts = parts
+        self.nrecv = 0
+
+    def allgather(self, obj):
+        # Other ranks store the same number of values per element as us
+        nvals = {et: shape[0] for et, shape in obj}
+
+        return [[(et, (nvals.get(et, nupts), _nvars, neles))
+                 for et, nupts, neles in p] for p in self.parts]
+
+    def Irecv(self, buf, source, tag):
+        # Fill the buffer now so any premature reuse of it is detected
+        buf[...] = self.data[source][tag]
+        self.nrecv += 1
+
+        return _Request()
+
+    def Recv_init(self, buf, source, tag):
+        pass
+
+
+def _make_data():
+    rng = np.random.RandomState(11)
+
+    return [[rng.rand(nupts, _nvars, neles) for et, nupts, neles in p]
+            for p in _parts]
+
+
+def _get_basis(etype, nupts, cfg):
+    return subclass_where(BaseShape, name=etype)(nupts, cfg)
+
+
+def _make_writer(monkeypatch, tdir, rank, comm, **opts):
+    parts = comm.parts
+
+    monkeypatch.setattr(native, 'get_comm_rank_root',
+                        lambda: (comm, rank, 0))
+    monkeypatch.setenv('PYFR_FORCE_SERIAL_HDF5', '1')
+
+    cfg = Inifile(_cfg)
+    for k, v in opts.items():
+        cfg.set('soln-plugin-writer', k.replace('_', '-'), v)
+
+    system = SimpleNamespace(
+        ndims=2, ele_types=[et for et, nupts, neles in parts[rank]],
+        ele_shapes=[(nupts, _nvars, neles)
+                    for et, nupts, neles in parts[rank]],
+        ele_map={et: SimpleNamespace(basis=_get_basis(et, nupts, cfg))
+                 for et, nupts, neles in parts[rank]}
+    )
+    intg = SimpleNamespace(
+        isrestart=False, cfg=cfg, system=system,
+        backend=SimpleNamespace(fpdtype=np.float64),
+        rallocs=SimpleNamespace(mprankmap=list(range(len(parts))))
+    )
+
+    return native.NativeWriter(intg, _nvars, tdir, 'out-{n}',
+                               prefix='soln', cfgsect='soln-plugin-writer')
+
+
+def _check_soln(reader, data):
+    for i, p in enumerate(_parts):
+        for (et, nupts, neles), d in zip(p, data[i]):
+            assert np.array_equal(reader['soln_{0}_p{1}'.format(et, i)], d)
+
+    assert reader['stats'] == '[data]'
+
+
+def test_write_packed(monkeypatch):
+    data = _make_data()
+
+    with tempfile.TemporaryDirectory() as tdir:
+        writer = _make_writer(monkeypatch, tdir, 0, _Comm(data), version=2)
+
+        # Write out the data as gathered by the root rank
+        names = ['soln_{0}_p{1}'.format(et, i)
+                 for i, p in enumerate(_parts) for et, nupts, neles in p]
+        datadict = dict(zip(names, (d for pd in data for d in pd)))
+
+        path = os.path.join(tdir, 'out.pyfrs')
+        writer._write_serial_file(path, datadict,
+                                  {'stats': np.array('[data]', dtype='S')})
+
+        # Each element type should be stored as a single dataset
+        reader = NativeReader(path)
+        assert reader.version == 2
+        assert sorted(reader._file) == ['offsets', 'soln_quad', 'soln_tri',
+                                        'stats']
+        assert list(reader._file['offsets/soln_tri']) == [0, 2, 2, 11]
+
+        # But appear to be partitioned when read back
+        _check_soln(reader, data)
+        assert [s[-1] for et, s in reader.array_info('soln').values()] == \
+            [3, 2, 5, 1, 9]
+
+        for et, arr in reader.combine_partitions('soln').items():
+            parts = [d for p, pd in zip(_parts, data)
+                     for (pet, nupts, neles), d in zip(p, pd) if pet == et]
+            assert np.array_equal(arr, np.concatenate(parts, axis=-1))
+
+
+def test_write_streamed(monkeypatch):
+    data = _make_data()
+
+    for version in [1, 2]:
+        with tempfile.TemporaryDirectory() as tdir:
+            comm = _Comm(data)
+            writer = _make_writer(monkeypatch, tdir, 0, comm, version=version)
+
+            # The root should only buffer the largest block of another rank
+            assert [len(b) for b in writer._mpi_sbufs] == [6*_nvars*9]*2
+
+            for i in range(2):
+                writer.write(data[0], {'stats': '[data]'}, 0.0)
+                assert comm.nrecv == 3*(i + 1)
+
+                reader = NativeReader(os.path.join(tdir, 'out-{0}.pyfrs'
+                                                   .format(i)))
+                assert reader.version == version
+                _check_soln(reader, data)
+
+
+def test_write_per_rank(monkeypatch):
+    data = _make_data()
+
+    with tempfile.TemporaryDirectory() as tdir:
+        # Have each rank write out its own file
+        for rank in range(len(_parts)):
+            writer = _make_writer(monkeypatch, tdir, rank, _Comm(data),
+                                  file_per_rank='true')
+            writer.write(data[rank], {'stats': '[data]'}, 0.0)
+
+        dname = os.path.join(tdir, 'out-0.pyfrs.d')
+        assert sorted(os.listdir(dname)) == ['manifest.h5', 'p0.h5',
+                                             'p1.h5', 'p2.h5']
+
+        # The directory should read as if it were a single file
+        reader = NativeReader(dname)
+        _check_soln(reader, data)
+
+        # With each rank only needing its own partition
+        for i, p in enumerate(_parts):
+            part = read_partition(dname, reader.index, i)
+            assert sorted(part) == sorted(['stats'] +
+                                          ['soln_{0}_p{1}'.format(et, i)
+                                           for et, nupts, neles in p])
+
+        # Merging the directory should give an equivalent file
+        for version in [1, 2]:
+            path = os.path.join(tdir, 'merged-{0}.pyfrs'.format(version))
+            native.write_native(path, reader, version)
+
+            merged = NativeReader(path)
+            assert merged.version == version
+            _check_soln(merged, data)
+
+
+def _decode(reader, etype, nupts, neles, i):
+    # Interpolate the stored solution onto our solution points
+    cfg, stats = Inifile(_cfg), Inifile(reader['stats'])
+    eles = SimpleNamespace(basis=_get_basis(etype, nupts, cfg), nupts=nupts,
+                           nvars=_nvars, neles=neles)
+
+    mat = reader['soln_{0}_p{1}'.format(etype, i)]
+    BaseElements.set_ics_from_soln(eles, mat, cfg, stats)
+
+    return mat, eles._scal_upts
+
+
+def _write_modal(monkeypatch, tdir, data, **opts):
+    # Only the root rank's data is encoded so it must be the only rank
+    writer = _make_writer(monkeypatch, tdir, 0, _Comm([data], _parts[:1]),
+                          encoding='modal', **opts)
+    writer.write(data, {'stats': '[data]'}, 0.0)
+
+    reader = NativeReader(os.path.join(tdir, 'out-0.pyfrs'))
+    assert Inifile(reader['stats']).get('data', 'encoding') == 'modal'
+
+    # Return the stored coefficients and decoded solution of each type
+    return [_decode(reader, et, nupts, neles, 0)
+            for et, nupts, neles in _parts[0]]
+
+
+def test_write_modal(monkeypatch):
+    cfg = Inifile(_cfg)
+    rng = np.random.RandomState(2)
+
+    # Solutions whose highest degree modes hold little of their energy,
+    # apart from in the final element of each type
+    data, coeffs, vdms = [], [], []
+    for et, nupts, neles in _parts[0]:
+        ub = _get_basis(et, nupts, cfg).ubasis
+        degs = np.array(ub.degrees)
+
+        c = rng.randn(nupts, _nvars, neles)
+        c[degs == degs.max(), :, :-1] *= 1e-3
+
+        data.append(np.einsum('ij,jkl->ikl', ub.vdm.T, c))
+        coeffs.append((c, degs))
+        vdms.append(ub.vdm.T)
+
+    with tempfile.TemporaryDirectory() as tdir:
+        # By default the encoding should be lossless
+        out = _write_modal(monkeypatch, tdir, data)
+
+        for (mat, soln), (c, degs), d in zip(out, coeffs, data):
+            assert np.allclose(mat, c, rtol=0, atol=1e-12)
+            assert np.allclose(soln, d, rtol=0, atol=1e-12)
+
+    with tempfile.TemporaryDirectory() as tdir:
+        # Truncating the degree should drop the higher modes entirely
+        out = _write_modal(monkeypatch, tdir, data, modal_degree=1)
+
+        for (mat, soln), (c, degs), vdm in zip(out, coeffs, vdms):
+            keep = degs <= 1
+
+            assert len(mat) == np.sum(keep)
+            assert np.allclose(mat, c[keep], rtol=0, atol=1e-12)
+
+            tsoln = np.einsum('ij,jkl->ikl', vdm[:, keep], c[keep])
+            assert np.allclose(soln, tsoln, rtol=0, atol=1e-12)
+
+    with tempfile.TemporaryDirectory() as tdir:
+        # With a tolerance the highest degree modes should be zeroed in
+        # all but the final element
+        out = _write_modal(monkeypatch, tdir, data, modal_tol=1e-4)
+
+        for (mat, soln), (c, degs), d in zip(out, coeffs, data):
+            hdegs = degs == degs.max()
+
+            assert not np.any(mat[hdegs, :, :-1])
+            assert np.allclose(mat[~hdegs], c[~hdegs], rtol=0, atol=1e-12)
+            assert np.allclose(mat[..., -1], c[..., -1], rtol=0, atol=1e-12)
+            assert np.allclose(soln, d, rtol=0, atol=1e-2)
+
+    with tempfile.TemporaryDirectory() as tdir:
+        # Rounding the mantissas should retain the requested bits
+        out = _write_modal(monkeypatch, tdir, data, modal_bits=10)
+
+        for (mat, soln), (c, degs), vdm in zip(out, coeffs, vdms):
+            assert not np.any(mat.view(np.uint64) & (2**42 - 1))
+            assert np.allclose(mat, c, rtol=2**-10, atol=0)
+
+            rsoln = np.einsum('ij,jkl->ikl', vdm, mat)
+            assert np.allclose(soln, rsoln, rtol=0, atol=1e-12)
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from pyfr.nputil import fuzzysort, fuzzysort_batch
+
+
+def test_fuzzysort_batch_near_ties():
+    rng = np.random.RandomState(7)
+    tol = 1e-6
+
+    # Points on a coarse grid which are perturbed by a fraction of the
+    # tolerance, such that each coordinate is tied with many others
+    ndims, nbatch, n = 3, 8, 64
+    arr = rng.randint(0, 3, size=(ndims, nbatch, n)).astype(float)
+
+    # Ensure that no two points coincide
+    arr[-1] = rng.rand(nbatch, n).argsort(axis=1)
+
+    arr += 0.4*tol*rng.uniform(-1, 1, size=arr.shape)
+
+    # Include chains of values which straddle the tolerance
+    arr[0, :, :6] = 5 + 0.6*tol*np.arange(6)
+    arr[1, :, :6] = rng.permutation(6)
+
+    for b in range(nbatch):
+        rng.shuffle(arr[:, b].T)
+
+    bidx = fuzzysort_batch(arr, tol)
+
+    for b in range(nbatch):
+        assert list(bidx[b]) == fuzzysort(arr[:, b], range(n), tol=tol)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from pyfr.polys import get_polybasis
+from pyfr.quadrules import get_quadrule
+
+
+# Quadrature rules which integrate the product of any two third order
+# basis functions exactly
+_qrules = {
+    'line': ('gauss-legendre', 3),
+    'tri': ('williams-shunn', 10),
+    'quad': ('gauss-legendre', 9),
+    'tet': ('witherden-vincent', 24),
+    'pri': ('williams-shunn~gauss-legendre', 75),
+    'hex': ('gauss-legendre', 27)
+}
+
+# Points inside of each shape, including vertices where the collapsed
+# coordinate systems are singular
+_pts = {
+    'line': [[-1], [-0.3], [0.6], [1]],
+    'tri': [[-1, -1], [-1, 1], [-0.5, -0.2], [0.3, -0.9]],
+    'quad': [[-1, -1], [1, 1], [-0.5, 0.2], [0.3, -0.9]],
+    'tet': [[-1, -1, -1], [-1, -1, 1], [-0.9, -0.5, -0.7], [-0.5, -0.4, -0.3]],
+    'pri': [[-1, -1, -1], [-1, 1, 1], [-0.5, -0.2, 0.4], [0.3, -0.9, -1]],
+    'pyr': [[-1, -1, -1], [0, 0, 1], [-0.5, -0.2, 0.4], [0.3, -0.2, -0.5]],
+    'hex': [[-1, -1, -1], [1, 1, 1], [-0.5, 0.2, 0.4], [0.3, -0.9, -1]]
+}
+
+
+def test_ortho_basis_orthonormal():
+    for shape, (rname, npts) in _qrules.items():
+        qr = get_quadrule(shape, rname, npts)
+        ob = get_polybasis(shape, 3).ortho_basis_at(qr.pts)
+
+        m = np.dot(qr.wts*ob, ob.T)
+        assert np.allclose(m, np.eye(len(m)))
+
+
+def test_ortho_basis_pointwise():
+    for shape, pts in _pts.items():
+        pts = np.array(pts, dtype=float)
+        pts = pts[:, 0] if shape == 'line' else pts
+
+        basis = get_polybasis(shape, 4)
+
+        # Evaluating all of the points at once should be equivalent to
+        # evaluating them one at a time
+        ob = basis.ortho_basis_at(pts)
+        job = basis.jac_ortho_basis_at(pts)
+
+        for i, p in enumerate(pts):
+            assert np.array_equal(ob[:, i], basis.ortho_basis_at([p])[:, 0])
+            assert np.array_equal(job[..., i],
+                                  basis.jac_ortho_basis_at([p])[..., 0])
+
+
+def test_jac_ortho_basis():
+    eps = 1e-6
+
+    for shape, pts in _pts.items():
+        # Keep away from any singular points
+        pts = 0.5*np.array(pts, dtype=float)[2:]
+        ndims = pts.shape[1]
+
+        basis = get_polybasis(shape, 3)
+        job = basis.jac_ortho_basis_at(pts[:, 0] if ndims == 1 else pts)
+
+        # Compare against central differences
+        for d in range(ndims):
+            dp = eps*np.eye(ndims)[d]
+            pp, pm = pts + dp, pts - dp
+
+            if ndims == 1:
+                pp, pm = pp[:, 0], pm[:, 0]
+
+            fd = basis.ortho_basis_at(pp) - basis.ortho_basis_at(pm)
+            fd /= 2*eps
+
+            assert np.allclose(job[d], fd, atol=1e-6)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import itertools as it
+import time
+
+from pyfr.mpiutil import get_comm_rank_root
+
+
+class PhaseTimer(object):
+    def __init__(self):
+        self.times = OrderedDict()
+        self.counts = OrderedDict()
+        self.closed = False
+
+        self._stack = []
+        self._reduced = None
+
+    @contextmanager
+    def __call__(self, name):
+        # Once closed no further phases are recorded
+        if self.closed:
+            yield
+            return
+
+        self._stack.append(name)
+
+        # Nested phases are named relative to their parents
+        key = '.'.join(self._stack)
+        self.times.setdefault(key, 0.0)
+
+        tstart = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[key] += time.perf_counter() - tstart
+            self._stack.pop()
+
+    def count(self, name, n=1):
+        if not self.closed:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def close(self):
+        self.closed = True
+
+    def reduce(self):
+        # After closing the times can no longer change
+        if self._reduced is not None:
+            return self._reduced
+
+        comm, rank, root = get_comm_rank_root()
+
+        # Gather the times and counts from every rank
+        allvals = comm.allgather((self.times, self.counts))
+
+        # Entries absent on a rank are taken to be zero
+        ret = []
+        for i in range(2):
+            red = OrderedDict()
+            for rvals in allvals:
+                for k in rvals[i]:
+                    if k not in red:
+                        v = [av[i].get(k, 0) for av in allvals]
+                        red[k] = (min(v), sum(v) / len(v), max(v))
+
+            ret.append(red)
+
+        if self.closed:
+            self._reduced = ret
+
+        return ret
+
+    def collect_stats(self, stats, sect):
+        times, counts = self.reduce()
+
+        for k, (vmin, vmean, vmax) in it.chain(times.items(), counts.items()):
+            stats.set(sect, k, '{0:.6g}, {1:.6g}, {2:.6g}'.format(vmin, vmean,
+                                                                  vmax))
+
+    def print_report(self, file=None):
+        comm, rank, root = get_comm_rank_root()
+
+        times, counts = self.reduce()
+
+        if rank == root:
+            w = max(2*k.count('.') + len(k.split('.')[-1]) for k in times)
+            w = max(w, len('Phase'))
+
+            print('{0:{1}}  {2:>9} {3:>9} {4:>9}'
+                  .format('Phase', w, 'Min/s', 'Mean/s', 'Max/s'), file=file)
+
+            for k, v in times.items():
+                name = '  '*k.count('.') + k.split('.')[-1]
+                print('{0:{1}}  {2:9.3f} {3:9.3f} {4:9.3f}'
+                      .format(name, w, *v), file=file)
+
+            if counts:
+                w = max(len(k) for k in counts)
+                w = max(w, len('Counter'))
+
+                print('\n{0:{1}}  {2:>9} {3:>9} {4:>9}'
+                      .format('Counter', w, 'Min', 'Mean', 'Max'), file=file)
+
+                for k, v in counts.items():
+                    print('{0:{1}}  {2:9.4g} {3:9.4g} {4:9.4g}'
+                          .format(k, w, *v), file=file)
+
+
+# Timer for the start-up phases of a simulation
+startup_timer = PhaseTimer()
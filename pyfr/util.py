@@ -4,6 +4,7 @@ from contextlib import contextmanager
 from ctypes import CDLL, c_void_p
 import functools as ft
 import itertools as it
+import multiprocessing as mp
 import os
 import pickle
 import shutil
@@ -164,3 +165,26 @@ def rm(path):
         os.remove(path)
     else:
         shutil.rmtree(path)
+
+
+# Function being mapped over by the workers of fork_starmap
+_fork_fn = None
+
+
+def _fork_call(args):
+    return _fork_fn(*args)
+
+
+def fork_starmap(fn, iterable, njobs, init=None):
+    global _fork_fn
+
+    # Workers are forked and so inherit the function, along with any
+    # state it references, without it needing to be pickled; any state
+    # which can not be shared, such as open files, may be reset by init
+    _fork_fn = fn
+
+    try:
+        with mp.get_context('fork').Pool(njobs, initializer=init) as pool:
+            return pool.map(_fork_call, iterable)
+    finally:
+        _fork_fn = None
@@ -7,18 +7,39 @@ from pyfr.util import subclass_where
 
 class BaseWriter(object):
     def __init__(self, args):
+        self.meshf = args.meshf
+
+        # If mesh-dependent arrays should be kept for subsequent solutions
+        self.reuse_mesh = False
+
+        # Open the mesh file; arrays are read on demand
+        self.mesh = NativeReader(args.meshf, lazy=True)
+
+        # Get element types and array shapes
+        self.mesh_inf = self.mesh.array_info('spt')
+
+        # Dimensions
+        self.ndims = next(iter(self.mesh_inf.values()))[1][2]
+
+        # Load the solution
+        self.set_soln(args.solnf, args.outf)
+
+    def reopen(self):
+        self.mesh.reopen()
+        self.soln.reopen()
+
+    def set_soln(self, solnf, outf):
         from pyfr.solvers.base import BaseSystem
 
-        self.outf = args.outf
+        self.outf = outf
 
-        # Load the mesh and solution files
-        self.soln = NativeReader(args.solnf)
-        self.mesh = NativeReader(args.meshf)
+        # Open the solution file
+        self.soln = NativeReader(solnf, lazy=True)
 
         # Check solution and mesh are compatible
         if self.mesh['mesh_uuid'] != self.soln['mesh_uuid']:
             raise RuntimeError('Solution "%s" was not computed on mesh "%s"' %
-                               (args.solnf, args.meshf))
+                               (solnf, self.meshf))
 
         # Load the configuration and stats files
         self.cfg = Inifile(self.soln['config'])
@@ -28,11 +49,9 @@ class BaseWriter(object):
         self.dataprefix = self.stats.get('data', 'prefix', 'soln')
 
         # Get element types and array shapes
-        self.mesh_inf = self.mesh.array_info('spt')
         self.soln_inf = self.soln.array_info(self.dataprefix)
 
         # Dimensions
-        self.ndims = next(iter(self.mesh_inf.values()))[1][2]
         self.nvars = next(iter(self.soln_inf.values()))[1][1]
 
         # System and elements classes
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 
+import atexit
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import itertools as it
 import os
 import re
@@ -7,12 +10,81 @@ import re
 import h5py
 import numpy as np
 
+from pyfr.inifile import Inifile
 from pyfr.mpiutil import get_comm_rank_root
+from pyfr.nputil import bitround
+from pyfr.readers.native import element_axis
+
+
+def pack_partitions(data):
+    ret, parts = {}, defaultdict(dict)
+
+    # Group the partitioned arrays
+    for k in data:
+        mm = re.match(r'con_p(\d+)p(\d+)$', k)
+        mp = re.match(r'(.+?)_p(\d+)$', k)
+
+        if mm:
+            parts['mcon'][int(mm.group(1)), int(mm.group(2))] = data[k]
+        elif mp:
+            parts[mp.group(1)][int(mp.group(2))] = data[k]
+        else:
+            ret[k] = data[k]
+
+    # Element type table for any connectivity arrays
+    etypes = sorted(k[4:] for k in parts if k.startswith('spt_'))
+    etypes = np.array(etypes, dtype='S4')
+    if etypes.size:
+        ret['etypes'] = etypes
+
+    # Number of partitions
+    npart = max(max(v) for k, v in parts.items() if k != 'mcon') + 1
+
+    for name, arrs in parts.items():
+        if name == 'mcon':
+            keys = sorted(arrs)
+            ret['mcon_parts'] = np.array(keys, dtype=np.int32)
+        else:
+            keys = range(npart)
+
+        # Concatenate the partitions and record where each one starts
+        axis = element_axis(name)
+        counts = [arrs[k].shape[axis] if k in arrs else 0 for k in keys]
+        ret['offsets/' + name] = np.cumsum([0] + counts)
+        arr = np.concatenate([arrs[k] for k in keys if k in arrs], axis=axis)
+
+        # Replace element type names in the connectivity with indices
+        if name in {'con', 'mcon'} or name.startswith('bcon_'):
+            con = arr.astype('S4,i4,i1,i1')
+
+            arr = np.empty(con.shape, dtype='i1,i4,i1,i1')
+            arr['f0'] = np.searchsorted(etypes, con['f0'])
+            arr['f1'], arr['f2'], arr['f3'] = con['f1'], con['f2'], con['f3']
+
+        ret[name] = arr
+
+    return ret
+
+
+def write_native(path, data, version=1):
+    if version == 2:
+        data = pack_partitions(data)
+    elif version != 1:
+        raise ValueError('Unsupported file version')
+
+    with h5py.File(path, 'w') as f:
+        for k in data:
+            f[k] = data[k]
+
+        if version > 1:
+            f.attrs['version'] = version
 
 
 class NativeWriter(object):
     def __init__(self, intg, nvars, basedir, basename, *, prefix,
-                 extn='.pyfrs'):
+                 extn='.pyfrs', cfgsect=None):
+        from mpi4py import MPI
+
         # Base output directory and file name
         self.basedir = basedir
         self.basename = basename
@@ -30,6 +102,54 @@ class NativeWriter(object):
         # Copy the float type
         self.fpdtype = intg.backend.fpdtype
 
+        # Storage options
+        if cfgsect:
+            cfg = intg.cfg
+
+            # On-disk precision; defaults to that of the backend
+            dprec = 'single' if self.fpdtype == np.float32 else 'double'
+            prec = cfg.get(cfgsect, 'precision', dprec)
+            if prec not in {'single', 'double'}:
+                raise ValueError('Output precision must be either single '
+                                 'or double')
+
+            self._dsdtype = np.dtype(prec)
+
+            # Chunking and lossless compression
+            self._chunksize = cfg.getint(cfgsect, 'chunk-size', 0)
+            self._compression = cfg.get(cfgsect, 'compression', 'none')
+            self._shuffle = cfg.getbool(cfgsect, 'shuffle', True)
+
+            if self._compression not in {'none', 'gzip', 'lzf'}:
+                raise ValueError('Invalid compression filter')
+
+            # Layout version of the file
+            self._version = cfg.getint(cfgsect, 'version', 1)
+            if self._version not in {1, 2}:
+                raise ValueError('Unsupported file version')
+
+            # If each rank should write its own file
+            perrank = cfg.getbool(cfgsect, 'file-per-rank', False)
+
+            # If to write in the background
+            asynchronous = cfg.getbool(cfgsect, 'async', False)
+
+            # If to store the modal coefficients of each element
+            encoding = cfg.get(cfgsect, 'encoding', 'nodal')
+            if encoding not in {'nodal', 'modal'}:
+                raise ValueError('Invalid solution encoding')
+
+            if encoding == 'modal':
+                self._modal = self._modal_info(intg, cfgsect)
+            else:
+                self._modal = None
+        else:
+            self._dsdtype = np.dtype(self.fpdtype)
+            self._chunksize, self._compression = 0, 'none'
+            self._version = 1
+            self._modal = None
+            perrank = asynchronous = False
+
         # MPI info
         comm, rank, root = get_comm_rank_root()
 
@@ -38,16 +158,72 @@ class NativeWriter(object):
         shapes = [(nupts, nvars, neles)
                   for nupts, _, neles in intg.system.ele_shapes]
 
+        # Modal encodings retain only a subset of the modes
+        if self._modal:
+            shapes = [(len(encop),) + shape[1:]
+                      for (encop, degs), shape in zip(self._modal['ops'],
+                                                      shapes)]
+
         # Gather
-        eleinfo = comm.allgather(zip(etypes, shapes))
+        eleinfo = comm.allgather(list(zip(etypes, shapes)))
+
+        # Outstanding sends to the root rank
+        self._sreqs, self._sbufs = [], []
+
+        # When writing asynchronously data is snapshotted into one of two
+        # staging buffers and written out by a background thread
+        self._bufidx = 0
 
-        # Parallel I/O
-        if (h5py.get_config().mpi and
-            'PYFR_FORCE_SERIAL_HDF5' not in os.environ):
+        if asynchronous:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            self._pending = None
+            self._stage_bufs = [None, None]
+        else:
+            self._executor = None
+
+        # One file per rank along with a manifest written by the root
+        if perrank:
+            self._write = self._write_per_rank
+
+            prank = intg.rallocs.mprankmap[rank]
+            self._loc_names = [self._get_name_for_data(etype, prank)
+                               for etype, shape in eleinfo[rank]]
+            self._part_fname = 'p{0}.h5'.format(prank)
+
+            # Index mapping each dataset to the file it is in
+            if rank == root:
+                index = []
+                for mrank, meleinfo in enumerate(eleinfo):
+                    prank = intg.rallocs.mprankmap[mrank]
+                    for etype, shape in meleinfo:
+                        name = self._get_name_for_data(etype, prank)
+                        index.append((name, prank))
+
+                nlen = max(len(n) for n, p in index)
+                self._manifest_index = np.array(
+                    index, dtype=[('name', 'S{}'.format(nlen)), ('part', 'i4')]
+                )
+        # Parallel I/O; this can only be done in the background if MPI
+        # permits the use of multiple threads, and as each rank writes its
+        # own datasets independently compression is not possible
+        elif (h5py.get_config().mpi and
+            'PYFR_FORCE_SERIAL_HDF5' not in os.environ and
+            self._compression == 'none' and
+            (not asynchronous or MPI.Query_thread() == MPI.THREAD_MULTIPLE)):
             self._write = self._write_parallel
             self._loc_names = loc_names = []
             self._global_shape_list = []
 
+            # Background writes need their own communicator
+            self._iocomm = comm.Dup() if asynchronous else comm
+
+            # With the packed layout each rank writes into a slice of a
+            # single dataset per element type
+            if self._version == 2:
+                self._packed_layout, self._loc_slices = self._packed_info(
+                    intg.rallocs.mprankmap, eleinfo, rank
+                )
+
             for mrank, meleinfo in enumerate(eleinfo):
                 prank = intg.rallocs.mprankmap[mrank]
 
@@ -63,10 +239,9 @@ class NativeWriter(object):
             self._write = self._write_serial
 
             if rank == root:
-                self._mpi_rbufs = mpi_rbufs = []
-                self._mpi_rreqs = mpi_rreqs = []
-                self._mpi_names = mpi_names = []
                 self._loc_names = loc_names = []
+                self._mpi_names = mpi_names = []
+                mpi_blocks = []
 
                 for mrank, meleinfo in enumerate(eleinfo):
                     prank = intg.rallocs.mprankmap[mrank]
@@ -76,23 +251,151 @@ class NativeWriter(object):
                         if mrank == root:
                             loc_names.append(name)
                         else:
+                            mpi_names.append(name)
+                            mpi_blocks.append((mrank, tag, shape))
+
+                # Asynchronous writes need all of the data up front
+                if asynchronous:
+                    self._mpi_rbufs = mpi_rbufs = [[], []]
+                    self._mpi_rreqs = mpi_rreqs = [[], []]
+
+                    for mrank, tag, shape in mpi_blocks:
+                        for i in range(2):
                             rbuf = np.empty(shape, dtype=self.fpdtype)
                             rreq = comm.Recv_init(rbuf, mrank, tag)
 
-                            mpi_rbufs.append(rbuf)
-                            mpi_rreqs.append(rreq)
-                            mpi_names.append(name)
+                            mpi_rbufs[i].append(rbuf)
+                            mpi_rreqs[i].append(rreq)
+                # Otherwise stream the blocks through a pair of buffers
+                else:
+                    self._mpi_blocks = mpi_blocks
+
+                    bsize = max([0] + [np.prod(s) for m, t, s in mpi_blocks])
+                    self._mpi_sbufs = [np.empty(bsize, dtype=self.fpdtype)
+                                       for i in range(2)]
+
+                # Determine where each block is to be written
+                self._serial_layout(intg.rallocs.mprankmap, eleinfo)
+
+        # Ensure that any outstanding writes are completed at exit
+        atexit.register(self.flush)
 
     def write(self, data, metadata, tcurr):
         # Determine the output path
         path = self._get_output_path(tcurr)
 
+        # Project the data onto the modal basis
+        if self._modal:
+            data, metadata = self._modal_encode(data, metadata)
+
+        # Snapshot the data so that it may be written in the background
+        if self._executor:
+            data = self._stage(data)
+
         # Delegate to _write to do the actual outputting
         self._write(path, data, metadata)
 
         # Increment the output number
         self.nout += 1
 
+    def flush(self):
+        from mpi4py import MPI
+
+        if self._executor and self._pending:
+            pending, self._pending = self._pending, None
+
+            # Wait for the write to complete; raising any exceptions
+            pending.result()
+
+        # Wait for any data we have sent to the root rank to be received
+        if self._sreqs and not MPI.Is_finalized():
+            MPI.Request.Waitall(self._sreqs)
+            self._sreqs, self._sbufs = [], []
+
+    def _modal_info(self, intg, cfgsect):
+        cfg = intg.cfg
+        order, ndims = cfg.getint('solver', 'order'), intg.system.ndims
+
+        # Highest degree mode to retain; by default all modes are kept
+        degree = cfg.getint(cfgsect, 'modal-degree', ndims*order)
+
+        # Fraction of the energy in each element which may be discarded
+        tol = cfg.getfloat(cfgsect, 'modal-tol', 0)
+
+        # Number of mantissa bits to retain in the coefficients
+        nbits = cfg.getint(cfgsect, 'modal-bits', 0)
+
+        ops = []
+        for etype in intg.system.ele_types:
+            ub = intg.system.ele_map[etype].basis.ubasis
+            modes = ub.modes_upto(degree)
+
+            # Map from nodal values to the retained modal coefficients
+            encop = np.linalg.inv(ub.vdm.T)[modes]
+            ops.append((encop, np.array(ub.degrees)[modes]))
+
+        return dict(degree=degree, tol=tol, nbits=nbits, ops=ops)
+
+    def _modal_encode(self, data, metadata):
+        tol, nbits = self._modal['tol'], self._modal['nbits']
+
+        mdata = []
+        for (encop, degs), d in zip(self._modal['ops'], data):
+            m = np.dot(encop, d.reshape(len(d), -1))
+            m = m.reshape((len(m),) + d.shape[1:])
+
+            # Discard the highest degree modes of each element whilst the
+            # energy they hold is within the tolerance
+            if tol > 0:
+                udegs = np.unique(degs)[::-1]
+                energy = np.array([np.sum(m[degs == j]**2, axis=0)
+                                   for j in udegs])
+
+                drop = np.cumsum(energy, axis=0) <= tol*energy.sum(axis=0)
+                drop[-1] = False
+
+                for j, jdrop in zip(udegs, drop):
+                    m[degs == j] *= ~jdrop
+
+            m = m.astype(self.fpdtype)
+
+            # Quantise the coefficients
+            if nbits:
+                m = bitround(m, nbits)
+
+            mdata.append(m)
+
+        # Record the encoding in the stats
+        stats = Inifile(metadata['stats'])
+        stats.set('data', 'encoding', 'modal')
+        stats.set('data', 'modal-degree', self._modal['degree'])
+
+        return mdata, dict(metadata, stats=stats.tostr())
+
+    def _stage(self, data):
+        # Alternate between the staging buffers; as only one write can be
+        # in flight at a time the buffer we fill is never in use
+        self._bufidx ^= 1
+
+        bufs = self._stage_bufs[self._bufidx]
+        if bufs is None:
+            bufs = [np.empty_like(d) for d in data]
+            self._stage_bufs[self._bufidx] = bufs
+
+        for b, d in zip(bufs, data):
+            b[...] = d
+
+        return bufs
+
+    def _submit(self, fn, *args):
+        if self._executor:
+            # Apply back-pressure by waiting on any in-flight write
+            self.flush()
+
+            self._pending = self._executor.submit(fn, *args)
+        else:
+            fn(*args)
+
     def _restore_nout(self):
         nout = 0
 
@@ -101,7 +404,7 @@ class NativeWriter(object):
             # Quote and substitute
             bn = re.escape(self.basename)
             bn = re.sub(r'\\{n[^}]*\\}', r'(\s*\d+\s*)', bn)
-            bn = re.sub(r'\\{t[^}]*\\}', r'(?:.*?)', bn) + '$'
+            bn = re.sub(r'\\{t[^}]*\\}', r'(?:.*?)', bn) + r'(?:\.d)?$'
 
             for f in os.listdir(self.basedir):
                 m = re.match(bn, f)
@@ -119,18 +422,82 @@ class NativeWriter(object):
     def _get_name_for_data(self, etype, prank):
         return '{}_{}_p{}'.format(self.prefix, etype, prank)
 
+    def _packed_info(self, mprankmap, eleinfo, rank):
+        # Shape of each element type in each partition
+        pshapes = defaultdict(dict)
+        for mrank, meleinfo in enumerate(eleinfo):
+            for etype, shape in meleinfo:
+                pshapes[etype][mprankmap[mrank]] = shape
+
+        layout, offs = [], {}
+        for etype, shapes in sorted(pshapes.items()):
+            name = '{}_{}'.format(self.prefix, etype)
+
+            # Offset of each partition in the packed dataset
+            counts = [shapes[p][-1] if p in shapes else 0
+                      for p in range(len(eleinfo))]
+            offs[etype] = off = np.cumsum([0] + counts)
+
+            shape = next(iter(shapes.values()))[:-1] + (int(off[-1]),)
+            layout.append((name, shape, off))
+
+        # Slices to which our data is written
+        prank = mprankmap[rank]
+        slices = [('{}_{}'.format(self.prefix, etype), offs[etype][prank],
+                   offs[etype][prank + 1])
+                  for etype, shape in eleinfo[rank]]
+
+        return layout, slices
+
+    def _get_dataset_opts(self, shape):
+        opts = {'dtype': self._dsdtype}
+
+        # Chunk along the element axis
+        if self._chunksize > 0:
+            neles = min(self._chunksize, shape[-1]) or 1
+            opts['chunks'] = shape[:-1] + (neles,)
+
+        # Compress; if we are not chunking then let h5py pick the chunks
+        if self._compression != 'none' and shape[-1] > 0:
+            opts['compression'] = self._compression
+            opts['shuffle'] = self._shuffle
+
+        return opts
+
     def _write_parallel(self, path, data, metadata):
-        comm, rank, root = get_comm_rank_root()
+        self._submit(self._write_parallel_file, path, data, metadata)
+
+    def _write_parallel_file(self, path, data, metadata):
+        comm, root = self._iocomm, 0
+        rank = comm.rank
 
         with h5py.File(path, 'w', driver='mpio', comm=comm) as h5file:
-            dmap = {}
-            for name, shape in self._global_shape_list:
-                dmap[name] = h5file.create_dataset(
-                    name, shape, dtype=self.fpdtype
-                )
+            if self._version == 2:
+                dmap = {}
+                for name, shape, off in self._packed_layout:
+                    dmap[name] = h5file.create_dataset(
+                        name, shape, **self._get_dataset_opts(shape)
+                    )
+
+                    # Partition offsets are the same on all ranks
+                    d = h5file.create_dataset('offsets/' + name, off.shape,
+                                              dtype=off.dtype)
+                    if rank == root:
+                        d.write_direct(off)
+
+                for (s, j, k), dat in zip(self._loc_slices, data):
+                    dmap[s][..., j:k] = dat
+
+                h5file.attrs['version'] = self._version
+            else:
+                dmap = {}
+                for name, shape in self._global_shape_list:
+                    dmap[name] = h5file.create_dataset(
+                        name, shape, **self._get_dataset_opts(shape)
+                    )
 
-            for s, dat in zip(self._loc_names, data):
-                dmap[s][:] = dat
+                for s, dat in zip(self._loc_names, data):
+                    dmap[s][:] = dat
 
             # Metadata information has to be transferred to all the ranks
             if rank == root:
@@ -145,30 +512,149 @@ class NativeWriter(object):
                 if rank == root:
                     d.write_direct(np.array(metadata[name], dtype='S'))
 
+    def _serial_layout(self, mprankmap, eleinfo):
+        # Datasets to create and the element range of each block in them
+        if self._version == 2:
+            layout, _ = self._packed_info(mprankmap, eleinfo, 0)
+            offs = {name: off for name, shape, off in layout}
+
+            self._dsshapes = [(name, shape) for name, shape, off in layout]
+            self._dsoffs = offs
+        else:
+            self._dsshapes, self._dsoffs = [], {}
+
+        self._blockmap = blockmap = {}
+        for mrank, meleinfo in enumerate(eleinfo):
+            prank = mprankmap[mrank]
+
+            for etype, shape in meleinfo:
+                name = self._get_name_for_data(etype, prank)
+
+                if self._version == 2:
+                    pname = '{}_{}'.format(self.prefix, etype)
+                    off = self._dsoffs[pname]
+                    blockmap[name] = (pname, off[prank], off[prank + 1])
+                else:
+                    self._dsshapes.append((name, shape))
+                    blockmap[name] = (name, 0, shape[-1])
+
+    def _write_per_rank(self, path, data, metadata):
+        comm, rank, root = get_comm_rank_root()
+
+        # Files are written to a directory named after the usual file
+        dname = path + '.d'
+        os.makedirs(dname, exist_ok=True)
+
+        if rank != root:
+            metadata = None
+
+        self._submit(self._write_rank_file, dname, data, metadata)
+
+    def _write_rank_file(self, dname, data, metadata):
+        with h5py.File(os.path.join(dname, self._part_fname), 'w') as h5file:
+            for name, dat in zip(self._loc_names, data):
+                h5file.create_dataset(name, data=dat,
+                                      **self._get_dataset_opts(dat.shape))
+
+        # Have the root rank write out the manifest
+        if metadata is not None:
+            mpath = os.path.join(dname, 'manifest.h5')
+
+            with h5py.File(mpath, 'w') as h5file:
+                h5file['index'] = self._manifest_index
+
+                for k, v in metadata.items():
+                    h5file[k] = np.array(v, dtype='S')
+
     def _write_serial(self, path, data, metadata):
         from mpi4py import MPI
 
         comm, rank, root = get_comm_rank_root()
 
+        # Convert any metadata to ASCII
+        metadata = {k: np.array(v, dtype='S') for k, v in metadata.items()}
+
         if rank != root:
-            for tag, buf in enumerate(data):
-                comm.Send(buf.copy(), root, tag)
-        else:
+            # Ensure our previous sends have completed
+            MPI.Request.Waitall(self._sreqs)
+
+            # Send our data without waiting for root to receive it
+            self._sbufs = [buf.copy() for buf in data]
+            self._sreqs = [comm.Isend(buf, root, tag)
+                           for tag, buf in enumerate(self._sbufs)]
+        elif self._executor:
+            rbufs = self._mpi_rbufs[self._bufidx]
+            rreqs = self._mpi_rreqs[self._bufidx]
+
             # Recv all of the non-local data
-            MPI.Prequest.Startall(self._mpi_rreqs)
-            MPI.Prequest.Waitall(self._mpi_rreqs)
+            MPI.Prequest.Startall(rreqs)
+            MPI.Prequest.Waitall(rreqs)
 
             # Combine local and MPI data
             names = it.chain(self._loc_names, self._mpi_names)
-            dats = it.chain(data, self._mpi_rbufs)
+            dats = it.chain(data, rbufs)
+            datadict = dict(zip(names, dats))
+
+            self._submit(self._write_serial_file, path, datadict, metadata)
+        else:
+            self._write_serial_stream(path, data, metadata)
+
+    def _write_serial_stream(self, path, data, metadata):
+        comm, rank, root = get_comm_rank_root()
+
+        blocks, bufs = self._mpi_blocks, self._mpi_sbufs
+
+        def irecv(i):
+            mrank, tag, shape = blocks[i]
+            buf = bufs[i % 2][:np.prod(shape)].reshape(shape)
+
+            return buf, comm.Irecv(buf, mrank, tag)
+
+        with h5py.File(path, 'w') as h5file:
+            self._create_serial_datasets(h5file)
+
+            # Start receiving the first block from the other ranks
+            if blocks:
+                nxt = irecv(0)
+
+            # Write out our own data
+            for name, dat in zip(self._loc_names, data):
+                self._write_serial_block(h5file, name, dat)
+
+            # Write out each block whilst receiving the next one
+            for i, name in enumerate(self._mpi_names):
+                buf, req = nxt
+                req.Wait()
+
+                if i + 1 < len(blocks):
+                    nxt = irecv(i + 1)
+
+                self._write_serial_block(h5file, name, buf)
+
+            for k, v in metadata.items():
+                h5file[k] = v
+
+    def _create_serial_datasets(self, h5file):
+        for name, shape in self._dsshapes:
+            h5file.create_dataset(name, shape,
+                                  **self._get_dataset_opts(shape))
+
+        if self._version > 1:
+            for name, off in self._dsoffs.items():
+                h5file['offsets/' + name] = off
+
+            h5file.attrs['version'] = self._version
+
+    def _write_serial_block(self, h5file, name, dat):
+        dname, j, k = self._blockmap[name]
+        h5file[dname][..., j:k] = dat
 
-            # Convert any metadata to ASCII
-            metadata = {k: np.array(v, dtype='S')
-                        for k, v in metadata.items()}
+    def _write_serial_file(self, path, datadict, metadata):
+        with h5py.File(path, 'w') as h5file:
+            self._create_serial_datasets(h5file)
 
-            # Create the output dictionary
-            outdict = dict(zip(names, dats), **metadata)
+            for name, dat in datadict.items():
+                self._write_serial_block(h5file, name, dat)
 
-            with h5py.File(path, 'w') as h5file:
-                for k, v in outdict.items():
-                    h5file[k] = v
+            for k, v in metadata.items():
+                h5file[k] = v
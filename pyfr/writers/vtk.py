@@ -6,7 +6,7 @@ import os
 import numpy as np
 
 from pyfr.shapes import BaseShape
-from pyfr.util import memoize, subclass_where
+from pyfr.util import fork_starmap, memoize, subclass_where
 from pyfr.writers import BaseWriter
 
 
@@ -16,17 +16,48 @@ class VTKWriter(BaseWriter):
     extn = ['.vtu', '.pvtu']
 
     def __init__(self, args):
+        self.dtype = np.dtype(args.precision).type
+
+        # Options which apply to every solution we export
+        self._divisor = args.divisor
+        self._gradients = args.gradients
+
+        # Number of elements to process at once; zero for all of them
+        self.chunk_size = args.chunk_size
+
+        # Mesh-dependent arrays of the most recent element block which
+        # may be reused by the next solution; keeping only a single block
+        # bounds their memory usage
+        self._vtu_geom, self._grad_ops = {}, {}
+
         super().__init__(args)
 
-        self.dtype = np.dtype(args.precision).type
-        self.divisor = args.divisor or self.cfg.getint('solver', 'order')
+    def set_soln(self, solnf, outf):
+        prevcfg = getattr(self, '_cfgstr', None)
+
+        super().set_soln(solnf, outf)
+
+        # Operators depend on the configuration so may need regenerating;
+        # compare against the configuration as read since any defaults
+        # requested whilst writing are added to it
+        self._cfgstr = self.cfg.tostr()
+        if prevcfg and prevcfg != self._cfgstr:
+            self._memoize_cache, self._grad_ops = {}, {}
+
+        self.divisor = self._divisor or self.cfg.getint('solver', 'order')
+
+        # See if the data has been stored as modal coefficients
+        if self.stats.get('data', 'encoding', 'nodal') == 'modal':
+            self._modal_degree = self.stats.getint('data', 'modal-degree')
+        else:
+            self._modal_degree = None
 
         # Solutions need a separate processing pipeline to other data
         if self.dataprefix == 'soln':
             self._pre_proc_fields = self._pre_proc_fields_soln
             self._post_proc_fields = self._post_proc_fields_soln
-            self._soln_fields = self.elementscls.privarmap[self.ndims]
-            self._vtk_vars = self.elementscls.visvarmap[self.ndims]
+            self._soln_fields = list(self.elementscls.privarmap[self.ndims])
+            self._vtk_vars = dict(self.elementscls.visvarmap[self.ndims])
         # Otherwise we're dealing with simple scalar data
         else:
             self._pre_proc_fields = self._pre_proc_fields_scal
@@ -35,7 +66,7 @@ class VTKWriter(BaseWriter):
             self._vtk_vars = {k: [k] for k in self._soln_fields}
 
         # See if we are computing gradients
-        if args.gradients:
+        if self._gradients:
             self._pre_proc_fields_ref = self._pre_proc_fields
             self._pre_proc_fields = self._pre_proc_fields_grad
             self._post_proc_fields = self._post_proc_fields_grad
@@ -55,11 +86,11 @@ class VTKWriter(BaseWriter):
                     for f in fields:
                         self._vtk_vars['grad {0} {1}'.format(var, f)] = nf(f)
 
-    def _pre_proc_fields_soln(self, name, mesh, soln):
+    def _pre_proc_fields_soln(self, name, mblk, soln):
         # Convert from conservative to primitive variables
         return np.array(self.elementscls.con_to_pri(soln, self.cfg))
 
-    def _pre_proc_fields_scal(self, name, mesh, soln):
+    def _pre_proc_fields_scal(self, name, mblk, soln):
         return soln
 
     def _post_proc_fields_soln(self, vsoln):
@@ -79,13 +110,34 @@ class VTKWriter(BaseWriter):
     def _post_proc_fields_scal(self, vsoln):
         return [vsoln[self._soln_fields.index(vn)] for vn in self._vtk_vars]
 
-    def _pre_proc_fields_grad(self, name, mesh, soln):
+    def _pre_proc_fields_grad(self, name, mblk, soln):
         # Call the reference pre-processor
-        soln = self._pre_proc_fields_ref(name, mesh, soln)
+        soln = self._pre_proc_fields_ref(name, mblk, soln)
 
         # Dimensions
         nvars, nupts = soln.shape[:2]
 
+        # Get the gradient operator and untransformation matrices
+        gradop, smat_rcpdjac = self._get_grad_ops(name, mblk)
+
+        # Evaluate the transformed gradient of the solution
+        gradsoln = np.dot(gradop, soln.swapaxes(0, 1).reshape(nupts, -1))
+        gradsoln = gradsoln.reshape(self.ndims, nupts, nvars, -1)
+
+        # Untransform
+        gradsoln = np.einsum('ijkl,jkml->mikl', smat_rcpdjac, gradsoln,
+                             dtype=self.dtype, casting='same_kind')
+        gradsoln = gradsoln.reshape(nvars*self.ndims, nupts, -1)
+
+        return np.vstack([soln, gradsoln])
+
+    def _get_grad_ops(self, name, mblk):
+        if mblk in self._grad_ops:
+            return self._grad_ops[mblk]
+
+        mk, i, j = mblk
+        mesh = self.mesh[mk][:, i:j].astype(self.dtype)
+
         # Get the shape class
         basiscls = subclass_where(BaseShape, name=name)
 
@@ -99,16 +151,12 @@ class VTKWriter(BaseWriter):
         # Gradient operator
         gradop = eles.basis.m4.astype(self.dtype)
 
-        # Evaluate the transformed gradient of the solution
-        gradsoln = np.dot(gradop, soln.swapaxes(0, 1).reshape(nupts, -1))
-        gradsoln = gradsoln.reshape(self.ndims, nupts, nvars, -1)
+        ops = (gradop, smat*rcpdjac)
 
-        # Untransform
-        gradsoln = np.einsum('ijkl,jkml->mikl', smat*rcpdjac, gradsoln,
-                             dtype=self.dtype, casting='same_kind')
-        gradsoln = gradsoln.reshape(nvars*self.ndims, nupts, -1)
+        if self.reuse_mesh:
+            self._grad_ops = {mblk: ops}
 
-        return np.vstack([soln, gradsoln])
+        return ops
 
     def _post_proc_fields_grad(self, vsoln):
         # Prepare the fields
@@ -175,14 +223,27 @@ class VTKWriter(BaseWriter):
     @memoize
     def _get_mesh_op(self, name, nspts, svpts):
         shape = self._get_shape(name, nspts)
-        return shape.sbasis.nodal_basis_at(svpts).astype(self.dtype)
+        op = shape.cached_op(lambda: shape.sbasis.nodal_basis_at(svpts),
+                             'sbasis', svpts)
+
+        return op.astype(self.dtype)
 
     @memoize
     def _get_soln_op(self, name, nspts, svpts):
         shape = self._get_shape(name, nspts)
-        return shape.ubasis.nodal_basis_at(svpts).astype(self.dtype)
+        op = shape.cached_op(lambda: shape.ubasis.nodal_basis_at(svpts),
+                             'ubasis', svpts)
+
+        return op.astype(self.dtype)
 
-    def write_out(self):
+    @memoize
+    def _get_modal_op(self, name, nspts, degree):
+        ub = self._get_shape(name, nspts).ubasis
+        modes = ub.modes_upto(degree)
+
+        return ub.vdm.T[:, modes]
+
+    def write_out(self, jobs=1):
         name, extn = os.path.splitext(self.outf)
         parallel = extn == '.pvtu'
 
@@ -193,32 +254,17 @@ class VTKWriter(BaseWriter):
 
             parts[pfn].append((mk, sk))
 
-        write_s_to_fh = lambda s: fh.write(s.encode('utf-8'))
-
-        for pfn, misil in parts.items():
-            with open(pfn, 'wb') as fh:
-                write_s_to_fh('<?xml version="1.0" ?>\n<VTKFile '
-                              'byte_order="LittleEndian" '
-                              'type="UnstructuredGrid" '
-                              'version="0.1">\n<UnstructuredGrid>\n')
-
-                # Running byte-offset for appended data
-                off = 0
-
-                # Header
-                for mk, sk in misil:
-                    off = self._write_serial_header(fh, mk, off)
-
-                write_s_to_fh('</UnstructuredGrid>\n'
-                              '<AppendedData encoding="raw">\n_')
-
-                # Data
-                for mk, sk in misil:
-                    self._write_data(fh, mk, sk)
-
-                write_s_to_fh('\n</AppendedData>\n</VTKFile>')
+        # Pieces are independent and so can be written concurrently
+        if jobs > 1 and len(parts) > 1:
+            fork_starmap(self._write_vtu, parts.items(), jobs,
+                         init=self.reopen)
+        else:
+            for pfn, misil in parts.items():
+                self._write_vtu(pfn, misil)
 
         if parallel:
+            write_s_to_fh = lambda s: fh.write(s.encode('utf-8'))
+
             with open(self.outf, 'wb') as fh:
                 write_s_to_fh('<?xml version="1.0" ?>\n<VTKFile '
                               'byte_order="LittleEndian" '
@@ -235,11 +281,30 @@ class VTKWriter(BaseWriter):
 
                 write_s_to_fh('</PUnstructuredGrid>\n</VTKFile>\n')
 
-    def _write_darray(self, array, vtuf, dtype):
-        array = array.astype(dtype)
+    def _write_vtu(self, pfn, misil):
+        write_s_to_fh = lambda s: fh.write(s.encode('utf-8'))
+
+        with open(pfn, 'wb') as fh:
+            write_s_to_fh('<?xml version="1.0" ?>\n<VTKFile '
+                          'byte_order="LittleEndian" '
+                          'type="UnstructuredGrid" '
+                          'version="0.1">\n<UnstructuredGrid>\n')
+
+            # Running byte-offset for appended data
+            off = 0
 
-        np.uint32(array.nbytes).tofile(vtuf)
-        array.tofile(vtuf)
+            # Header
+            for mk, sk in misil:
+                off = self._write_serial_header(fh, mk, off)
+
+            write_s_to_fh('</UnstructuredGrid>\n'
+                          '<AppendedData encoding="raw">\n_')
+
+            # Data
+            for mk, sk in misil:
+                self._write_data(fh, mk, sk)
+
+            write_s_to_fh('\n</AppendedData>\n</VTKFile>')
 
     def _write_serial_header(self, vtuf, mk, off):
         names, types, comps, sizes = self._get_array_attrs(mk)
@@ -289,10 +354,23 @@ class VTKWriter(BaseWriter):
 
         write_s('</PPointData>\n')
 
-    def _write_data(self, vtuf, mk, sk):
+    @memoize
+    def _get_vtu_cell_tpls(self, name, divisor):
+        subdvcls = subclass_where(BaseShapeSubDiv, name=name)
+
+        return (np.array(subdvcls.subnodes(divisor)),
+                np.array(subdvcls.subcelloffs(divisor)),
+                np.array(subdvcls.subcelltypes(divisor)))
+
+    def _get_vtu_geom(self, mk, i, j):
+        key = (mk, self.divisor, i, j)
+
+        # See if we have already computed the geometry for these elements
+        if key in self._vtu_geom:
+            return self._vtu_geom[key]
+
         name = self.mesh_inf[mk][0]
-        mesh = self.mesh[mk].astype(self.dtype)
-        soln = self.soln[sk].swapaxes(0, 1).astype(self.dtype)
+        mesh = self.mesh[mk][:, i:j].astype(self.dtype)
 
         # Dimensions
         nspts, neles = mesh.shape[:2]
@@ -301,51 +379,115 @@ class VTKWriter(BaseWriter):
         svpts = self._get_std_ele(name, nspts)
         nsvpts = len(svpts)
 
-        # Generate the operator matrices
+        # Generate the operator matrix
         mesh_vtu_op = self._get_mesh_op(name, nspts, svpts)
-        soln_vtu_op = self._get_soln_op(name, nspts, svpts)
 
         # Calculate node locations of VTU elements
         vpts = np.dot(mesh_vtu_op, mesh.reshape(nspts, -1))
         vpts = vpts.reshape(nsvpts, -1, self.ndims)
 
-        # Pre-process the solution
-        soln = self._pre_proc_fields(name, mesh, soln).swapaxes(0, 1)
-
-        # Interpolate the solution to the vis points
-        vsoln = np.dot(soln_vtu_op, soln.reshape(len(soln), -1))
-        vsoln = vsoln.reshape(nsvpts, -1, neles).swapaxes(0, 1)
-
         # Append dummy z dimension for points in 2D
         if self.ndims == 2:
             vpts = np.pad(vpts, [(0, 0), (0, 0), (0, 1)], 'constant')
 
-        # Write element node locations to file
-        self._write_darray(vpts.swapaxes(0, 1), vtuf, self.dtype)
-
         # Perform the sub division
-        subdvcls = subclass_where(BaseShapeSubDiv, name=name)
-        nodes = subdvcls.subnodes(self.divisor)
+        nodes, offs, typs = self._get_vtu_cell_tpls(name, self.divisor)
+
+        # Global indices of the elements
+        eidx = np.arange(i, j)
 
         # Prepare VTU cell arrays
         vtu_con = np.tile(nodes, (neles, 1))
-        vtu_con += (np.arange(neles)*nsvpts)[:, None]
+        vtu_con += (eidx*nsvpts)[:, None]
 
         # Generate offset into the connectivity array
-        vtu_off = np.tile(subdvcls.subcelloffs(self.divisor), (neles, 1))
-        vtu_off += (np.arange(neles)*len(nodes))[:, None]
+        vtu_off = np.tile(offs, (neles, 1))
+        vtu_off += (eidx*len(nodes))[:, None]
 
         # Tile VTU cell type numbers
-        vtu_typ = np.tile(subdvcls.subcelltypes(self.divisor), neles)
+        vtu_typ = np.tile(typs, neles)
+
+        geom = (vpts.swapaxes(0, 1), vtu_con, vtu_off, vtu_typ)
+
+        if self.reuse_mesh:
+            self._vtu_geom = {key: geom}
+
+        return geom
+
+    def _write_data(self, vtuf, mk, sk):
+        neles = self.mesh_inf[mk][1][1]
+        sizes = self._get_array_attrs(mk)[3]
+
+        # Write out the size of each array and note where its data starts
+        offs, off = [], vtuf.tell()
+        for size in sizes:
+            vtuf.seek(off)
+            np.uint32(size).tofile(vtuf)
+
+            offs.append(off + 4)
+            off += 4 + size
+
+        # Process the elements in chunks, writing each chunk's part of
+        # every array directly into place
+        csize = self.chunk_size or neles
+        for i in range(0, neles, csize):
+            j = min(i + csize, neles)
+
+            for k, arr in enumerate(self._get_vtu_arrays(mk, sk, i, j)):
+                vtuf.seek(offs[k])
+                arr.tofile(vtuf)
+
+                offs[k] += arr.nbytes
+
+        vtuf.seek(off)
+
+    def _get_vtu_arrays(self, mk, sk, i, j):
+        name, nspts = self.mesh_inf[mk][0], self.mesh_inf[mk][1][0]
+        soln = self.soln[sk][..., i:j]
+
+        # Number of elements in the chunk
+        neles = j - i
+
+        # Recover nodal values from any modal coefficients; this is done
+        # in double precision ahead of converting to the output type
+        if self._modal_degree is not None:
+            modal_op = self._get_modal_op(name, nspts, self._modal_degree)
+            soln = np.dot(modal_op, soln.reshape(len(soln), -1)
+                          .astype(np.float64))
+            soln = soln.reshape(len(modal_op), -1, neles)
+
+        soln = soln.astype(self.dtype)
+
+        soln = soln.swapaxes(0, 1)
+
+        # Sub divison points inside of a standard element
+        svpts = self._get_std_ele(name, nspts)
+        nsvpts = len(svpts)
+
+        # Generate the operator matrix
+        soln_vtu_op = self._get_soln_op(name, nspts, svpts)
+
+        # Pre-process the solution
+        soln = self._pre_proc_fields(name, (mk, i, j), soln).swapaxes(0, 1)
+
+        # Interpolate the solution to the vis points
+        vsoln = np.dot(soln_vtu_op, soln.reshape(len(soln), -1))
+        vsoln = vsoln.reshape(nsvpts, -1, neles).swapaxes(0, 1)
+
+        # Get the node locations and cells of the VTU elements
+        vpts, vtu_con, vtu_off, vtu_typ = self._get_vtu_geom(mk, i, j)
+
+        # Element node locations
+        yield vpts.astype(self.dtype)
 
-        # Write VTU node connectivity, connectivity offsets and cell types
-        self._write_darray(vtu_con, vtuf, np.int32)
-        self._write_darray(vtu_off, vtuf, np.int32)
-        self._write_darray(vtu_typ, vtuf, np.uint8)
+        # VTU node connectivity, connectivity offsets and cell types
+        yield vtu_con.astype(np.int32)
+        yield vtu_off.astype(np.int32)
+        yield vtu_typ.astype(np.uint8)
 
-        # Process and write out the various fields
+        # Process the various fields
         for arr in self._post_proc_fields(vsoln):
-            self._write_darray(arr.T, vtuf, self.dtype)
+            yield arr.T.astype(self.dtype)
 
 
 class BaseShapeSubDiv(object):
@@ -83,7 +83,7 @@ package_data = {
     'pyfr.solvers.euler.kernels.rsolvers': ['*.mako'],
     'pyfr.solvers.navstokes.kernels': ['*.mako'],
     'pyfr.solvers.navstokes.kernels.bcs': ['*.mako'],
-    'pyfr.tests': ['*.npz']
+    'pyfr.tests': ['*.msh', '*.npz']
 }
 
 # Additional data